@@ -0,0 +1,100 @@
+"""
+Benchmark: HTTP requests of function plugins.
+
+Compares creating and closing an httpx.AsyncClient for every request, as
+google_web_search did before, with the shared, pooled client that functions get
+from gptextual.runtime.function_calling. Requests go to a local stub server that
+supports HTTP/1.1 keep-alive, so the numbers show the connection setup overhead
+only. Against real APIs the difference grows with TLS and network latency.
+
+Usage:
+    python benchmarks/bench_http_client.py [--requests 500] [--concurrency 1]
+"""
+
+import argparse
+import asyncio
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import httpx
+
+from gptextual.runtime.function_calling import get_http_client
+from gptextual.runtime.http_clients import aclose_http_clients
+
+BODY = b'{"items": [{"title": "stub", "link": "http://localhost"}]}'
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are written separately, which Nagle would delay on keep-alive
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+async def client_per_request(url: str):
+    async with httpx.AsyncClient() as client:
+        resp = await client.get(url, params={"q": "stub"}, timeout=5)
+    resp.raise_for_status()
+
+
+async def shared_client(url: str):
+    resp = await get_http_client().get(url, params={"q": "stub"}, timeout=5)
+    resp.raise_for_status()
+
+
+async def measure(name, func, url, requests: int, concurrency: int):
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def timed():
+        async with semaphore:
+            start = time.perf_counter()
+            await func(url)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    print(
+        f"{name:<24} {elapsed:7.3f}s total, "
+        f"{requests / elapsed:8.1f} req/s, "
+        f"p50 {statistics.median(latencies) * 1000:6.2f}ms, "
+        f"p95 {statistics.quantiles(latencies, n=20)[-1] * 1000:6.2f}ms"
+    )
+
+
+async def run(url: str, requests: int, concurrency: int):
+    await measure("client per request", client_per_request, url, requests, concurrency)
+    await measure("shared client", shared_client, url, requests, concurrency)
+    await aclose_http_clients()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=1)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/search"
+    print(f"{args.requests} requests, concurrency {args.concurrency}")
+    try:
+        asyncio.run(run(url, args.requests, args.concurrency))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Benchmark: import time of the gptextual app (the imports done before `gptx` shows
+its first screen).
+
+Imports the app module in a fresh interpreter with `python -X importtime` and
+compares the imported modules with a baseline. Exits with status 1 if
+
+- a provider SDK is imported at startup (they are imported when a model is created)
+- the number of imported modules grew by more than the tolerance
+
+Import times are reported, but not checked, as they vary between machines.
+
+Usage:
+    python benchmarks/bench_import_time.py [--tolerance 0.05] [--top 15]
+    python benchmarks/bench_import_time.py --update-baseline
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+BASELINE = Path(__file__).parent / "import_time_baseline.json"
+MODULE = "gptextual.textual_ui.app"
+PROVIDER_SDKS = [
+    "langchain_openai",
+    "langchain_anthropic",
+    "langchain_google_genai",
+    "gen_ai_hub",
+    "openai",
+    "anthropic",
+    "google.generativeai",
+]
+
+
+def measure_imports(module: str) -> dict[str, tuple[int, int]]:
+    """Imported modules with their self and cumulative import time in microseconds"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        imports[name.strip()] = (int(self_us), int(cumulative_us))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tolerance", type=float, default=0.05)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--update-baseline", action="store_true")
+    args = parser.parse_args()
+
+    imports = measure_imports(MODULE)
+    total_ms = sum(self_us for self_us, _ in imports.values()) / 1000
+    print(f"import {MODULE}: {len(imports)} modules, {total_ms:.0f}ms")
+    print("Slowest top level packages (cumulative):")
+    packages = {
+        name: cumulative
+        for name, (_, cumulative) in imports.items()
+        if "." not in name
+    }
+    for name, cumulative in sorted(packages.items(), key=lambda p: -p[1])[: args.top]:
+        print(f"  {cumulative / 1000:8.1f}ms  {name}")
+
+    if args.update_baseline:
+        BASELINE.write_text(
+            json.dumps({"module": MODULE, "modules": len(imports)}, indent=2) + "\n"
+        )
+        print(f"Baseline written to {BASELINE}")
+        return
+
+    failed = False
+    sdks = [
+        name
+        for name in imports
+        if any(name == sdk or name.startswith(sdk + ".") for sdk in PROVIDER_SDKS)
+    ]
+    if sdks:
+        print(f"FAIL: provider SDKs imported at startup: {', '.join(sorted(sdks))}")
+        failed = True
+
+    baseline = json.loads(BASELINE.read_text())["modules"]
+    limit = int(baseline * (1 + args.tolerance))
+    if len(imports) > limit:
+        print(
+            f"FAIL: {len(imports)} modules imported at startup, "
+            f"baseline {baseline} (limit {limit})"
+        )
+        failed = True
+    else:
+        print(f"OK: {len(imports)} modules imported, baseline {baseline}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
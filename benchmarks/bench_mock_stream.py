@@ -0,0 +1,140 @@
+"""
+Benchmark: streaming overhead of the conversation runtime, with the mock provider.
+
+Streams responses of the mock provider into concurrent in-memory conversations,
+without any network access. The mock model streams at a fixed speed, so the time
+above the ideal stream duration is the overhead of gptextual (accumulating chunks,
+callbacks, token counting, scheduling). With --tokens-per-second 0 the mock streams
+without delays and the benchmark measures the raw chunk throughput of the runtime.
+
+With --replay-file, the conversations replay a recording of real responses (see
+runtime.record_streams) instead, at --replay-speed (0 as fast as possible).
+
+Usage:
+    python benchmarks/bench_mock_stream.py [--conversations 20] [--tokens 500]
+        [--tokens-per-second 200] [--chunk-size 1] [--ttft 0.2] [--tool-calls]
+        [--replay-file FILE] [--replay-speed 1]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from langchain_core.messages import HumanMessage
+
+import gptextual.config.app_config as app_config
+from gptextual.config.app_config import APIConfig, AppConfig, MockConfig
+from gptextual.logging import setup_logging
+from gptextual.runtime.conversation import Conversation, StreamingMessage
+from gptextual.runtime.function_calling import register_for_function_calling
+from gptextual.runtime.models import ModelRegistry
+
+
+@register_for_function_calling
+async def mock_lookup(key: str) -> str:
+    """
+    Looks up a key.
+
+    Args:
+        key: the key to look up
+    """
+    return f"value of {key}"
+
+
+async def stream(conversation: Conversation) -> tuple[float, float, int]:
+    start = time.perf_counter()
+    first, chunks = None, 0
+    async for chunk in conversation.progress(
+        HumanMessage(content="Hello"), autosave=False
+    ):
+        if isinstance(chunk, StreamingMessage):
+            chunks += 1
+            if first is None and chunk.message and chunk.message.content:
+                first = time.perf_counter() - start
+    return first or 0.0, time.perf_counter() - start, chunks
+
+
+def report(label: str, seconds: float, note: str = ""):
+    print(f"{label:<28} {seconds * 1000:8.1f}ms {note}")
+
+
+async def run(args) -> None:
+    model = ModelRegistry.model_from_name("mock-model", "mock")
+    conversations = [
+        Conversation.create_new(model=model, in_memory=True)
+        for _ in range(args.conversations)
+    ]
+    start = time.perf_counter()
+    results = await asyncio.gather(*(stream(c) for c in conversations))
+    elapsed = time.perf_counter() - start
+
+    # The last chunk is due once all tokens before it are streamed
+    rounds = 2 if args.tool_calls else 1
+    ideal = rounds * args.ttft + (
+        max(args.tokens - args.chunk_size, 0) / args.tokens_per_second
+        if args.tokens_per_second
+        else 0
+    )
+    ttfts = [ttft for ttft, _, _ in results]
+    durations = [duration for _, duration, _ in results]
+    chunks = sum(n for _, _, n in results)
+    median = statistics.median(durations)
+    if not args.replay_file:
+        report("ideal stream duration", ideal)
+    report("time to first token", statistics.median(ttfts), "(median)")
+    report("stream duration", median, "(median)")
+    report("", max(durations), "(max)")
+    if not args.replay_file:
+        report("overhead", median - ideal, "(median)")
+    print(f"{'chunks':<28} {chunks:8d} in {elapsed:.2f}s, {chunks / elapsed:.0f}/s")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--tokens", type=int, default=500)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--chunk-size", type=int, default=1)
+    parser.add_argument("--ttft", type=float, default=0.2)
+    parser.add_argument(
+        "--tool-calls", action="store_true", help="Call a function before answering"
+    )
+    parser.add_argument("--replay-file", help="Recording to replay")
+    parser.add_argument("--replay-speed", type=float, default=1.0)
+    args = parser.parse_args()
+
+    setup_logging("WARNING")
+    # Use the mock provider instead of the config.yml of the user
+    app_config._instance = AppConfig(
+        functions={"mock_lookup": {}} if args.tool_calls else {},
+        api_config=APIConfig(
+            mock=MockConfig(
+                ttft=args.ttft,
+                tokens_per_second=args.tokens_per_second,
+                chunk_size=args.chunk_size,
+                response_tokens=args.tokens,
+                tool_calls=[{"name": "mock_lookup", "arguments": {"key": "a"}}]
+                if args.tool_calls
+                else [],
+                seed=0,
+                replay_file=args.replay_file,
+                replay_speed=args.replay_speed,
+            )
+        ),
+    )
+    if args.replay_file:
+        print(
+            f"{args.conversations} conversations, replaying {args.replay_file} "
+            f"at speed {args.replay_speed}"
+        )
+    else:
+        print(
+            f"{args.conversations} conversations, {args.tokens} tokens at "
+            f"{args.tokens_per_second:.0f} tokens/s in chunks of {args.chunk_size}"
+        )
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Benchmark: time to first token of the first message, with and without pre-warming.
+
+Runs a local stub of the OpenAI chat completions API and points the openai provider
+at it (base_url). The stub delays each new connection to simulate the TCP and TLS
+handshakes with a remote API. Measured are
+
+- cold: the model instance is created and connected by the first request
+- pre-warmed: prewarm_models created the instance and opened a connection before
+
+The very first cold request also includes importing the provider SDK.
+Requires langchain-openai (pip install gptextual[all]).
+
+Usage:
+    python benchmarks/bench_prewarm.py [--connect-delay 0.15] [--runs 5]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.messages import HumanMessage
+
+import gptextual.config.app_config as app_config
+from gptextual.config.app_config import APIConfig, AppConfig, OpenAIConfig
+from gptextual.logging import setup_logging
+from gptextual.runtime.http_clients import aclose_http_clients
+from gptextual.runtime.models import ChatModel
+from gptextual.runtime.prewarm import prewarm_models
+
+
+def sse_body(words: list[str]) -> bytes:
+    events = []
+    for word in words:
+        chunk = {
+            "id": "chatcmpl-stub",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "gpt-4",
+            "choices": [
+                {"index": 0, "delta": {"content": word}, "finish_reason": None}
+            ],
+        }
+        events.append(f"data: {json.dumps(chunk)}\n\n")
+    events.append("data: [DONE]\n\n")
+    return "".join(events).encode("utf-8")
+
+
+BODY = sse_body(["Hello", " from", " the", " stub"])
+
+
+def make_handler(connect_delay: float):
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def setup(self):
+            # Simulates the handshakes of a new connection to a remote API
+            time.sleep(connect_delay)
+            super().setup()
+
+        def do_HEAD(self):
+            self.send_response(200)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Content-Length", str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+
+        def log_message(self, format, *args):
+            pass
+
+    return StubHandler
+
+
+async def time_to_first_token(model: ChatModel) -> float:
+    start = time.perf_counter()
+    first = None
+    async for _ in model.llm_model.astream([HumanMessage(content="Hi")]):
+        first = first or time.perf_counter() - start
+    return first
+
+
+async def new_model() -> ChatModel:
+    # Models of a provider share their connections, start without any
+    await aclose_http_clients()
+    return ChatModel(name="gpt-4", api_provider="openai", context_window=8192)
+
+
+async def run(runs: int):
+    first = await time_to_first_token(await new_model())
+    print(f"{'cold, incl. SDK import':<28} {first * 1000:8.1f}ms")
+
+    cold, warm, prewarm = [], [], []
+    for _ in range(runs):
+        cold.append(await time_to_first_token(await new_model()))
+
+        model = await new_model()
+        start = time.perf_counter()
+        await prewarm_models([model], connect=True)
+        prewarm.append(time.perf_counter() - start)
+        warm.append(await time_to_first_token(model))
+
+    print(f"{'cold':<28} {statistics.median(cold) * 1000:8.1f}ms (median)")
+    print(f"{'pre-warmed':<28} {statistics.median(warm) * 1000:8.1f}ms (median)")
+    print(
+        f"{'pre-warm in background':<28} {statistics.median(prewarm) * 1000:8.1f}ms (median)"
+    )
+    await aclose_http_clients()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connect-delay", type=float, default=0.15)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(args.connect_delay))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    setup_logging("WARNING")
+    # Use the stub instead of the config.yml of the user
+    app_config._instance = AppConfig(
+        api_config=APIConfig(
+            openai=OpenAIConfig(
+                api_key="sk-stub", base_url=f"http://127.0.0.1:{server.server_port}/v1"
+            )
+        )
+    )
+    print(f"Connection delay {args.connect_delay * 1000:.0f}ms, {args.runs} runs")
+    try:
+        asyncio.run(run(args.runs))
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
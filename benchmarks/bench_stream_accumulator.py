@@ -0,0 +1,72 @@
+"""
+Benchmark: accumulating a long streamed LLM response.
+
+Compares adding LangChain message chunks (chunk + chunk), as gptextual did before,
+with the StreamAccumulator, for a response of 50k streamed tokens. The accumulator
+is measured with a message built every few chunks (like the UI refresh) and only
+at the end of the stream.
+
+Usage:
+    python benchmarks/bench_stream_accumulator.py [--tokens 50000] [--refresh 3]
+"""
+
+import argparse
+import time
+
+from langchain_core.messages import AIMessageChunk
+
+from gptextual.runtime.langchain.streaming import StreamAccumulator
+
+
+def make_chunks(n_tokens: int):
+    words = ["lorem", " ipsum", " dolor", " sit", " amet", ",", " consectetur", "\n"]
+    return [AIMessageChunk(content=words[i % len(words)]) for i in range(n_tokens)]
+
+
+def naive(chunks):
+    message = None
+    for chunk in chunks:
+        message = chunk if message is None else message + chunk
+    return message
+
+
+def accumulated(chunks, refresh: int = 0):
+    accumulator = StreamAccumulator()
+    for i, chunk in enumerate(chunks):
+        accumulator.add(chunk)
+        if refresh and i % refresh == 0:
+            accumulator.message
+    return accumulator.message
+
+
+def measure(name, func, *args):
+    start = time.perf_counter()
+    message = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<40} {elapsed:8.3f}s")
+    return message
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tokens", type=int, default=50_000)
+    parser.add_argument("--refresh", type=int, default=3)
+    args = parser.parse_args()
+
+    chunks = make_chunks(args.tokens)
+    print(f"Streaming {args.tokens} tokens")
+    expected = measure("chunk + chunk", naive, chunks)
+    for message in (
+        measure("StreamAccumulator, built at end", accumulated, chunks),
+        measure(
+            f"StreamAccumulator, built every {args.refresh} chunks",
+            accumulated,
+            chunks,
+            args.refresh,
+        ),
+    ):
+        assert message.content == expected.content
+
+
+if __name__ == "__main__":
+    main()
@@ -1,41 +1,16 @@
 from __future__ import annotations
 
+import importlib
 import os
 from enum import Enum
 import yaml
 from pathlib import Path
-from typing import Optional, Dict
+from typing import Any, Optional, Dict, List
 import json
 
 from langchain_core.language_models import BaseLanguageModel
 from pydantic import BaseModel
 
-try:
-    from langchain_openai import ChatOpenAI as LangChainChatOpenAI
-except ImportError:
-    LangChainChatOpenAI = None
-
-try:
-    from langchain_google_genai import ChatGoogleGenerativeAI
-except ImportError:
-    ChatGoogleGenerativeAI = None
-
-try:
-    from langchain_anthropic import ChatAnthropic
-except ImportError:
-    ChatAnthropic = None
-
-
-try:
-    from gen_ai_hub.proxy.langchain.init_models import (
-        init_llm as sap_genai_create_langchain_llm,
-    )
-    from gen_ai_hub.proxy.core.proxy_clients import set_proxy_version
-except ImportError:
-    sap_genai_create_langchain_llm = None
-    set_proxy_version = None
-
-
 from gptextual.logging import logger
 
 SIZE_4K = 4096
@@ -45,11 +20,28 @@ SIZE_32K = 32768
 SIZE_128K = 128000
 
 
+def _import_optional(module: str, name: str):
+    """
+    Imports name from the SDK of an API provider, or returns None if the SDK is
+    not installed. The SDKs are slow to import, so this is only done when a model
+    of a configured provider is created.
+    """
+    try:
+        return getattr(importlib.import_module(module), name)
+    except ModuleNotFoundError as ex:
+        # Only a missing SDK means that it is not installed. Other import errors,
+        # e.g. of our wrappers of the SDKs, are raised.
+        if (ex.name or "").split(".")[0] == "gptextual":
+            raise
+        return None
+
+
 class APIProvider(str, Enum):
     SAP_GEN_AI = "gen-ai-hub"
     OPEN_AI = "openai"
     GOOGLE = "google"
     ANTHROPIC = "anthropic"
+    MOCK = "mock"
 
 
 class TextualConfig(BaseModel):
@@ -57,13 +49,60 @@ class TextualConfig(BaseModel):
     theme: Optional[str] = "light"
 
 
+class PrewarmConfig(BaseModel):
+    # Create the LLM clients in the background once the app is shown, so the first
+    # message does not wait for it
+    enabled: bool = False
+    # Besides the current model, pre-warm the models of this many recent conversations
+    recent_models: int = 2
+    # Also open a connection to the API of each model, to be reused by the first request
+    connect: bool = False
+
+
+class RuntimeConfig(BaseModel):
+    # How often a request rejected by the provider as too long for the context window
+    # is retried with a smaller token budget
+    context_overflow_retries: int = 2
+    # Maximum number of rounds of function calls per user message. The model is asked
+    # to answer without calling functions once they are used up.
+    max_function_call_rounds: int = 5
+    # Messages sent while a response is streaming are queued. Once it is complete,
+    # they are sent one at a time, or all in one request if this is set.
+    batch_pending_messages: bool = False
+    # Record the chunks of every streamed response with their timings, to
+    # ~/.gptextual/recordings/<conversation id>.jsonl.gz. The mock provider can
+    # replay the recordings (replay_file).
+    record_streams: bool = False
+    prewarm: Optional[PrewarmConfig] = PrewarmConfig()
+
+
 class ModelConfig(BaseModel):
     context_window: Optional[int] = SIZE_4K
+    # When a conversation outgrows the context window, old messages are dropped
+    # until it only fills this fraction of the window. Trimming in large blocks keeps
+    # the prompt prefix stable over many turns, so provider prompt caches can be hit.
+    context_trim_ratio: Optional[float] = 0.6
+    # Maximum number of tokens sent per request (prompt + reserved output tokens).
+    # Defaults to the context window. Smaller budgets trade context for latency.
+    request_token_budget: Optional[int] = None
+    # Context strategies applied in order before the conversation is trimmed to the
+    # token budget, by name with optional parameters. See gptextual.runtime.context
+    context_strategies: Optional[Dict[str, Optional[Dict[str, Any]]]] = {}
+    # Models that answer instead, as "model" of the same provider or "model@provider".
+    # A request is sent to the next fallback if this model fails, or has not streamed
+    # a token after hedge_after seconds. The first model to stream answers.
+    fallbacks: Optional[List[str]] = []
+    hedge_after: Optional[float] = None
 
 
 class APIProviderConfig(BaseModel):
     function_call_support: Optional[Dict[str, str]] = {}
     models: Optional[Dict[str, ModelConfig | None]] = {}
+    # Maximum number of connections of the pool shared by all models of the provider
+    max_connections: Optional[int] = None
+    # Rate limits of the provider, requests wait until they can be sent within them
+    requests_per_minute: Optional[int] = None
+    tokens_per_minute: Optional[int] = None
 
     def create_config_file(self): ...
 
@@ -75,6 +114,11 @@ class APIProviderConfig(BaseModel):
     def create_model_instance(self, model_name: str, **kwargs) -> BaseLanguageModel:
         return None
 
+    def _shared_http_client(self, api_provider: str):
+        from gptextual.runtime.http_clients import provider_http_client
+
+        return provider_http_client(api_provider, max_connections=self.max_connections)
+
 
 class GenAIHubConfig(APIProviderConfig):
     client_id: str
@@ -98,17 +142,24 @@ class GenAIHubConfig(APIProviderConfig):
         )
 
     def create_model_instance(self, model_name: str, **kwargs) -> BaseLanguageModel:
+        set_proxy_version = _import_optional(
+            "gen_ai_hub.proxy.core.proxy_clients", "set_proxy_version"
+        )
+        init_llm = _import_optional(
+            "gen_ai_hub.proxy.langchain.init_models", "init_llm"
+        )
         if set_proxy_version:
             set_proxy_version(APIProvider.SAP_GEN_AI.value)
-        return (
-            sap_genai_create_langchain_llm(model_name, **kwargs)
-            if sap_genai_create_langchain_llm
-            else None
-        )
+        return init_llm(model_name, **kwargs) if init_llm else None
 
 
 class OpenAIConfig(APIProviderConfig):
     api_key: str
+    # Overrides the API endpoint, e.g. for a proxy or a local mock server
+    base_url: Optional[str] = None
+    # Ask for the token usage of streamed responses, to log the prompt cache hits.
+    # It is no longer asked for once an (OpenAI compatible) API rejects it.
+    stream_usage: Optional[bool] = True
     models: Optional[Dict[str, ModelConfig | None]] = {
         "gpt-4-0125-preview": ModelConfig(context_window=SIZE_128K),
         "gpt-4-turbo-preview": ModelConfig(context_window=SIZE_128K),
@@ -118,15 +169,36 @@ class OpenAIConfig(APIProviderConfig):
     }
 
     def create_model_instance(self, model_name: str, **kwargs) -> BaseLanguageModel:
-        return (
-            LangChainChatOpenAI(model=model_name, openai_api_key=self.api_key, **kwargs)
-            if LangChainChatOpenAI
-            else None
+        ChatOpenAI = _import_optional(
+            "gptextual.runtime.langchain.chat_openai", "ChatOpenAIWithUsage"
+        )
+        AsyncOpenAI = _import_optional("openai", "AsyncOpenAI")
+        if ChatOpenAI is None or AsyncOpenAI is None:
+            return None
+        base_url = self.base_url or os.getenv("OPENAI_API_BASE")
+        if base_url:
+            kwargs["openai_api_base"] = base_url
+        # Stream over the connection pool shared by all OpenAI models. LangChain
+        # would pass an http_client to the sync client as well, so the async client
+        # is created with it and passed in.
+        async_client = AsyncOpenAI(
+            api_key=self.api_key,
+            base_url=base_url,
+            http_client=self._shared_http_client(APIProvider.OPEN_AI.value),
+        )
+        return ChatOpenAI(
+            model=model_name,
+            openai_api_key=self.api_key,
+            async_client=async_client.chat.completions,
+            stream_usage=self.stream_usage,
+            **kwargs,
         )
 
 
 class AnthropicConfig(APIProviderConfig):
     api_key: str
+    # Overrides the API endpoint, e.g. for a proxy or a local mock server
+    base_url: Optional[str] = None
     models: Optional[Dict[str, ModelConfig | None]] = {
         "claude-3-opus-20240229": ModelConfig(context_window=200000),
         "claude-3-sonnet-20240229": ModelConfig(context_window=200000),
@@ -135,11 +207,31 @@ class AnthropicConfig(APIProviderConfig):
     }
 
     def create_model_instance(self, model_name: str, **kwargs) -> BaseLanguageModel:
-        return (
-            ChatAnthropic(model=model_name, anthropic_api_key=self.api_key, **kwargs)
-            if ChatAnthropic
-            else None
+        ChatAnthropic = _import_optional(
+            "gptextual.runtime.langchain.chat_anthropic", "ChatAnthropicWithUsage"
+        )
+        if ChatAnthropic is None:
+            return None
+        if self.base_url:
+            kwargs["anthropic_api_url"] = self.base_url
+        llm = ChatAnthropic(model=model_name, anthropic_api_key=self.api_key, **kwargs)
+        # Stream over the connection pool shared by all Anthropic models. LangChain
+        # does not take an HTTP client, so the async client it created is replaced
+        # by a copy with the shared one, if it has the expected SDK client.
+        async_client = getattr(llm, "_async_client", None)
+        if not hasattr(async_client, "copy"):
+            logger().warning(
+                f"The Anthropic model {model_name} does not use the shared connection pool, its async client was not found"
+            )
+            return llm
+        object.__setattr__(
+            llm,
+            "_async_client",
+            async_client.copy(
+                http_client=self._shared_http_client(APIProvider.ANTHROPIC.value)
+            ),
         )
+        return llm
 
 
 class GoogleConfig(APIProviderConfig):
@@ -149,6 +241,9 @@ class GoogleConfig(APIProviderConfig):
     }
 
     def create_model_instance(self, model_name: str, **kwargs) -> BaseLanguageModel:
+        ChatGoogleGenerativeAI = _import_optional(
+            "langchain_google_genai", "ChatGoogleGenerativeAI"
+        )
         return (
             ChatGoogleGenerativeAI(
                 model=model_name,
@@ -161,11 +256,61 @@ class GoogleConfig(APIProviderConfig):
         )
 
 
+class MockConfig(APIProviderConfig):
+    """
+    Local mock provider, which streams responses without network access. For
+    benchmarks and for trying the UI and function calling offline.
+    """
+
+    # Seconds until the first chunk of a response
+    ttft: float = 0.2
+    # Streaming speed, 0 streams the response without delays
+    tokens_per_second: float = 50.0
+    # Number of tokens (words) per streamed chunk
+    chunk_size: int = 1
+    # The text of every response, or a file to read it from. Without either, a text
+    # of response_tokens words is generated.
+    response: Optional[str] = None
+    response_file: Optional[str] = None
+    response_tokens: int = 200
+    # Tool calls the model requests if the functions are offered, before it answers,
+    # e.g. [{name: get_weather, arguments: {city: Berlin}}]
+    tool_calls: Optional[List[Dict[str, Any]]] = []
+    # Fraction of requests that fail with an API error of status error_status
+    error_rate: float = 0.0
+    error_status: int = 500
+    # Seed of the random errors and generated texts, for reproducible runs
+    seed: Optional[int] = None
+    # Recording of streamed responses (see runtime.record_streams) to replay instead,
+    # one recorded stream per request. replay_speed 2 replays twice as fast, 0 as
+    # fast as possible.
+    replay_file: Optional[str] = None
+    replay_speed: float = 1.0
+    models: Optional[Dict[str, ModelConfig | None]] = {
+        "mock-model": ModelConfig(context_window=SIZE_16K),
+    }
+
+    def create_model_instance(self, model_name: str, **kwargs) -> BaseLanguageModel:
+        from gptextual.runtime.langchain.mock import MockChatModel
+
+        settings = self.dict(
+            exclude={
+                "function_call_support",
+                "models",
+                "max_connections",
+                "requests_per_minute",
+                "tokens_per_minute",
+            }
+        )
+        return MockChatModel(model_name=model_name, **settings, **kwargs)
+
+
 class APIConfig(BaseModel):
     gen_ai_hub: Optional[GenAIHubConfig] = None
     openai: Optional[OpenAIConfig] = None
     google: Optional[GoogleConfig] = None
     anthropic: Optional[AnthropicConfig] = None
+    mock: Optional[MockConfig] = None
 
     def _create_config_files(self):
         if self.gen_ai_hub:
@@ -176,8 +321,9 @@ _instance: AppConfig = None
 
 
 class AppConfig(BaseModel):
-    functions: Optional[Dict[str, Optional[Dict[str, str]]]] = {}
+    functions: Optional[Dict[str, Optional[Dict[str, Any]]]] = {}
     textual: Optional[TextualConfig] = TextualConfig()
+    runtime: Optional[RuntimeConfig] = RuntimeConfig()
     api_config: Optional[APIConfig] = APIConfig()
     log_level: Optional[str] = "INFO"
 
@@ -0,0 +1,323 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import csv
+import json
+import statistics
+import sys
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, TextIO
+
+from langchain_core.messages import HumanMessage
+
+from gptextual.config import AppConfig
+from gptextual.logging import logger, setup_logging
+from gptextual.runtime.conv_manager import ConversationManager
+from gptextual.runtime.fan_out import stream_with_metrics
+from gptextual.runtime.function_calling.executors import shutdown_process_pools
+from gptextual.runtime.function_calling.function_call_support import (
+    load_function_entry_points,
+)
+from gptextual.runtime.http_clients import aclose_http_clients, pool_stats
+from gptextual.runtime.langchain.schema import new_message_of_type
+from gptextual.runtime.models import ChatModel, ModelRegistry
+from gptextual.runtime.scheduler import scheduler_metrics
+from gptextual.runtime.tokenizer import count_tokens
+
+DEFAULT_CONCURRENCY = 4
+
+
+@dataclass
+class BatchPrompt:
+    index: int
+    prompt: str
+    id: str = None
+    model: str = None
+    system_message: str = None
+
+
+def read_prompts(path: Path) -> Iterator[BatchPrompt]:
+    """
+    Reads the prompts of a JSONL or CSV file (by file extension). Each line or row
+    has a prompt, and optionally an id, a model as name@api_provider and a system
+    message. A JSONL line may also be a plain string.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.suffix.lower() == ".csv":
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for index, row in enumerate(rows):
+            if isinstance(row, str):
+                row = {"prompt": row}
+            if not row.get("prompt"):
+                raise ValueError(f"Prompt {index} of {path} has no 'prompt' field")
+            yield BatchPrompt(
+                index=index,
+                prompt=row["prompt"],
+                id=row.get("id") or None,
+                model=row.get("model") or None,
+                system_message=row.get("system_message") or None,
+            )
+
+
+def resolve_model(name: str | None) -> ChatModel:
+    """Resolves a model given as name@api_provider, or name of the default provider"""
+    registry = ModelRegistry.get_instance()
+    if not name:
+        return registry.default_model
+    name, _, api_provider = name.rpartition("@")
+    if not name:
+        name, api_provider = api_provider, registry.default_model.api_provider
+    model = ModelRegistry.model_from_name(name, api_provider)
+    if model is None:
+        raise ValueError(
+            f"Configuration Error: Model {name}@{api_provider} is not configured"
+        )
+    return model
+
+
+class BatchRunner:
+    """
+    Sends prompts to the models, each in a new in-memory conversation, with at most
+    `concurrency` conversations in flight per API provider. Results are written to
+    the output as soon as they complete, so the output of an interrupted run is
+    still usable.
+    """
+
+    def __init__(
+        self,
+        output: TextIO,
+        *,
+        model: ChatModel,
+        concurrency: dict[str, int] = None,
+        default_concurrency: int = DEFAULT_CONCURRENCY,
+        system_message: str = None,
+    ) -> None:
+        self.output = output
+        self.model = model
+        self.concurrency = concurrency or {}
+        self.default_concurrency = default_concurrency
+        self.system_message = system_message
+        self.results: list[dict] = []
+        self.elapsed_seconds = 0.0
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    def _semaphore(self, api_provider: str) -> asyncio.Semaphore:
+        semaphore = self._semaphores.get(api_provider, None)
+        if semaphore is None:
+            limit = self.concurrency.get(api_provider, self.default_concurrency)
+            semaphore = self._semaphores[api_provider] = asyncio.Semaphore(
+                max(limit, 1)
+            )
+        return semaphore
+
+    async def run(self, prompts: list[BatchPrompt]) -> list[dict]:
+        start = time.monotonic()
+        await asyncio.gather(*(self._run_prompt(prompt) for prompt in prompts))
+        self.elapsed_seconds = time.monotonic() - start
+        return self.results
+
+    async def _run_prompt(self, prompt: BatchPrompt):
+        try:
+            model = resolve_model(prompt.model) if prompt.model else self.model
+        except ValueError as ex:
+            logger().error(f"Batch prompt {prompt.index} failed: {ex}")
+            result = {
+                **self._result(prompt, prompt.model),
+                "response": None,
+                "error": str(ex),
+            }
+        else:
+            async with self._semaphore(model.api_provider):
+                result = await self._progress(prompt, model)
+        self.results.append(result)
+        self.output.write(json.dumps(result, ensure_ascii=False) + "\n")
+        self.output.flush()
+
+    @staticmethod
+    def _result(prompt: BatchPrompt, model: str) -> dict:
+        return {
+            "index": prompt.index,
+            "id": prompt.id,
+            "model": model,
+            "prompt": prompt.prompt,
+        }
+
+    async def _progress(self, prompt: BatchPrompt, model: ChatModel) -> dict:
+        result = self._result(prompt, f"{model.name}@{model.api_provider}")
+        try:
+            conversation = ConversationManager.conversation_class.create_new(
+                model=model,
+                system_message=prompt.system_message or self.system_message,
+                in_memory=True,
+            )
+            input_tokens = conversation.context_token_count() + count_tokens(
+                prompt.prompt, model.name
+            )
+            response = await stream_with_metrics(
+                conversation, new_message_of_type(HumanMessage, content=prompt.prompt)
+            )
+        except Exception as ex:
+            logger().error(f"Batch prompt {prompt.index} failed: {ex}")
+            return {**result, "response": None, "error": str(ex)}
+
+        if response is None:
+            return {**result, "response": None, "error": "No response"}
+        failed = response.additional_kwargs.get("error", False)
+        return {
+            **result,
+            "response": response.content,
+            "answered_by": response.additional_kwargs.get("answered_by", None),
+            "error": response.content if failed else None,
+            "input_tokens": input_tokens,
+            **response.additional_kwargs.get("stream_metrics", {}),
+        }
+
+
+def _percentile(values: list[float], percentile: int) -> float | None:
+    if not values:
+        return None
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[percentile - 1]
+
+
+def summarize(results: list[dict], elapsed_seconds: float) -> dict:
+    """Throughput, latency percentiles and token usage of a batch run"""
+    succeeded = [r for r in results if not r["error"]]
+    latencies = sorted(r["latency_seconds"] for r in succeeded)
+    ttfts = sorted(r["ttft_seconds"] for r in succeeded)
+    output_tokens = sum(r.get("output_tokens", 0) for r in succeeded)
+    summary = {
+        "prompts": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "elapsed_seconds": round(elapsed_seconds, 3),
+        "prompts_per_second": round(len(results) / elapsed_seconds, 3)
+        if elapsed_seconds > 0
+        else None,
+        "output_tokens_per_second": round(output_tokens / elapsed_seconds, 1)
+        if elapsed_seconds > 0
+        else None,
+        "input_tokens": sum(r.get("input_tokens", 0) for r in succeeded),
+        "output_tokens": output_tokens,
+    }
+    for name, values in (("latency", latencies), ("ttft", ttfts)):
+        for percentile in (50, 90, 99):
+            value = _percentile(values, percentile)
+            summary[f"{name}_p{percentile}_seconds"] = (
+                round(value, 3) if value is not None else None
+            )
+    return summary
+
+
+def _print_summary(summary: dict, file: TextIO):
+    def seconds(key):
+        value = summary[key]
+        return f"{value:.2f}s" if value is not None else "-"
+
+    print(
+        f"{summary['prompts']} prompts, {summary['succeeded']} succeeded, "
+        f"{summary['failed']} failed in {summary['elapsed_seconds']:.2f}s",
+        file=file,
+    )
+    print(
+        f"Throughput: {summary['prompts_per_second'] or 0:.2f} prompts/s, "
+        f"{summary['output_tokens_per_second'] or 0:.1f} output tokens/s",
+        file=file,
+    )
+    for name, label in (("latency", "Latency"), ("ttft", "Time to first token")):
+        print(
+            f"{label}: p50 {seconds(f'{name}_p50_seconds')}, "
+            f"p90 {seconds(f'{name}_p90_seconds')}, "
+            f"p99 {seconds(f'{name}_p99_seconds')}",
+            file=file,
+        )
+    print(
+        f"Tokens: {summary['input_tokens']} input, {summary['output_tokens']} output",
+        file=file,
+    )
+
+
+def _parse_concurrency(values: list[str]) -> tuple[int, dict[str, int]]:
+    default, per_provider = DEFAULT_CONCURRENCY, {}
+    for value in values or []:
+        api_provider, _, limit = value.rpartition("=")
+        if api_provider:
+            per_provider[api_provider] = int(limit)
+        else:
+            default = int(limit)
+    return default, per_provider
+
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="gptx batch",
+        description="Sends the prompts of a JSONL or CSV file to a model without "
+        "the UI and writes the responses to a JSONL file.",
+    )
+    parser.add_argument("input", type=Path, help="JSONL or CSV file with prompts")
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=Path,
+        help="JSONL file for the results, standard output by default",
+    )
+    parser.add_argument(
+        "-m",
+        "--model",
+        help="Model as name@api_provider for prompts without a model, "
+        "the default model if not set",
+    )
+    parser.add_argument("-s", "--system-message", help="System message of all prompts")
+    parser.add_argument(
+        "-c",
+        "--concurrency",
+        action="append",
+        metavar="[API_PROVIDER=]N",
+        help="Maximum prompts in flight per API provider "
+        f"(default {DEFAULT_CONCURRENCY}), can be given per API provider, "
+        "e.g. -c openai=8 -c anthropic=2",
+    )
+    return parser.parse_args(argv)
+
+
+async def run_batch(args: argparse.Namespace) -> int:
+    prompts = list(read_prompts(args.input))
+    default_concurrency, concurrency = _parse_concurrency(args.concurrency)
+    model = resolve_model(args.model)
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        runner = BatchRunner(
+            output,
+            model=model,
+            concurrency=concurrency,
+            default_concurrency=default_concurrency,
+            system_message=args.system_message,
+        )
+        results = await runner.run(prompts)
+    finally:
+        if args.output:
+            output.close()
+        shutdown_process_pools()
+        pools = pool_stats()
+        await aclose_http_clients()
+
+    summary = summarize(results, runner.elapsed_seconds)
+    logger().info(
+        "Batch run finished",
+        extra={**summary, "schedulers": scheduler_metrics(), "pools": pools},
+    )
+    _print_summary(summary, sys.stderr)
+    return 1 if summary["failed"] else 0
+
+
+def main(argv: list[str] = None) -> int:
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    setup_logging(AppConfig.get_instance().log_level)
+    load_function_entry_points()
+    return asyncio.run(run_batch(args))
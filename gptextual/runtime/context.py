@@ -0,0 +1,238 @@
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Dict, List
+
+from langchain_core.messages import (
+    BaseMessage,
+    FunctionMessage,
+    SystemMessage,
+    ToolMessage,
+)
+
+from gptextual.config import APIProvider
+from gptextual.runtime.langchain.schema import is_function_or_tool_call
+from gptextual.runtime.tokenizer import truncate_text
+
+if TYPE_CHECKING:
+    from gptextual.runtime.conversation import Conversation
+
+# Central repository for context strategies, by the name used in the config.yml
+_CONTEXT_STRATEGIES = {}
+
+
+def register_context_strategy(name: str):
+    def decorator(cls):
+        _CONTEXT_STRATEGIES[name] = cls
+        return cls
+
+    return decorator
+
+
+def create_context_strategies(config: Dict[str, Dict | None] | None):
+    strategies = []
+    for name, params in (config or {}).items():
+        strategy_class = _CONTEXT_STRATEGIES.get(name, None)
+        if strategy_class is None:
+            raise ValueError(
+                f"Configuration Error: Unknown context strategy {name}. Available strategies: {', '.join(_CONTEXT_STRATEGIES)}"
+            )
+        strategies.append(strategy_class(**(params or {})))
+    return strategies
+
+
+class ContextStrategy:
+    """
+    Reduces the messages of a request before they are windowed to the token budget
+    of the model.
+
+    The messages are part of the conversation history, so strategies must not change
+    them in place but return copies instead. The system message and the trailing
+    placeholder for the streamed response (if any) have to be passed through as-is.
+    """
+
+    def reduce(
+        self,
+        messages: List[BaseMessage],
+        *,
+        budget: int,
+        conversation: Conversation,
+    ) -> List[BaseMessage]:
+        raise NotImplementedError
+
+
+def _is_history_message(message) -> bool:
+    return isinstance(message, BaseMessage) and not isinstance(message, SystemMessage)
+
+
+def _with_content(message: BaseMessage, content: str) -> BaseMessage:
+    return message.copy(update={"content": content})
+
+
+@register_context_strategy("cap_message_tokens")
+@dataclass
+class CapMessageTokens(ContextStrategy):
+    """Truncates every message to at most max_tokens, keeping its head and tail."""
+
+    max_tokens: int = 2000
+
+    def reduce(self, messages, *, budget, conversation):
+        return [
+            _with_content(
+                m, truncate_text(m.content, self.max_tokens, conversation.model.name)
+            )
+            if _is_history_message(m)
+            and isinstance(m.content, str)
+            and conversation._get_message_length(m) > self.max_tokens
+            else m
+            for m in messages
+        ]
+
+
+@register_context_strategy("truncate_stale_tool_results")
+@dataclass
+class TruncateStaleToolResults(ContextStrategy):
+    """
+    Truncates the results of all but the keep_last most recent function/tool calls
+    to max_tokens. The results are shortened rather than dropped, because the LLM APIs
+    reject tool calls without results.
+    """
+
+    keep_last: int = 1
+    max_tokens: int = 100
+
+    def reduce(self, messages, *, budget, conversation):
+        reduced = []
+        rounds = 0
+        for m in reversed(messages):
+            if (
+                isinstance(m, (ToolMessage, FunctionMessage))
+                and rounds >= self.keep_last
+                and isinstance(m.content, str)
+            ):
+                m = _with_content(
+                    m, truncate_text(m.content, self.max_tokens, conversation.model.name)
+                )
+            elif isinstance(m, BaseMessage) and is_function_or_tool_call(m):
+                rounds += 1
+            reduced.append(m)
+        reduced.reverse()
+        return reduced
+
+
+@register_context_strategy("middle_out")
+@dataclass
+class MiddleOut(ContextStrategy):
+    """
+    If the request exceeds the budget, drops messages from the middle of the
+    conversation, keeping the first keep_first messages after the system message
+    (which usually state the task) and as many of the newest messages as fit.
+    """
+
+    keep_first: int = 1
+
+    def reduce(self, messages, *, budget, conversation):
+        lengths = [conversation._get_message_length(m) for m in messages]
+        excess = sum(lengths) - budget
+        if excess <= 0:
+            return messages
+
+        head = 1 if messages and isinstance(messages[0], SystemMessage) else 0
+        head = min(head + self.keep_first, len(messages))
+        # Never drop the newest message or the streaming placeholder
+        tail = len(messages) - 1
+        if tail > head and not isinstance(messages[-1], BaseMessage):
+            tail -= 1
+
+        drop_end = head
+        while drop_end < tail and excess > 0:
+            excess -= lengths[drop_end]
+            drop_end += 1
+        # Don't keep results of calls that were dropped
+        while drop_end < tail and isinstance(
+            messages[drop_end], (ToolMessage, FunctionMessage)
+        ):
+            drop_end += 1
+
+        return messages[:head] + messages[drop_end:]
+
+
+@dataclass
+class ContextOverflow:
+    """A request was rejected by the provider as too long for the context window"""
+
+    # Maximum and requested number of tokens, if the provider reported them
+    limit: int | None = None
+    requested: int | None = None
+
+
+class ContextOverflowError(Exception):
+    def __init__(self, overflow: ContextOverflow, message: str) -> None:
+        super().__init__(message)
+        self.overflow = overflow
+
+
+_OPENAI_OVERFLOW_PATTERNS = [
+    re.compile(
+        r"maximum context length is (?P<limit>\d+) tokens.*?(?:resulted in|requested) (?P<requested>\d+) tokens",
+        re.DOTALL,
+    ),
+    re.compile(r"context_length_exceeded"),
+]
+
+_CONTEXT_OVERFLOW_PATTERNS = {
+    APIProvider.OPEN_AI: _OPENAI_OVERFLOW_PATTERNS,
+    # The SAP Gen AI Hub proxies OpenAI compatible models
+    APIProvider.SAP_GEN_AI: _OPENAI_OVERFLOW_PATTERNS,
+    APIProvider.ANTHROPIC: [
+        re.compile(
+            r"prompt is too long: (?P<requested>\d+) tokens > (?P<limit>\d+) maximum"
+        ),
+        re.compile(
+            r"exceed context limit: (?P<requested>\d+) \+ \d+ > (?P<limit>\d+)"
+        ),
+    ],
+    APIProvider.GOOGLE: [
+        re.compile(
+            r"input token count \((?P<requested>\d+)\) exceeds the maximum number of tokens allowed \((?P<limit>\d+)\)",
+            re.IGNORECASE,
+        ),
+        re.compile(r"exceeds the maximum number of tokens", re.IGNORECASE),
+    ],
+}
+
+# Used for providers without specific patterns
+_GENERIC_OVERFLOW_PATTERNS = [
+    re.compile(
+        r"context[_ ]length[_ ]exceeded|maximum context length|prompt is too long",
+        re.IGNORECASE,
+    )
+]
+
+
+def detect_context_overflow(api_provider: str, error: Exception) -> ContextOverflow | None:
+    """Returns a ContextOverflow if the error is the rejection of a too long request"""
+    message = str(error)
+    for pattern in _CONTEXT_OVERFLOW_PATTERNS.get(
+        api_provider, _GENERIC_OVERFLOW_PATTERNS
+    ):
+        match = pattern.search(message)
+        if match:
+            numbers = {
+                key: int(value) for key, value in match.groupdict().items() if value
+            }
+            return ContextOverflow(**numbers)
+    return None
+
+
+def reduced_budget(overflow: ContextOverflow, request_tokens: int) -> int:
+    """
+    Returns a token budget for retrying a request that was rejected as too long.
+    request_tokens is our own count of the tokens of the rejected request.
+    """
+    if overflow.limit and overflow.requested and overflow.requested > overflow.limit:
+        # Scale our count by the ratio of the limit to the provider's exact count,
+        # with some margin.
+        return int(request_tokens * overflow.limit / overflow.requested * 0.95)
+    return int(request_tokens * 0.75)
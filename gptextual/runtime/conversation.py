@@ -1,7 +1,10 @@
+import asyncio
 import glob
+from contextlib import aclosing
 from pathlib import Path
 import os
 import threading
+import time
 import logging
 from collections import deque
 from types import SimpleNamespace
@@ -26,21 +29,40 @@ from langchain_core.language_models import BaseLanguageModel
 
 from shortuuid import ShortUUID
 
+from gptextual.runtime.langchain.streaming import StreamAccumulator
 from gptextual.runtime.langchain.schema import (
+    called_function_names,
     is_function_or_tool_call,
     is_tool_related_message,
+    prompt_cache_usage,
 )
-from gptextual.runtime.function_calling import FunctionCallSupport
+from gptextual.runtime.function_calling import ToolManifest, get_tool_manifest
+from gptextual.runtime.context import (
+    ContextStrategy,
+    ContextOverflowError,
+    detect_context_overflow,
+    reduced_budget,
+)
+from gptextual.runtime.hedging import StreamsFailedError, first_to_stream
 from gptextual.runtime.models import ModelRegistry, ChatModel
+from gptextual.runtime.recording import StreamRecorder
+from gptextual.runtime.scheduler import Priority, get_scheduler, is_rate_limit_error
+from gptextual.config import AppConfig
 from gptextual.logging import logger
 
 
 @dataclass
 class StreamingMessage:
-    message: BaseMessage = None
+    accumulator: StreamAccumulator = field(default_factory=StreamAccumulator)
     additional_kwargs: dict = field(
         default_factory=lambda: {"timestamp": datetime.utcnow().timestamp()}
     )
+    # Progress of the function call rounds, shown by the UI while the response streams
+    status: str | None = None
+
+    @property
+    def message(self) -> BaseMessage | None:
+        return self.accumulator.message
 
 
 def ensure_list(x):
@@ -49,6 +71,12 @@ def ensure_list(x):
     return x
 
 
+def round_function_kwargs(manifest: ToolManifest | None, last_round: bool) -> dict:
+    if manifest is None:
+        return {}
+    return manifest.final_kwargs if last_round else manifest.kwargs
+
+
 conversation_path = Path.home() / (".gptextual") / "conversations"
 export_path = Path.home() / (".gptextual") / "exports"
 MESSAGE_COLUMNS = SimpleNamespace(
@@ -66,6 +94,8 @@ class Conversation:
     # In-memory conversations can be used for functions that spawn
     # side conversations with different LLMs. These should not be persisted.
     in_memory: bool = False
+    # Ids of the conversations the same prompt was sent to, see runtime.fan_out
+    linked_ids: list[str] = field(default_factory=list)
     messages: list[BaseMessage] = field(init=False, default_factory=list)
 
     def __post_init__(self):
@@ -73,6 +103,23 @@ class Conversation:
         self._dirty = False
         self._messages_lock = threading.Lock()
         self.uuid_gen = ShortUUID()
+        # Token counts by message id and content length. Messages do not change once
+        # appended, but context strategies may send shortened copies of them.
+        self._token_counts = {}
+        # Overrides the context strategies of the model for this conversation
+        self.context_strategies: list[ContextStrategy] | None = None
+        # Id of the oldest message sent in the last request, see _messages_for_context_size
+        self._context_start_id = None
+        # Token budgets of models which rejected a request as too long, by model
+        self._request_budgets: dict[ChatModel, int] = {}
+        # Messages sent while the conversation is progressing, see enqueue
+        self.pending: list[BaseMessage] = []
+        self._progressing = False
+        # Set by reserve_progress until progress is called
+        self._reserved = False
+        # The model that answered the last request, and the fallbacks it was sent to
+        self._answered_by: ChatModel | None = None
+        self._hedged_to: list[str] = []
 
     def __len__(self):
         return len(self.messages)
@@ -163,16 +210,92 @@ class Conversation:
     def progress(self, messages: BaseMessage | List[BaseMessage], *, autosave=True):
         return self._progress_llm(messages=messages, autosave=autosave)
 
+    @property
+    def is_progressing(self) -> bool:
+        """Whether a turn is streaming or queued messages are waiting to be sent"""
+        return self._progressing
+
+    def reserve_progress(self) -> bool:
+        """
+        Marks the conversation as progressing ahead of the progress call, e.g. when
+        the call is made by a worker that starts later, so messages sent in the
+        meantime are queued. Returns False if the conversation is progressing
+        already, the message has to be queued with enqueue then.
+        """
+        with self._messages_lock:
+            if self._progressing:
+                return False
+            self._progressing = self._reserved = True
+            return True
+
+    def enqueue(self, messages: BaseMessage | List[BaseMessage]):
+        """
+        Queues messages sent while the conversation is progressing. They are sent when
+        the current turn is complete, and discarded if it is cancelled.
+        """
+        with self._messages_lock:
+            self.pending.extend(ensure_list(messages))
+
+    def take_pending(self, *, batch: bool = False) -> list[BaseMessage]:
+        """The next queued message, or with batch all queued messages"""
+        with self._messages_lock:
+            count = len(self.pending) if batch else min(len(self.pending), 1)
+            taken, self.pending = self.pending[:count], self.pending[count:]
+        return taken
+
     async def _progress_llm(
         self, messages: BaseMessage | List[BaseMessage], *, autosave=True
     ):
+        """
+        Sends the messages to the model and streams the response, see _progress_turn.
+
+        Messages sent while the conversation is progressing are queued and sent in
+        further turns once the current one is complete, one at a time or with
+        runtime.batch_pending_messages all in one request.
+        """
+        if self._reserved:
+            self._reserved = False
+        elif self._progressing:
+            logger().info(
+                f"Conversation {self.title or self.id} is already streaming, the message is queued",
+                extra={"pending": len(self.pending) + 1},
+            )
+            self.enqueue(messages)
+            return
+
+        self._progressing = True
         try:
-            if self.streaming_message:
+            batch = AppConfig.get_instance().runtime.batch_pending_messages
+            while messages:
+                async with aclosing(
+                    self._progress_turn(messages, autosave=autosave)
+                ) as turn:
+                    async for chunk in turn:
+                        yield chunk
+                messages = self.take_pending(batch=batch)
+        except (asyncio.CancelledError, GeneratorExit):
+            discarded = self.take_pending(batch=True)
+            if discarded:
                 logger().info(
-                    f"Conversation {self.title or self.id} is already streaming, but another message was sent to it: {messages}"
+                    f"Discarded {len(discarded)} queued messages of conversation {self.title or self.id}"
                 )
-                return
+            raise
+        finally:
+            self._progressing = False
 
+    async def _progress_turn(
+        self, messages: BaseMessage | List[BaseMessage], *, autosave=True
+    ):
+        """
+        Sends the messages to the model and streams its response.
+
+        When the model calls functions, their results are sent back to it in further
+        rounds, until it answers without function calls or the
+        runtime.max_function_call_rounds are used up. In the last round, the model is
+        asked to answer without calling functions. Each round is timed, see the
+        function_call_rounds kwarg of the answer.
+        """
+        try:
             messages = ensure_list(messages)
 
             for m in messages:
@@ -181,62 +304,276 @@ class Conversation:
                         "Conversation can only be progressed by human or function/tool messages"
                     )
 
+            manifest = get_tool_manifest(
+                model_name=self.model.name, api_provider=self.model.api_provider
+            )
+            fallbacks = [
+                (
+                    model,
+                    get_tool_manifest(
+                        model_name=model.name, api_provider=model.api_provider
+                    ),
+                )
+                for model in self.model.fallback_models()
+            ]
+            runtime_config = AppConfig.get_instance().runtime
+            max_retries = runtime_config.context_overflow_retries
+
             self.append(messages)
-            response = StreamingMessage()
-            self.append(response)
+            streaming = StreamingMessage()
+            self.append(streaming)
+            context = self._messages_for_context_size(self.messages)
             chunks = 0
-            async for chunk in self._stream_llm(
-                self._messages_for_context_size(self.messages)[:-1]
-            ):
-                response.message = (
-                    chunk if response.message is None else response.message + chunk
+            rounds = []
+            full_result_paths = []
+            while True:
+                last_round = len(rounds) >= runtime_config.max_function_call_rounds
+                kwargs = round_function_kwargs(manifest, last_round)
+                hedges = [
+                    (model, round_function_kwargs(fallback_manifest, last_round))
+                    for model, fallback_manifest in fallbacks
+                ]
+                retries = 0
+                first_attempt = attempt = time.monotonic()
+                while True:
+                    try:
+                        async with aclosing(
+                            self._stream_llm(
+                                context[:-1],
+                                function_kwargs=kwargs,
+                                hedges=hedges,
+                                raise_on_overflow=retries < max_retries,
+                            )
+                        ) as stream:
+                            async for chunk in stream:
+                                streaming.accumulator.add(chunk)
+
+                                if self.on_stream_chunk:
+                                    await self.on_stream_chunk(streaming, chunks)
+                                chunks += 1
+                                yield streaming
+                        break
+                    except ContextOverflowError as ex:
+                        # The provider counted more tokens than we did, retry
+                        # with a window that fits into a smaller budget, which is
+                        # kept for the later rounds and turns
+                        retries += 1
+                        budget = reduced_budget(
+                            ex.overflow,
+                            sum(self._get_message_length(m) for m in context),
+                        )
+                        self._request_budgets[self.model] = budget
+                        attempt = time.monotonic()
+                        logger().warning(
+                            f"Request to model {self.model.name}@{self.model.api_provider} exceeded the context window. Retrying with a token budget of {budget}.",
+                            extra={
+                                "limit": ex.overflow.limit,
+                                "requested": ex.overflow.requested,
+                                "retry": retries,
+                            },
+                        )
+                        context = self._messages_for_context_size(self.messages)
+                model_seconds = time.monotonic() - first_attempt
+
+                self.messages.pop()
+                response = streaming.message
+                # The functions are called in the format of the model that answered
+                answered_by, function_calling = self.model, manifest
+                for model, fallback_manifest in fallbacks:
+                    if model is self._answered_by:
+                        answered_by, function_calling = model, fallback_manifest
+                function_calling = (
+                    function_calling.function_call_support if function_calling else None
                 )
-
+                if response:
+                    if answered_by is not self.model:
+                        response.additional_kwargs[
+                            "answered_by"
+                        ] = f"{answered_by.name}@{answered_by.api_provider}"
+                    if self._hedged_to:
+                        response.additional_kwargs["hedged_to"] = self._hedged_to
+                    if retries:
+                        response.additional_kwargs["context_overflow_retries"] = retries
+                        response.additional_kwargs[
+                            "context_overflow_retry_seconds"
+                        ] = round(attempt - first_attempt, 3)
+                    self.append(response)
+                    self._log_prompt_cache_usage(response)
+
+                if not (
+                    function_calling and response and is_function_or_tool_call(response)
+                ):
+                    break
+                if last_round:
+                    # Calls without results would make the next request invalid
+                    logger().warning(
+                        f"Model {self.model.name}@{self.model.api_provider} called functions after the last allowed round, the calls are ignored"
+                    )
+                    response.additional_kwargs.pop("tool_calls", None)
+                    response.additional_kwargs.pop("function_call", None)
+                    break
+
+                # Marks the conversation as streaming while the functions run
+                round_no = len(rounds) + 1
+                names = ", ".join(called_function_names(response))
+                streaming = StreamingMessage(
+                    status=f"Round {round_no}: calling {names}"
+                )
+                self.append(streaming)
                 if self.on_stream_chunk:
-                    await self.on_stream_chunk(response, chunks)
-                chunks += 1
-                yield response
+                    await self.on_stream_chunk(streaming, chunks)
 
-            self.messages.pop()
-            response = response.message
-            if response:
-                self.append(response)
-
-            function_calling = FunctionCallSupport.forModelName(
-                model_name=self.model.name, api_provider=self.model.api_provider
-            )
-            function_results = (
-                await function_calling.execute_function_call(response)
-                if function_calling
-                else None
-            )
+                functions_start = time.monotonic()
+                function_results = ensure_list(
+                    await function_calling.execute_function_call(
+                        response, model_name=answered_by.name
+                    )
+                    or []
+                )
+                function_seconds = time.monotonic() - functions_start
+                if not function_results:
+                    self.messages.pop()
+                    break
+
+                rounds.append(
+                    {
+                        "round": round_no,
+                        "functions": names,
+                        "model_seconds": round(model_seconds, 3),
+                        "function_seconds": round(function_seconds, 3),
+                    }
+                )
+                logger().info(
+                    f"Function call round {round_no} of model {self.model.name}@{self.model.api_provider}",
+                    extra=rounds[-1],
+                )
+                full_result_paths.extend(
+                    m.additional_kwargs["full_result_path"]
+                    for m in function_results
+                    if "full_result_path" in m.additional_kwargs
+                )
 
-            if function_results:
-                async for resp in self._progress_llm(function_results, autosave=False):
-                    response = resp
-                    yield response
-            else:
-                response.additional_kwargs["timestamp"] = datetime.utcnow().timestamp()
+                self.messages.pop()
+                self.append(function_results)
+                self.append(streaming)
+                streaming.status = (
+                    f"Round {round_no}: {names} returned after {function_seconds:.1f}s"
+                )
                 if self.on_stream_chunk:
-                    await self.on_stream_chunk(response, chunks)
-                yield response
+                    await self.on_stream_chunk(streaming, chunks)
+                context = self._extend_context(
+                    context, [response, *function_results, streaming]
+                )
+
+            if rounds:
+                response.additional_kwargs["function_call_rounds"] = rounds
+            if full_result_paths:
+                # Lets the user look up the full results in the message details
+                response.additional_kwargs["full_tool_results"] = full_result_paths
+            response.additional_kwargs["timestamp"] = datetime.utcnow().timestamp()
+            if self.on_stream_chunk:
+                await self.on_stream_chunk(response, chunks)
+            yield response
 
             if autosave:
                 self.save(in_background=True)
 
+        except (asyncio.CancelledError, GeneratorExit):
+            # Cancelled by the user, or the caller stopped consuming the stream
+            self._keep_cancelled_response()
+            if autosave:
+                self.save(in_background=True)
+            raise
         except Exception as ex:
             logger().error(f"Error progressing the LLM conversation: {ex}")
-            yield AIMessageChunk(content=f"There was conversation error, {ex}")
-
-    async def _stream_llm(self, messages):
-        try:
-            function_kwargs = {}
-            function_calling = FunctionCallSupport.forModelName(
-                model_name=self.model.name, api_provider=self.model.api_provider
+            yield AIMessageChunk(
+                content=f"There was conversation error, {ex}",
+                additional_kwargs={"error": True},
             )
-            if function_calling:
-                function_kwargs = function_calling.get_kwargs()
 
+    def _keep_cancelled_response(self) -> BaseMessage | None:
+        """
+        Replaces the streaming message with the part of the response streamed before
+        the user cancelled it, marked as truncated. Function calls of the response
+        are removed, as calls without results would make the next request invalid.
+        """
+        streaming = self.streaming_message
+        if streaming is None:
+            return None
+        self.messages.pop()
+        if streaming.message is not None:
+            self.append(streaming.message)
+        response = self.messages[-1] if self.messages else None
+        if not isinstance(response, AIMessage):
+            return None
+
+        response.additional_kwargs.pop("tool_calls", None)
+        response.additional_kwargs.pop("function_call", None)
+        response.additional_kwargs["truncated"] = True
+        response.additional_kwargs["timestamp"] = datetime.utcnow().timestamp()
+        self.set_dirty()
+        logger().info(
+            f"Response of model {self.model.name}@{self.model.api_provider} was cancelled",
+            extra={"conversation_id": self.id, "content_length": len(response.content)},
+        )
+        return response
+
+    @property
+    def request_budget(self) -> int:
+        """
+        The token budget of requests to the model, or the smaller budget which the
+        model accepted after it rejected a request as too long
+        """
+        return self._request_budgets.get(self.model, self.model.request_budget)
+
+    def _extend_context(
+        self, context: list[BaseMessage], messages: list[BaseMessage]
+    ) -> list[BaseMessage]:
+        """
+        Replaces the streaming message at the end of the context window of the
+        previous round with the messages of the next round. The window is only built
+        again if they do not fit, so the context strategies and trimming run once
+        per turn instead of once per round.
+        """
+        extended = context[:-1] + messages
+        if sum(self._get_message_length(m) for m in extended) <= self.request_budget:
+            return extended
+        return self._messages_for_context_size(self.messages)
+
+    async def _stream_llm(
+        self,
+        messages,
+        *,
+        function_kwargs: dict = None,
+        hedges: list[tuple[ChatModel, dict]] = None,
+        raise_on_overflow=False,
+    ):
+        """
+        Streams the response of the model to the given messages, with the function
+        definitions in function_kwargs.
+
+        The hedges are fallback models with their function definitions. The request
+        is sent to the next one if the previous models failed, or did not stream
+        within the hedge_after seconds of the model. The first model to stream
+        answers, see _answered_by.
+
+        Errors are yielded as the content of a response chunk. If raise_on_overflow is
+        set, a rejection of the request as too long for the context window is raised
+        as ContextOverflowError instead, so the request can be retried.
+
+        The request waits for the rate limits of the API provider, with priority if
+        the conversation is in the foreground. With runtime.record_streams, the chunks
+        and their timings are recorded, see StreamRecorder.
+        """
+        streaming = False
+        function_kwargs = function_kwargs or {}
+        self._answered_by, self._hedged_to = self.model, []
+        recorder = (
+            StreamRecorder(self.id, len(messages))
+            if AppConfig.get_instance().runtime.record_streams
+            else None
+        )
+        try:
             if logger().getEffectiveLevel() <= logging.INFO:
                 log_msg = messages[-3:] if len(messages) >= 3 else [*messages]
                 log_msg.reverse()
@@ -267,55 +604,209 @@ class Conversation:
                     f"Cannot get message from unknown chunk type {chunk.__class__}"
                 )
 
-            async for chunk in self.model.llm_model.astream(
-                messages, **function_kwargs
-            ):
-                try:
-                    yield to_message(chunk)
-                except Exception as ex:
-                    raise ex
+            models = [(self.model, function_kwargs), *(hedges or [])]
+
+            def start_stream(model: ChatModel, kwargs: dict):
+                def start():
+                    if model is not self.model:
+                        self._hedged_to.append(f"{model.name}@{model.api_provider}")
+                        logger().info(
+                            f"Sending the request to model {model.name}@{model.api_provider}, the fallback of model {self.model.name}@{self.model.api_provider}"
+                        )
+                    return self._model_stream(model, messages, kwargs)
+
+                return start
+
+            async with aclosing(
+                first_to_stream(
+                    [start_stream(model, kwargs) for model, kwargs in models],
+                    hedge_after=self.model.hedge_after,
+                )
+            ) as stream:
+                async for index, chunk in stream:
+                    streaming = True
+                    self._answered_by = models[index][0]
+                    message = to_message(chunk)
+                    if recorder:
+                        recorder.add(message)
+                    yield message
+            if recorder:
+                recorder.completed = True
         except Exception as ex:
+            # The errors of the models that failed, each detected in the format of
+            # its API provider
+            errors = (
+                [(models[index][0], error) for index, error in ex.errors]
+                if isinstance(ex, StreamsFailedError)
+                else [(self.model, ex)]
+            )
+            if recorder:
+                recorder.error = errors[0][1]
+            if raise_on_overflow and not streaming:
+                for model, error in errors:
+                    overflow = detect_context_overflow(model.api_provider, error)
+                    if overflow:
+                        raise ContextOverflowError(overflow, str(error)) from error
             logger().error(f"Error during LLM streaming: {ex}")
             yield AIMessageChunk(
-                content=f"There was an error streaming the LLM response, {ex}"
+                content=f"There was an error streaming the LLM response, {ex}",
+                additional_kwargs={"error": True},
+            )
+        finally:
+            if recorder:
+                model = self._answered_by
+                recorder.save_in_background(f"{model.name}@{model.api_provider}")
+
+    async def _model_stream(self, model: ChatModel, messages, function_kwargs: dict):
+        """Streams the response of one model within the rate limits of its provider"""
+        scheduler = get_scheduler(model.api_provider)
+        # Providers count the requested output tokens against their limits too
+        await scheduler.acquire(
+            sum(self._get_message_length(m) for m in messages)
+            + model.default_max_tokens,
+            priority=(
+                Priority.FOREGROUND
+                if self.id == Conversation.foreground_id
+                else Priority.BACKGROUND
+            ),
+        )
+        try:
+            # Closing the stream when it is abandoned, e.g. cancelled by the user,
+            # releases the connection of the provider SDK right away
+            async with aclosing(
+                model.llm_model.astream(messages, **function_kwargs)
+            ) as stream:
+                async for chunk in stream:
+                    yield chunk
+        except Exception as ex:
+            if is_rate_limit_error(ex):
+                scheduler.report_rate_limited()
+            raise
+
+    def _log_prompt_cache_usage(self, response: BaseMessage):
+        cached_tokens, prompt_tokens = prompt_cache_usage(response)
+        if prompt_tokens:
+            logger().info(
+                f"Prompt cache usage for model {self.model.name}@{self.model.api_provider}",
+                extra={
+                    "conversation_id": self.id,
+                    "cached_tokens": cached_tokens,
+                    "prompt_tokens": prompt_tokens,
+                    "cache_hit_rate": round(cached_tokens / prompt_tokens, 3),
+                },
             )
 
+    def context_token_count(self) -> int:
+        """
+        Returns the number of tokens of the conversation messages that would be sent
+        with the next request. Token counts are cached per message, so this is cheap
+        to call repeatedly. It does not move the context window of the requests, so
+        it can be called from other threads, e.g. by the token meter.
+        """
+        with self._messages_lock:
+            messages = [
+                m for m in self.messages if not isinstance(m, StreamingMessage)
+            ]
+        return sum(
+            self._get_message_length(m)
+            for m in self._messages_for_context_size(messages, update_start=False)
+        )
+
     def _get_message_length(self, message: BaseMessage) -> int:
         if isinstance(message, StreamingMessage):
             return self.model.default_max_tokens
-        else:
-            model_name = self.model.name
-            model = self.model.llm_model
-            return Conversation.get_num_tokens_from_messages(
-                messages=message, model_name=model_name, model=model
-            )[0]
+
+        message_id = message.additional_kwargs.get("id", None)
+        key = (message_id, len(message.content))
+        if key in self._token_counts:
+            return self._token_counts[key]
+
+        model_name = self.model.name
+        model = self.model.llm_model
+        length = Conversation.get_num_tokens_from_messages(
+            messages=message, model_name=model_name, model=model
+        )[0]
+        if message_id:
+            self._token_counts[key] = length
+        return length
 
     def _messages_for_context_size(
-        self, messages: list[BaseMessage]
+        self,
+        messages: list[BaseMessage],
+        *,
+        budget: int | None = None,
+        update_start: bool = True,
     ) -> list[BaseMessage]:
-        """Returns a list of messages that fit within the context window."""
+        """
+        Returns a list of messages that fit within the token budget of the model,
+        or the given budget.
+
+        The context strategies of the conversation (or its model) are applied first.
+        Then, the oldest message of the window is kept across turns for as long as the
+        conversation still fits. Once it does not, the window is moved forward in one
+        large block (see ChatModel.context_trim_ratio), so the prompt prefix after the
+        system message stays identical over many requests.
+
+        Only requests move the window. Without update_start, the window is computed
+        without side effects, e.g. for counting tokens outside of a request.
+        """
 
         if not messages:
             return []
 
-        context_messages = deque()
+        budget = budget or self.request_budget
+        strategies = (
+            self.context_strategies
+            if self.context_strategies is not None
+            else self.model.context_strategies
+        )
+        for strategy in strategies:
+            messages = strategy.reduce(messages, budget=budget, conversation=self)
 
         system_message = messages[0] if isinstance(messages[0], SystemMessage) else None
-        length_available = self.model.context_window
+        history = messages[1:] if system_message else messages
+        length_available = budget
         if system_message:
             length_available -= self._get_message_length(system_message)
             if length_available < 0:
-                raise ValueError("System message is too long for context window")
+                raise ValueError("System message is too long for the token budget")
+
+        lengths = [self._get_message_length(m) for m in history]
+
+        def newest_fitting(limit):
+            start, used = len(history), 0
+            for i in reversed(range(len(history))):
+                if used + lengths[i] > limit:
+                    break
+                used += lengths[i]
+                start = i
+            return start
+
+        start = 0
+        if self._context_start_id is not None:
+            for i, m in enumerate(history):
+                if m.additional_kwargs.get("id", None) == self._context_start_id:
+                    start = i
+                    break
+
+        if sum(lengths[start:]) > length_available:
+            start = newest_fitting(length_available * self.model.context_trim_ratio)
+            if start >= len(history) - 1:
+                # Not even the newest message fits the trim target, fall back
+                # on keeping as many messages as the context window allows
+                start = newest_fitting(length_available)
+
+        # Never start the window with results of a call that is no longer part of it
+        while start < len(history) and isinstance(
+            history[start], (ToolMessage, FunctionMessage)
+        ):
+            start += 1
+
+        context_messages = deque(history[start:])
+        if update_start and start < len(history):
+            self._context_start_id = history[start].additional_kwargs.get("id", None)
 
-        for message in reversed(messages):
-            message_length = self._get_message_length(message)
-            if message_length <= length_available:
-                context_messages.appendleft(message)
-                length_available -= message_length
-            else:
-                break
-
-        if context_messages and context_messages[0] is not system_message:
+        if system_message:
             context_messages.appendleft(system_message)
 
         return list(context_messages)
@@ -335,6 +826,7 @@ class Conversation:
                     "api_provider": self.model.api_provider,
                     "title": self.title,
                     "create_timestamp": self.create_timestamp,
+                    "linked_ids": self.linked_ids,
                 }
 
                 # Save the data to a JSON file
@@ -596,3 +1088,5 @@ Do not escape markdown as codeblocks using '`' chars.Messages will be rendered a
 
 
 Conversation.search_df = None
+# Id of the conversation shown in the chat, its requests are scheduled first
+Conversation.foreground_id = None
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import time
+
+from langchain_core.messages import BaseMessage, HumanMessage
+
+from gptextual.logging import logger
+from gptextual.runtime.conv_manager import ConversationManager
+from gptextual.runtime.conversation import Conversation, StreamingMessage
+from gptextual.runtime.models import ChatModel
+from gptextual.runtime.tokenizer import count_tokens
+
+
+def create_fan_out_conversations(
+    models: list[ChatModel], *, system_message: str = None
+) -> list[Conversation]:
+    """
+    Creates an in-memory conversation per model for sending one prompt to all of
+    them. They are only persisted by save_linked_conversations.
+    """
+    return [
+        ConversationManager.conversation_class.create_new(
+            model=model, system_message=system_message, in_memory=True
+        )
+        for model in models
+    ]
+
+
+async def stream_with_metrics(
+    conversation: Conversation, message: HumanMessage
+) -> BaseMessage | None:
+    """
+    Progresses the conversation with the message and times the response. The time to
+    the first token, the latency and the output tokens per second are stored as the
+    stream_metrics kwarg of the response.
+    """
+    start = time.monotonic()
+    first_token = None
+    response = None
+    async for chunk in conversation.progress(message.copy(deep=True), autosave=False):
+        if isinstance(chunk, StreamingMessage):
+            if first_token is None and chunk.message and chunk.message.content:
+                first_token = time.monotonic()
+        else:
+            response = chunk
+    end = time.monotonic()
+    if response is None:
+        return None
+
+    model = conversation.model
+    output_tokens = count_tokens(response.content or "", model.name)
+    streaming_seconds = end - (first_token or start)
+    metrics = {
+        "ttft_seconds": round((first_token or end) - start, 3),
+        "latency_seconds": round(end - start, 3),
+        "output_tokens": output_tokens,
+        "tokens_per_second": round(output_tokens / streaming_seconds, 1)
+        if streaming_seconds > 0
+        else None,
+    }
+    response.additional_kwargs["stream_metrics"] = metrics
+    logger().info(
+        f"Response of model {model.name}@{model.api_provider}", extra=metrics
+    )
+    return response
+
+
+def save_linked_conversations(conversations: list[Conversation]) -> list[str]:
+    """
+    Persists the fan-out conversations, each linked to the others, and adds them to
+    the conversation list. Conversations that were not sent a prompt are skipped.
+    """
+    conversations = [c for c in conversations if c.last_message_of_types(HumanMessage)]
+    ids = [c.id for c in conversations]
+    for conversation in conversations:
+        conversation.in_memory = False
+        conversation.linked_ids = [id for id in ids if id != conversation.id]
+        conversation.set_dirty()
+        ConversationManager.conversations[conversation.id] = conversation
+        conversation.save(in_background=False)
+    return ids
@@ -3,4 +3,7 @@ from .function_call_support import (
     register_for_function_calling,  # noqa: F401
     get_function_config,  # noqa: F401
     get_function,  # noqa: F401
+    get_http_client,  # noqa: F401
+    get_tool_manifest,  # noqa: F401
+    ToolManifest,  # noqa: F401
 )
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from enum import Enum
+from inspect import iscoroutine
+
+# Warm process pools, by function name
+_PROCESS_POOLS = {}
+# The warm-up calls of the process pools, done once a worker process is ready
+_WARM_UPS: dict[str, list[Future]] = {}
+
+
+class ExecutionMode(str, Enum):
+    INLINE = "inline"  # called on the event loop
+    THREAD = "thread"  # called in a thread pool
+    PROCESS = "process"  # called in a separate process
+
+
+def run_to_completion(func, arguments: dict):
+    """Calls func, running it on an event loop of its own if it is async"""
+    result = func(**arguments)
+    if iscoroutine(result):
+        result = asyncio.run(result)
+    return result
+
+
+def _noop():
+    return None
+
+
+def _process_pool(function_name: str, processes: int) -> ProcessPoolExecutor:
+    pool = _PROCESS_POOLS.get(function_name, None)
+    if pool is None:
+        # Forking the multi-threaded UI process is unsafe, so workers are spawned.
+        # Spawning takes about a second, so the workers are started right away.
+        pool = _PROCESS_POOLS[function_name] = ProcessPoolExecutor(
+            max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+        )
+        _WARM_UPS[function_name] = [pool.submit(_noop) for _ in range(processes)]
+    return pool
+
+
+def warm_up_process_pool(function_name: str, processes: int = 1):
+    """Starts the worker processes of a function, before its first call"""
+    _process_pool(function_name, processes)
+
+
+async def process_pool_ready(function_name: str, processes: int = 1):
+    """
+    Waits until a worker process of the function is ready, so the startup of the
+    pool does not count against the timeout of a call. Failed warm-ups are ignored,
+    the call fails with the error of the pool.
+    """
+    _process_pool(function_name, processes)
+    warm_ups = [asyncio.wrap_future(f) for f in _WARM_UPS.get(function_name, [])]
+    if warm_ups:
+        await asyncio.wait(warm_ups, return_when=asyncio.FIRST_COMPLETED)
+
+
+async def run_in_process(
+    function_name: str, func, arguments: dict, *, processes: int = 1
+):
+    """
+    Runs func in the process pool of the function. The function and its result
+    have to be picklable, i.e. defined at module level.
+    """
+    pool = _process_pool(function_name, processes)
+    return await asyncio.get_running_loop().run_in_executor(
+        pool, run_to_completion, func, arguments
+    )
+
+
+def kill_process_pool(function_name: str):
+    """
+    Kills the worker processes of a function. A new pool is started on the next
+    call, see restart_process_pool to start it right away.
+    """
+    pool = _PROCESS_POOLS.pop(function_name, None)
+    _WARM_UPS.pop(function_name, None)
+    if pool is None:
+        return
+    # The executor API has no way to stop a running call, so terminate the workers
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def restart_process_pool(function_name: str, processes: int = 1):
+    """
+    Kills the worker processes of a function, e.g. when a call did not return in
+    time, and starts new ones for the next calls
+    """
+    kill_process_pool(function_name)
+    warm_up_process_pool(function_name, processes)
+
+
+def shutdown_process_pools():
+    for function_name in list(_PROCESS_POOLS):
+        kill_process_pool(function_name)
@@ -1,10 +1,14 @@
 from __future__ import annotations
 
-import pkg_resources
+import asyncio
+import inspect
 from asyncio import iscoroutine
+from dataclasses import dataclass
 from enum import Enum
 from functools import cache
 from typing import List
+from weakref import WeakKeyDictionary
+import httpx
 from langchain_core.utils.function_calling import (
     convert_to_openai_function,
     convert_to_openai_tool,
@@ -13,10 +17,37 @@ from langchain_core.messages import AIMessage, FunctionMessage, ToolMessage
 
 from gptextual.config.app_config import APIProviderConfig, AppConfig
 from gptextual.logging import logger
+from gptextual.runtime.http_clients import shared_http_client
 from gptextual.runtime.langchain.schema import Function, ToolCalls
+from .plugins import LazyFunction, discover_functions
+from .result_budget import fit_result, store_full_result
+from .result_cache import FunctionResultCache
+from .executors import (
+    ExecutionMode,
+    process_pool_ready,
+    restart_process_pool,
+    run_in_process,
+    run_to_completion,
+    warm_up_process_pool,
+)
 
 # Central repository for registered functions
 _FUNCTIONS_BY_NAME = {}
+# Limits the number of concurrent calls of a function, by event loop and function
+# name. asyncio primitives are bound to the loop they are used on, and the batch
+# runner and the tests run several loops one after the other.
+_SEMAPHORES: WeakKeyDictionary[
+    asyncio.AbstractEventLoop, dict[str, asyncio.Semaphore]
+] = WeakKeyDictionary()
+# Result caches of functions with a cache_ttl, by function name
+_RESULT_CACHES = {}
+# Compiled tool manifests, by model name and API provider
+_MANIFESTS = {}
+# The app config the manifests were compiled for
+_MANIFEST_CONFIG = None
+# Whether the process pools of functions are started when they are registered,
+# set once the plugins are loaded (and the config with them)
+_WARM_UP_PROCESS_POOLS = False
 
 
 class FunctionCallSupport(str, Enum):
@@ -35,68 +66,59 @@ class FunctionCallSupport(str, Enum):
     @staticmethod
     @cache
     def forModelName(*, model_name: str, api_provider: str):
-        app_config = AppConfig.get_instance()
-        function_support = _DEFAULT_FUNCTION_CALL_SUPPORT.get(api_provider, {})
-        api_provider_config: APIProviderConfig = getattr(
-            app_config.api_config, api_provider
-        )
-        if api_provider_config and api_provider_config.function_call_support:
-            function_support = {
-                **function_support,
-                **api_provider_config.function_call_support,
-            }
-
-        # 1. Check if there are any tools registered for the current proxy type
-        if function_support:
-            support_by_model = {
-                model_name.strip(): support
-                for key, support in function_support.items()
-                for model_name in key.split(",")
-            }
-
-            # 2. Check for use of wildcard (all models)
-            if model_name not in support_by_model:
-                model_name = "*"
-            if model_name in support_by_model:
-                return FunctionCallSupport.fromStr(support_by_model[model_name])
+        support_by_model = _support_by_model(api_provider)
+
+        # Check for use of wildcard (all models)
+        if model_name not in support_by_model:
+            model_name = "*"
+        if model_name in support_by_model:
+            return FunctionCallSupport.fromStr(support_by_model[model_name])
 
         return None
 
-    async def execute_function_call(self, message: AIMessage):
+    async def execute_function_call(self, message: AIMessage, *, model_name=None):
+        """
+        Executes the function calls requested in the message. The model name is used
+        to count the tokens of results with a max_result_tokens budget.
+        """
         if self == FunctionCallSupport.OPENAI_FUNCTION:
-            return await self._execute_openai_function(message)
+            return await self._execute_openai_function(message, model_name)
         if self == FunctionCallSupport.OPENAI_TOOL:
-            return await self._execute_openai_tool(message)
+            return await self._execute_openai_tool(message, model_name)
 
-    async def _execute_openai_tool(self, message: AIMessage) -> List[ToolMessage]:
+    async def _execute_openai_tool(
+        self, message: AIMessage, model_name: str
+    ) -> List[ToolMessage]:
         tool_calls = message.additional_kwargs.get("tool_calls", None)
         if tool_calls:
             calls = ToolCalls(calls=tool_calls)
-            results = []
-            for call in calls.calls:
+
+            async def execute(call):
                 fname = call.function.name
-                func = get_function(fname)
-                if func:
-                    try:
-                        result = func(**call.function.arguments)
-                        if iscoroutine(result):
-                            result = await result
-                        results.append(
-                            ToolMessage(tool_call_id=call.id, content=str(result))
-                        )
-                    except Exception as ex:
-                        logger().error(
-                            f"There was an error executing tool function {fname}: {ex}"
-                        )
-                        results.append(
-                            ToolMessage(
-                                tool_call_id=call.id,
-                                content=f"There was an error executing tool function {fname}: {ex}. Try to fix the error or continue without it.",
-                            )
-                        )
-            return results
-
-    async def _execute_openai_function(self, message: AIMessage) -> FunctionMessage:
+                if get_function(fname) is None:
+                    return None
+                try:
+                    result = await _call_function(fname, call.function.arguments)
+                    return ToolMessage(
+                        tool_call_id=call.id,
+                        **await _result_message_kwargs(fname, result, model_name),
+                    )
+                except Exception as ex:
+                    logger().error(
+                        f"There was an error executing tool function {fname}: {ex}"
+                    )
+                    return ToolMessage(
+                        tool_call_id=call.id,
+                        content=f"There was an error executing tool function {fname}: {ex}. Try to fix the error or continue without it.",
+                    )
+
+            # The tool calls of a message are independent of each other, run them concurrently
+            results = await asyncio.gather(*(execute(call) for call in calls.calls))
+            return [result for result in results if result is not None]
+
+    async def _execute_openai_function(
+        self, message: AIMessage, model_name: str
+    ) -> FunctionMessage:
         function_call = message.additional_kwargs.get("function_call", None)
         if function_call:
             function_call = Function(**function_call)
@@ -104,10 +126,9 @@ class FunctionCallSupport(str, Enum):
             func = get_function(fname)
             if func:
                 try:
-                    result = func(**function_call.arguments)
-                    if iscoroutine(result):
-                        result = await result
-                    return FunctionMessage(content=str(result), name=fname)
+                    result = await _call_function(fname, function_call.arguments)
+                    kwargs = await _result_message_kwargs(fname, result, model_name)
+                    return FunctionMessage(name=fname, **kwargs)
                 except Exception as ex:
                     logger().error(
                         f"There was an error executing function {fname}: {ex}"
@@ -129,9 +150,16 @@ class FunctionCallSupport(str, Enum):
     def get_function_definition(self, func_name: str):
         generator = self.get_definition_generator()
         func = _FUNCTIONS_BY_NAME.get(func_name, None)
+        if isinstance(func, LazyFunction):
+            # Generated from the cached schema, without importing the plugin
+            return generator(func.schema)
         return generator(func) if func else None
 
-    def get_kwargs(self):
+    def get_kwargs(self, *, allow_calls=True):
+        """
+        Returns the function definitions to pass to the model. Without allow_calls,
+        the model sees the definitions but is asked to answer without calling them.
+        """
         app_config = AppConfig.get_instance()
         function_names = [
             name
@@ -140,10 +168,11 @@ class FunctionCallSupport(str, Enum):
         ]
         definitions = [self.get_function_definition(name) for name in function_names]
         if definitions:
+            choice = "auto" if allow_calls else "none"
             if self == FunctionCallSupport.OPENAI_FUNCTION:
-                return {"functions": definitions, "function_call": "auto"}
+                return {"functions": definitions, "function_call": choice}
             elif self == FunctionCallSupport.OPENAI_TOOL:
-                return {"tools": definitions, "tool_choice": "auto"}
+                return {"tools": definitions, "tool_choice": choice}
 
         return {}
 
@@ -156,14 +185,262 @@ _DEFAULT_FUNCTION_CALL_SUPPORT = {
         "gpt-4,gpt-4-turbo,gpt-35-turbo,gpt-35-turbo-16k,gpt-4-32k": FunctionCallSupport.OPENAI_FUNCTION
     },
     "openai": {"*": FunctionCallSupport.OPENAI_TOOL},
+    "mock": {"*": FunctionCallSupport.OPENAI_TOOL},
 }
 
 
+@cache
+def _support_by_model(api_provider: str) -> dict[str, str]:
+    """The function call support of the models of an API provider, by model name"""
+    app_config = AppConfig.get_instance()
+    function_support = _DEFAULT_FUNCTION_CALL_SUPPORT.get(api_provider, {})
+    api_provider_config: APIProviderConfig = getattr(
+        app_config.api_config, api_provider
+    )
+    if api_provider_config and api_provider_config.function_call_support:
+        function_support = {
+            **function_support,
+            **api_provider_config.function_call_support,
+        }
+
+    return {
+        model_name.strip(): support
+        for key, support in function_support.items()
+        for model_name in key.split(",")
+    }
+
+
+@dataclass(frozen=True)
+class ToolManifest:
+    """
+    The function calling setup of a model, compiled once and passed to the model
+    with each request as it is.
+    """
+
+    function_call_support: FunctionCallSupport
+    # Function definitions for requests in which the model may call functions
+    kwargs: dict
+    # Function definitions for requests in which the model has to answer
+    final_kwargs: dict
+
+
+def get_tool_manifest(*, model_name: str, api_provider: str) -> ToolManifest | None:
+    """
+    Returns the tool manifest of a model, or None if the model does not support
+    function calling. Manifests are compiled on first use and kept until a function
+    is registered or the app config changes.
+    """
+    global _MANIFEST_CONFIG
+    config = AppConfig.get_instance()
+    if config is not _MANIFEST_CONFIG:
+        invalidate_tool_manifests()
+        _MANIFEST_CONFIG = config
+
+    key = (model_name, api_provider)
+    if key not in _MANIFESTS:
+        support = FunctionCallSupport.forModelName(
+            model_name=model_name, api_provider=api_provider
+        )
+        _MANIFESTS[key] = (
+            ToolManifest(
+                function_call_support=support,
+                kwargs=support.get_kwargs(),
+                final_kwargs=support.get_kwargs(allow_calls=False),
+            )
+            if support
+            else None
+        )
+    return _MANIFESTS[key]
+
+
+def invalidate_tool_manifests():
+    _MANIFESTS.clear()
+    _support_by_model.cache_clear()
+    FunctionCallSupport.forModelName.cache_clear()
+    FunctionCallSupport.get_function_definition.cache_clear()
+
+
 def load_function_entry_points():
-    for entry_point in pkg_resources.iter_entry_points("gptextual_function"):
-        # Just loading the entry point is enough if each function
-        # is decorated with @register_for_function_calling below
-        entry_point.load()
+    """
+    Registers the functions of the installed plugins. Plugin modules are not
+    imported here, but on the first call of one of their functions, see
+    discover_functions. Nothing is discovered if no functions are configured.
+    """
+    global _WARM_UP_PROCESS_POOLS
+    if not AppConfig.get_instance().functions:
+        return
+
+    for stub in discover_functions(_FUNCTIONS_BY_NAME):
+        _FUNCTIONS_BY_NAME[stub.__name__] = stub
+    invalidate_tool_manifests()
+
+    # Functions registered from now on are warmed up when they are registered
+    _WARM_UP_PROCESS_POOLS = True
+    for name, func in _FUNCTIONS_BY_NAME.items():
+        _warm_up_if_process_mode(name, func)
+
+
+def _warm_up_if_process_mode(function_name: str, func):
+    if get_function_config(function_name) is not None and (
+        _execution_mode(function_name, func) == ExecutionMode.PROCESS
+    ):
+        warm_up_process_pool(
+            function_name, _get_function_setting(function_name, "processes", 1)
+        )
+
+
+def _get_function_setting(function_name: str, key: str, default=None):
+    config = get_function_config(function_name) or {}
+    value = config.get(key, None)
+    return default if value is None else value
+
+
+def _execution_mode(function_name: str, func) -> ExecutionMode:
+    mode = _get_function_setting(function_name, "execution_mode")
+    if mode is None:
+        is_coroutine = (
+            func.is_coroutine
+            if isinstance(func, LazyFunction)
+            else inspect.iscoroutinefunction(func)
+        )
+        # Sync functions would block the event loop
+        return ExecutionMode.INLINE if is_coroutine else ExecutionMode.THREAD
+    return ExecutionMode(mode)
+
+
+async def _call_function(function_name: str, arguments: dict):
+    """
+    Calls a registered function with the per function settings from the config.yml:
+
+    - execution_mode: inline (on the event loop), thread or process
+      (default: inline for async and thread for sync functions)
+    - processes: number of worker processes in process mode (default: 1)
+    - timeout: seconds after which the call fails. In process mode, the worker
+      processes of the function are killed.
+    - max_concurrency: maximum number of concurrent calls of the function
+    - cache_ttl: seconds to cache results by arguments, see FunctionResultCache
+      (with cache_max_entries and cache_on_disk)
+
+    The max_result_tokens setting is applied to the result when it is added to
+    the conversation, see _result_message_kwargs.
+    """
+    cache = _result_cache(function_name)
+    if cache:
+        hit, result = await cache.get(arguments)
+        if hit:
+            return result
+
+    result = await _execute_function(function_name, arguments)
+    if cache:
+        await cache.put(arguments, result)
+    return result
+
+
+async def _result_message_kwargs(
+    function_name: str, result, model_name: str
+) -> dict:
+    """
+    Content and additional kwargs of the message with the result of a function call.
+
+    Results over the max_result_tokens budget of the function are shortened, see
+    fit_result. The full result is stored on disk and its path is kept in the
+    full_result_path kwarg. Both run in a thread, as tokenizing large results
+    repeatedly would block the event loop and with it the UI and all streams.
+    """
+    content = str(result)
+    max_tokens = _get_function_setting(function_name, "max_result_tokens")
+    if not max_tokens:
+        return {"content": content}
+
+    shortened = await asyncio.to_thread(
+        fit_result, result, max_tokens=max_tokens, model_name=model_name
+    )
+    if shortened is None:
+        return {"content": content}
+
+    additional_kwargs = {"truncated": True}
+    path = await asyncio.to_thread(store_full_result, function_name, content)
+    if path:
+        additional_kwargs["full_result_path"] = str(path)
+    logger().info(
+        f"Result of function {function_name} exceeded {max_tokens} tokens and was shortened",
+        extra={"chars": len(content), "path": additional_kwargs.get("full_result_path")},
+    )
+    return {"content": shortened, "additional_kwargs": additional_kwargs}
+
+
+def _result_cache(function_name: str) -> FunctionResultCache | None:
+    if function_name not in _RESULT_CACHES:
+        ttl = _get_function_setting(function_name, "cache_ttl")
+        _RESULT_CACHES[function_name] = (
+            FunctionResultCache(
+                function_name,
+                ttl=ttl,
+                max_entries=_get_function_setting(
+                    function_name, "cache_max_entries", 128
+                ),
+                on_disk=_get_function_setting(function_name, "cache_on_disk", False),
+            )
+            if ttl
+            else None
+        )
+    return _RESULT_CACHES[function_name]
+
+
+async def _execute_function(function_name: str, arguments: dict):
+    func = get_function(function_name)
+    if isinstance(func, LazyFunction):
+        # First call, import the plugin without blocking the event loop
+        func = await asyncio.to_thread(func.load)
+    mode = _execution_mode(function_name, func)
+    timeout = _get_function_setting(function_name, "timeout")
+    max_concurrency = _get_function_setting(function_name, "max_concurrency")
+    processes = _get_function_setting(function_name, "processes", 1)
+
+    async def call():
+        if mode == ExecutionMode.PROCESS:
+            return await run_in_process(
+                function_name, func, arguments, processes=processes
+            )
+        if mode == ExecutionMode.THREAD:
+            return await asyncio.to_thread(run_to_completion, func, arguments)
+
+        result = func(**arguments)
+        if iscoroutine(result):
+            result = await result
+        return result
+
+    async def call_with_timeout():
+        if mode == ExecutionMode.PROCESS:
+            # The timeout starts once a worker is ready, not with the pool startup
+            await process_pool_ready(function_name, processes)
+        try:
+            return await asyncio.wait_for(call(), timeout=timeout)
+        except asyncio.TimeoutError:
+            if mode == ExecutionMode.PROCESS:
+                restart_process_pool(function_name, processes)
+            raise TimeoutError(
+                f"Function {function_name} did not return within {timeout} seconds"
+            )
+
+    if not max_concurrency:
+        return await call_with_timeout()
+
+    semaphores = _SEMAPHORES.setdefault(asyncio.get_running_loop(), {})
+    semaphore = semaphores.get(function_name, None)
+    if semaphore is None:
+        semaphore = semaphores[function_name] = asyncio.Semaphore(max_concurrency)
+    async with semaphore:
+        return await call_with_timeout()
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Returns the shared, pooled async HTTP client for functions. Prefer it over
+    creating a client per call, which pays for connection setup every time.
+    Do not close it, this is done when the app exits.
+    """
+    return shared_http_client("functions")
 
 
 def get_function(function_name: str):
@@ -172,6 +449,9 @@ def get_function(function_name: str):
 
 def register_for_function_calling(func):
     _FUNCTIONS_BY_NAME[func.__name__] = func
+    invalidate_tool_manifests()
+    if _WARM_UP_PROCESS_POOLS:
+        _warm_up_if_process_mode(func.__name__, func)
     return func
 
 
@@ -1,10 +1,9 @@
 from __future__ import annotations
 
-import httpx
-
 from .function_call_support import (
     register_for_function_calling,
     get_function_config,
+    get_http_client,
 )
 
 
@@ -48,9 +47,7 @@ async def google_web_search(query: str) -> str:
 
     params = {"key": api_key, "cx": cx_id, "q": query}
 
-    resp = None
-    async with httpx.AsyncClient() as client:
-        resp = await client.get(url, params=params, timeout=5)
+    resp = await get_http_client().get(url, params=params, timeout=5)
 
     resp.raise_for_status()  # Raises an exception if the HTTP status is 400 or higher
     result_json = resp.json()  # Get the response body as JSON
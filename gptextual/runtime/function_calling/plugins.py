@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import importlib
+import importlib.util
+import inspect
+import json
+import os
+from importlib.metadata import EntryPoint, entry_points
+from pathlib import Path
+
+from langchain_core.utils.function_calling import convert_to_openai_function
+
+from gptextual.logging import logger
+
+ENTRY_POINT_GROUP = "gptextual_function"
+schema_cache_path = Path.home() / ".gptextual" / "function_schemas.json"
+
+
+class LazyFunction:
+    """
+    Stands in for a function of a plugin whose module has not been imported yet.
+
+    It carries the schema of the function from the schema cache, so the function
+    can be offered to LLMs without importing the plugin and its dependencies. The
+    module is imported on the first call.
+    """
+
+    def __init__(
+        self, name: str, *, module: str, schema: dict, is_coroutine: bool
+    ) -> None:
+        self.__name__ = name
+        self.module = module
+        self.schema = schema
+        self.is_coroutine = is_coroutine
+
+    def load(self):
+        """Imports the plugin module, which registers the real function, and returns it"""
+        return getattr(importlib.import_module(self.module), self.__name__)
+
+    def __call__(self, *args, **kwargs):
+        return self.load()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        return f"LazyFunction({self.module}.{self.__name__})"
+
+
+def _cache_key(entry_point: EntryPoint) -> str | None:
+    """Changes when the plugin is updated, None if the plugin module cannot be found"""
+    try:
+        spec = importlib.util.find_spec(entry_point.module)
+        mtime = os.path.getmtime(spec.origin) if spec and spec.origin else None
+    except Exception:
+        return None
+    version = entry_point.dist.version if entry_point.dist else None
+    return f"{version}:{mtime}"
+
+
+def _read_schema_cache() -> dict:
+    try:
+        with open(schema_cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except Exception as ex:
+        logger().error(f"Error reading the function schema cache: {ex}")
+        return {}
+
+
+def _write_schema_cache(cache: dict):
+    try:
+        os.makedirs(schema_cache_path.parent, exist_ok=True)
+        with open(schema_cache_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f)
+    except Exception as ex:
+        logger().error(f"Error writing the function schema cache: {ex}")
+
+
+def _describe_functions(entry_point: EntryPoint, functions: dict) -> list[dict]:
+    """Imports the plugin module and describes the functions it registered"""
+    entry_point.load()
+    return [
+        {
+            "name": name,
+            "module": func.__module__,
+            "schema": convert_to_openai_function(func),
+            "is_coroutine": inspect.iscoroutinefunction(func),
+        }
+        for name, func in functions.items()
+        if not isinstance(func, LazyFunction)
+        and (func.__module__ == entry_point.module or name == entry_point.attr)
+    ]
+
+
+def discover_functions(functions: dict) -> list[LazyFunction]:
+    """
+    Finds the functions of all installed plugins and returns stubs for the functions
+    which are not registered yet.
+
+    The functions of a plugin are taken from the schema cache in
+    ~/.gptextual/function_schemas.json. Only plugins which are new or were updated
+    since the cache was written are imported, to describe their functions.
+    functions is the registry the plugins register their functions in.
+    """
+    cache = _read_schema_cache()
+    updated = {}
+    stubs = []
+    for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+        cache_id = f"{entry_point.name}={entry_point.value}"
+        key = _cache_key(entry_point)
+        cached = cache.get(cache_id, None)
+        try:
+            if key is None or cached is None or cached["key"] != key:
+                cached = {
+                    "key": key,
+                    "functions": _describe_functions(entry_point, functions),
+                }
+        except Exception as ex:
+            logger().error(
+                f"Error loading function plugin {entry_point.name} ({entry_point.value}): {ex}"
+            )
+            continue
+        updated[cache_id] = cached
+
+        for description in cached["functions"]:
+            if description["name"] not in functions:
+                stubs.append(
+                    LazyFunction(
+                        description["name"],
+                        module=description["module"],
+                        schema=description["schema"],
+                        is_coroutine=description["is_coroutine"],
+                    )
+                )
+
+    if updated != cache:
+        _write_schema_cache(updated)
+    return stubs
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+
+from shortuuid import ShortUUID
+
+from gptextual.logging import logger
+from gptextual.runtime.tokenizer import count_tokens, truncate_text
+
+tool_results_path = Path.home() / ".gptextual" / "tool_results"
+
+
+def _to_json(value) -> str:
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def _omitted(n: int) -> str:
+    return f"[... {n} more items omitted ...]"
+
+
+def _largest_fitting(size: int, fits) -> int:
+    """Largest k in [0, size] with fits(k), assuming fits is monotonic"""
+    low, high = 0, size
+    while low < high:
+        middle = (low + high + 1) // 2
+        if fits(middle):
+            low = middle
+        else:
+            high = middle - 1
+    return low
+
+
+def _truncate_structure(value, max_tokens: int, model_name: str) -> str | None:
+    """
+    Keeps the first items of a list, or of the lists in a dict, so that the JSON of
+    the value fits into max_tokens. Returns None if the value has no lists or not even
+    one item of each fits.
+    """
+    if isinstance(value, (list, tuple)):
+        items = list(value)
+        size = len(items)
+
+        def render(k: int) -> str:
+            return _to_json(items[:k] + ([_omitted(size - k)] if k < size else []))
+
+    elif isinstance(value, dict):
+        lists = {
+            key: list(v)
+            for key, v in value.items()
+            if isinstance(v, (list, tuple)) and v
+        }
+        if not lists:
+            return None
+        size = max(len(v) for v in lists.values())
+
+        def render(k: int) -> str:
+            shortened = {}
+            for key, v in value.items():
+                if key in lists and k < len(v):
+                    v = lists[key][:k] + [_omitted(len(v) - k)]
+                shortened[key] = v
+            return _to_json(shortened)
+
+    else:
+        return None
+
+    k = _largest_fitting(
+        size, lambda k: k > 0 and count_tokens(render(k), model_name) <= max_tokens
+    )
+    return render(k) if k > 0 else None
+
+
+def fit_result(result, *, max_tokens: int, model_name: str) -> str | None:
+    """
+    Shortens the result of a function to about max_tokens, or returns None if it
+    already fits.
+
+    Lists (also JSON lists and objects returned as strings) are shortened to their
+    first items, as results like search hits are usually ordered by relevance. Other
+    results keep their head and tail.
+    """
+    text = result if isinstance(result, str) else str(result)
+    if count_tokens(text, model_name) <= max_tokens:
+        return None
+
+    value = result
+    if isinstance(result, str):
+        try:
+            value = json.loads(result)
+        except ValueError:
+            value = None
+
+    shortened = _truncate_structure(value, max_tokens, model_name)
+    if shortened is None:
+        shortened = truncate_text(text, max_tokens, model_name)
+    return shortened
+
+
+def store_full_result(function_name: str, text: str) -> Path | None:
+    """Writes the full result of a function call below ~/.gptextual/tool_results"""
+    try:
+        folder = tool_results_path / function_name
+        os.makedirs(folder, exist_ok=True)
+        file = folder / f"{int(time.time())}_{ShortUUID().random(10)}.txt"
+        with open(file, "w", encoding="utf-8") as f:
+            f.write(text)
+        return file
+    except Exception as ex:
+        logger().error(f"Error storing the result of function {function_name}: {ex}")
+        return None
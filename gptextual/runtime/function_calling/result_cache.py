@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from gptextual.logging import logger
+
+cache_path = Path.home() / ".gptextual" / "function_cache"
+
+
+class FunctionResultCache:
+    """
+    Caches the results of a function by its canonicalized arguments for ttl seconds.
+
+    The in-memory tier is an LRU cache of at most max_entries results. With on_disk,
+    results are also stored below ~/.gptextual/function_cache, so they survive
+    app restarts. Only JSON serializable results are stored on disk.
+    """
+
+    def __init__(
+        self,
+        function_name: str,
+        *,
+        ttl: float,
+        max_entries: int = 128,
+        on_disk: bool = False,
+    ) -> None:
+        self.function_name = function_name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.on_disk = on_disk
+        self.hits = 0
+        self.misses = 0
+        # key -> (expiry timestamp, result)
+        self._entries: OrderedDict[str, tuple[float, object]] = OrderedDict()
+
+    @staticmethod
+    def key(arguments: dict) -> str:
+        canonical = json.dumps(
+            arguments, sort_keys=True, separators=(",", ":"), default=str
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    @property
+    def _folder(self) -> Path:
+        return cache_path / self.function_name
+
+    def _log(self, result: str, tier: str = None):
+        logger().info(
+            f"Function result cache {result} for {self.function_name}",
+            extra={"tier": tier, "hits": self.hits, "misses": self.misses},
+        )
+
+    async def get(self, arguments: dict) -> tuple[bool, object]:
+        key = self.key(arguments)
+        now = time.time()
+
+        entry = self._entries.get(key, None)
+        if entry is not None:
+            expires, result = entry
+            if expires > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                self._log("hit", "memory")
+                return True, result
+            del self._entries[key]
+
+        if self.on_disk:
+            # File access would block the event loop of the concurrent tool calls
+            data = await asyncio.to_thread(self._read, key, now)
+            if data is not None:
+                self._remember(key, data["expires"], data["result"])
+                self.hits += 1
+                self._log("hit", "disk")
+                return True, data["result"]
+
+        self.misses += 1
+        self._log("miss")
+        return False, None
+
+    async def put(self, arguments: dict, result):
+        key = self.key(arguments)
+        expires = time.time() + self.ttl
+        self._remember(key, expires, result)
+
+        if self.on_disk:
+            try:
+                payload = json.dumps({"expires": expires, "result": result})
+            except TypeError:
+                return
+            await asyncio.to_thread(self._write, key, payload)
+
+    def _read(self, key: str, now: float) -> dict | None:
+        file = self._folder / f"{key}.json"
+        try:
+            with open(file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data["expires"] > now:
+                return data
+            os.remove(file)
+        except FileNotFoundError:
+            pass
+        except Exception as ex:
+            logger().error(
+                f"Error reading cached result of function {self.function_name}: {ex}"
+            )
+        return None
+
+    def _write(self, key: str, payload: str):
+        try:
+            os.makedirs(self._folder, exist_ok=True)
+            with open(self._folder / f"{key}.json", "w", encoding="utf-8") as f:
+                f.write(payload)
+        except Exception as ex:
+            logger().error(
+                f"Error caching result of function {self.function_name}: {ex}"
+            )
+
+    def _remember(self, key: str, expires: float, result):
+        self._entries[key] = (expires, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import asyncio
+from typing import AsyncIterator, Callable
+
+
+class StreamsFailedError(Exception):
+    """
+    All streams failed. The errors are (index, error) of each stream, in the order of
+    the streams, and the message is the one of the first stream's error.
+    """
+
+    def __init__(self, errors: list[tuple[int, Exception]]) -> None:
+        self.errors = sorted(errors, key=lambda error: error[0])
+        super().__init__(str(self.errors[0][1]))
+
+
+async def first_to_stream(
+    streams: list[Callable[[], AsyncIterator]], *, hedge_after: float | None = None
+) -> AsyncIterator[tuple[int, object]]:
+    """
+    Starts the first of the streams, and the next one whenever hedge_after seconds
+    pass without a chunk from any started stream, or a stream fails before its
+    first chunk. Yields (index, chunk) for the chunks of the stream that produced
+    the first chunk, the other streams are cancelled and closed.
+
+    Without hedge_after, the next stream is only started if the previous ones
+    failed. If all streams fail, StreamsFailedError is raised with the error of each
+    stream, raised from the error of the first stream.
+    """
+    started: dict[asyncio.Task, tuple[int, AsyncIterator]] = {}
+    errors = []
+    winner = None
+
+    def start_next():
+        iterator = streams[len(started) + len(errors)]().__aiter__()
+        task = asyncio.ensure_future(iterator.__anext__())
+        started[task] = (len(started) + len(errors), iterator)
+
+    def can_start() -> bool:
+        return len(started) + len(errors) < len(streams)
+
+    start_next()
+    pending = set(started)
+    try:
+        while pending:
+            done, _ = await asyncio.wait(
+                pending,
+                timeout=hedge_after if can_start() else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                start_next()
+                pending = {task for task in started if not task.done()}
+                continue
+
+            for task in sorted(done, key=lambda t: started[t][0]):
+                try:
+                    chunk = task.result()
+                except StopAsyncIteration:
+                    # An empty response is an answer, too
+                    chunk = None
+                except Exception as ex:
+                    errors.append((started.pop(task)[0], ex))
+                    if can_start():
+                        start_next()
+                    continue
+                index, iterator = started.pop(task)
+                winner = (index, iterator, chunk)
+                break
+            if winner:
+                break
+            pending = {task for task in started if not task.done()}
+    finally:
+        # Cancel the other streams, and wait for the cancellation before closing
+        # them, as generators cannot be closed while they are running
+        for task in started:
+            task.cancel()
+        await asyncio.gather(*started, return_exceptions=True)
+        for _, iterator in started.values():
+            await _aclose(iterator)
+
+    if winner is None:
+        error = StreamsFailedError(errors)
+        raise error from error.errors[0][1]
+
+    index, iterator, chunk = winner
+    try:
+        if chunk is None:
+            return
+        yield index, chunk
+        async for chunk in iterator:
+            yield index, chunk
+    finally:
+        await _aclose(iterator)
+
+
+async def _aclose(iterator: AsyncIterator):
+    aclose = getattr(iterator, "aclose", None)
+    if aclose:
+        try:
+            await aclose()
+        except Exception:
+            pass
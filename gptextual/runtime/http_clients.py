@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import importlib.util
+
+import httpx
+
+# Shared async HTTP clients, by name
+_CLIENTS: dict[str, httpx.AsyncClient] = {}
+# Number of requests sent with each shared client, by name
+_REQUESTS: dict[str, int] = {}
+
+DEFAULT_LIMITS = httpx.Limits(
+    max_connections=100, max_keepalive_connections=20, keepalive_expiry=30
+)
+DEFAULT_TIMEOUT = httpx.Timeout(30.0, connect=5.0)
+
+
+def http2_available() -> bool:
+    # httpx needs the optional h2 package for HTTP/2
+    return importlib.util.find_spec("h2") is not None
+
+
+def shared_http_client(name: str, *, limits: httpx.Limits = None) -> httpx.AsyncClient:
+    """
+    Returns the shared async HTTP client with the given name. Its connections are
+    kept alive and pooled across calls, so repeated requests to the same host don't
+    pay for TCP and TLS setup again. The clients are closed when the app exits.
+    The limits are only applied when the client is created.
+
+    Like all asyncio resources, the clients must be used from the app's event loop.
+    """
+    client = _CLIENTS.get(name, None)
+    if client is None or client.is_closed:
+
+        async def count_request(request: httpx.Request):
+            _REQUESTS[name] = _REQUESTS.get(name, 0) + 1
+
+        client = _CLIENTS[name] = httpx.AsyncClient(
+            http2=http2_available(),
+            limits=limits or DEFAULT_LIMITS,
+            timeout=DEFAULT_TIMEOUT,
+            event_hooks={"request": [count_request]},
+        )
+    return client
+
+
+def provider_http_client(
+    api_provider: str, *, max_connections: int | None = None
+) -> httpx.AsyncClient:
+    """
+    Returns the shared client of an API provider. All models of the provider
+    stream over it, so switching models does not open new connections.
+    """
+    limits = DEFAULT_LIMITS
+    if max_connections:
+        limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=DEFAULT_LIMITS.keepalive_expiry,
+        )
+    return shared_http_client(f"provider:{api_provider}", limits=limits)
+
+
+def pool_stats() -> dict[str, dict]:
+    """Connection pool statistics of the shared clients, by client name"""
+    stats = {}
+    for name, client in _CLIENTS.items():
+        # The connection pool of the default httpx transport
+        pool = getattr(getattr(client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", []))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        stats[name] = {
+            "requests": _REQUESTS.get(name, 0),
+            "connections": len(connections),
+            "active": len(connections) - idle,
+            "idle": idle,
+            "max_connections": getattr(pool, "_max_connections", None),
+        }
+    return stats
+
+
+async def aclose_http_clients():
+    clients = list(_CLIENTS.values())
+    _CLIENTS.clear()
+    _REQUESTS.clear()
+    for client in clients:
+        await client.aclose()
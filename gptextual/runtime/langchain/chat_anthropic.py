@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain_anthropic import ChatAnthropic
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk
+
+
+def _has_tools(params: dict) -> bool:
+    return bool(
+        params.get("tools", None) or (params.get("extra_body", None) or {}).get("tools")
+    )
+
+
+class ChatAnthropicWithUsage(ChatAnthropic):
+    """
+    ChatAnthropic which reports the token usage of streamed responses. LangChain
+    only streams the text, the usage of the message_start and message_delta events
+    is yielded as the usage response metadata of an empty last chunk.
+    """
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        params = self._format_params(messages=messages, stop=stop, **kwargs)
+        if _has_tools(params):
+            # Tool use is not streamed by LangChain, it answers in one chunk
+            async for chunk in super()._astream(
+                messages, stop=stop, run_manager=run_manager, **kwargs
+            ):
+                yield chunk
+            return
+
+        async with self._async_client.messages.stream(**params) as stream:
+            async for text in stream.text_stream:
+                chunk = ChatGenerationChunk(message=AIMessageChunk(content=text))
+                if run_manager:
+                    await run_manager.on_llm_new_token(text, chunk=chunk)
+                yield chunk
+            message = await stream.get_final_message()
+
+        usage = message.usage.model_dump(exclude_none=True) if message.usage else None
+        if usage:
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(content="", response_metadata={"usage": usage})
+            )
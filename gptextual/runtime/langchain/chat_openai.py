@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import openai
+from langchain_core.callbacks import AsyncCallbackManagerForLLMRun
+from langchain_core.messages import AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGenerationChunk
+from langchain_core.pydantic_v1 import root_validator
+from langchain_openai import ChatOpenAI
+
+from gptextual.logging import logger
+
+# Request argument which passes the usage of a stream from the model to the client
+_USAGE_KWARG = "gptextual_stream_usage"
+
+
+class UsageRecordingCompletions:
+    """
+    The chat completions of the OpenAI SDK, which ask for the token usage of
+    streams and record it, if the request has a usage dict. The API sends it in
+    a last chunk without choices.
+
+    Servers that reject the option (or SDKs older than openai 1.26) are asked
+    without it from then on.
+    """
+
+    def __init__(self, completions) -> None:
+        self.completions = completions
+        self.include_usage = True
+
+    def __getattr__(self, name: str):
+        return getattr(self.completions, name)
+
+    async def create(self, **params):
+        usage = params.pop(_USAGE_KWARG, None)
+        if usage is None or not self.include_usage or not params.get("stream"):
+            return await self.completions.create(**params)
+        try:
+            stream = await self.completions.create(
+                stream_options={"include_usage": True}, **params
+            )
+        except (TypeError, openai.BadRequestError) as ex:
+            if "stream_options" not in str(ex):
+                raise
+            logger().warning(
+                f"The API rejected the request for the token usage of streamed responses, it is no longer requested: {ex}"
+            )
+            self.include_usage = False
+            return await self.completions.create(**params)
+        return self._record_usage(stream, usage)
+
+    @staticmethod
+    async def _record_usage(stream, usage: dict):
+        try:
+            async for chunk in stream:
+                if getattr(chunk, "usage", None):
+                    usage.update(chunk.usage.model_dump(exclude_none=True))
+                yield chunk
+        finally:
+            await stream.close()
+
+
+class ChatOpenAIWithUsage(ChatOpenAI):
+    """
+    ChatOpenAI which reports the token usage of streamed responses, if stream_usage
+    is set. LangChain drops the chunk with the usage, so it is recorded by the async
+    client (see UsageRecordingCompletions) and yielded as the token_usage response
+    metadata of an empty last chunk.
+    """
+
+    stream_usage: bool = True
+
+    @root_validator()
+    def record_stream_usage(cls, values: Dict) -> Dict:
+        client = values.get("async_client", None)
+        if client is not None and not isinstance(client, UsageRecordingCompletions):
+            values["async_client"] = UsageRecordingCompletions(client)
+        return values
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        usage = {}
+        if self.stream_usage:
+            kwargs[_USAGE_KWARG] = usage
+        async for chunk in super()._astream(
+            messages, stop=stop, run_manager=run_manager, **kwargs
+        ):
+            yield chunk
+        if usage:
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content="", response_metadata={"token_usage": usage}
+                )
+            )
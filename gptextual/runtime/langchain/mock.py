@@ -0,0 +1,234 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import random
+import re
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.pydantic_v1 import PrivateAttr
+
+from gptextual.runtime.recording import RecordedStream, read_recording
+from gptextual.runtime.tokenizer import count_tokens
+
+# Words and whitespace, the "tokens" of a mock response
+_TOKEN = re.compile(r"\S+\s*|\s+")
+
+_WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+    "exercitation ullamco laboris nisi aliquip ex ea commodo consequat"
+).split()
+
+
+class MockAPIError(Exception):
+    """An injected API error, with the HTTP status of a real provider error"""
+
+    def __init__(self, status_code: int, message: str) -> None:
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class MockChatModel(BaseChatModel):
+    """
+    Chat model of the mock API provider, which streams a configured or generated
+    response without network access, at a configurable speed. It can request tool
+    calls in OpenAI tool format and fail with injected API errors, to exercise the
+    streaming, function calling and UI code offline.
+
+    With a replay_file, the recorded streams are replayed instead, one per request,
+    at the recorded speed times replay_speed.
+    """
+
+    model_name: str = "mock-model"
+    # Seconds until the first chunk, and streaming speed (0 streams without delay)
+    ttft: float = 0.2
+    tokens_per_second: float = 50.0
+    chunk_size: int = 1
+    response: Optional[str] = None
+    response_file: Optional[str] = None
+    # Length of the generated response, if there is no response or response_file
+    response_tokens: int = 200
+    tool_calls: List[Dict[str, Any]] = []
+    error_rate: float = 0.0
+    error_status: int = 500
+    seed: Optional[int] = None
+    replay_file: Optional[str] = None
+    replay_speed: float = 1.0
+    max_tokens: Optional[int] = None
+    temperature: Optional[float] = None
+
+    _random: random.Random = PrivateAttr()
+    _file_response: Optional[str] = PrivateAttr(default=None)
+    _replay: Optional[List[RecordedStream]] = PrivateAttr(default=None)
+    _requests: int = PrivateAttr(default=0)
+
+    def __init__(self, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self._random = random.Random(self.seed)
+
+    @property
+    def _llm_type(self) -> str:
+        return "mock"
+
+    @property
+    def _identifying_params(self) -> Dict[str, Any]:
+        return {"model_name": self.model_name}
+
+    def get_num_tokens(self, text: str) -> int:
+        return count_tokens(text, self.model_name)
+
+    def get_num_tokens_from_messages(self, messages: List[BaseMessage]) -> int:
+        return sum(self.get_num_tokens(m.content or "") for m in messages)
+
+    def _response_text(self) -> str:
+        if self.response is not None:
+            return self.response
+        if self.response_file:
+            if self._file_response is None:
+                with open(self.response_file, "r", encoding="utf-8") as f:
+                    self._file_response = f.read()
+            return self._file_response
+        words = [self._random.choice(_WORDS) for _ in range(self.response_tokens)]
+        for i in range(11, len(words), 12):
+            words[i] += "."
+        return " ".join(words)
+
+    def _requested_tool_calls(self, messages: List[BaseMessage], kwargs) -> list:
+        """
+        The configured tool calls of functions offered with the request, which are
+        only requested in the first round of a user message
+        """
+        offered = {
+            tool["function"]["name"] for tool in kwargs.get("tools", None) or []
+        }
+        if (
+            not offered
+            or kwargs.get("tool_choice", None) == "none"
+            or (messages and isinstance(messages[-1], ToolMessage))
+        ):
+            return []
+        return [
+            {
+                "index": index,
+                "id": f"call_mock_{self._requests}_{index}",
+                "type": "function",
+                "function": {
+                    "name": call["name"],
+                    "arguments": json.dumps(call.get("arguments", None) or {}),
+                },
+            }
+            for index, call in enumerate(self.tool_calls)
+            if call["name"] in offered
+        ]
+
+    def _next_replay(self) -> RecordedStream:
+        if self._replay is None:
+            self._replay = read_recording(self.replay_file)
+        if not self._replay:
+            raise ValueError(
+                f"Configuration Error: Replay file {self.replay_file} has no recorded streams"
+            )
+        return self._replay[(self._requests - 1) % len(self._replay)]
+
+    def _plan_replay(self) -> list:
+        stream = self._next_replay()
+        speed = self.replay_speed
+
+        def due(entry: dict) -> float:
+            return entry.get("t", 0.0) / speed if speed > 0 else 0.0
+
+        plan = [
+            (
+                AIMessageChunk(
+                    content=chunk.get("content", ""),
+                    additional_kwargs=chunk.get("kwargs", {}),
+                ),
+                due(chunk),
+            )
+            for chunk in stream.chunks
+        ]
+        if "error" in stream.end:
+            error = MockAPIError(stream.end.get("status", 500), stream.end["error"])
+            plan.append((error, due(stream.end)))
+        return plan
+
+    def _plan_response(self, messages: List[BaseMessage], kwargs) -> list:
+        """
+        The chunks of the next response, each with the seconds after the request at
+        which it is due. A planned error is raised when it is due.
+        """
+        self._requests += 1
+        if self.error_rate and self._random.random() < self.error_rate:
+            error = MockAPIError(
+                self.error_status,
+                f"Error code: {self.error_status} - Injected error of mock model "
+                f"{self.model_name}",
+            )
+            return [(error, self.ttft)]
+        if self.replay_file:
+            return self._plan_replay()
+
+        tool_calls = self._requested_tool_calls(messages, kwargs)
+        if tool_calls:
+            chunks = [
+                AIMessageChunk(content="", additional_kwargs={"tool_calls": [call]})
+                for call in tool_calls
+            ]
+            return [(chunk, self.ttft) for chunk in chunks]
+
+        tokens = _TOKEN.findall(self._response_text())
+        if self.max_tokens:
+            tokens = tokens[: self.max_tokens]
+        size = max(self.chunk_size, 1)
+        plan = []
+        for i in range(0, len(tokens), size):
+            due = self.ttft
+            if self.tokens_per_second > 0:
+                due += i / self.tokens_per_second
+            plan.append((AIMessageChunk(content="".join(tokens[i : i + size])), due))
+        return plan
+
+    def _generate(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        message = None
+        for chunk, _ in self._plan_response(messages, kwargs):
+            if isinstance(chunk, Exception):
+                raise chunk
+            message = chunk if message is None else message + chunk
+        return ChatResult(
+            generations=[ChatGeneration(message=message or AIMessageChunk(content=""))]
+        )
+
+    async def _astream(
+        self,
+        messages: List[BaseMessage],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        for chunk, due in self._plan_response(messages, kwargs):
+            # Sleep until the chunk is due, so the speed does not drift with the
+            # overhead of the consumer
+            delay = start + due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            if isinstance(chunk, Exception):
+                raise chunk
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.content)
+            yield ChatGenerationChunk(message=chunk)
@@ -36,7 +36,39 @@ def is_function_or_tool_call(message: BaseMessage):
     )
 
 
+def called_function_names(message: BaseMessage) -> list[str]:
+    tool_calls = message.additional_kwargs.get("tool_calls", None) or []
+    names = [call.get("function", {}).get("name", "") for call in tool_calls]
+    function_call = message.additional_kwargs.get("function_call", None)
+    if function_call:
+        names.append(function_call.get("name", ""))
+    return names
+
+
 def is_tool_related_message(message: BaseMessage):
     return isinstance(
         message, (FunctionMessage, ToolMessage)
     ) or is_function_or_tool_call(message)
+
+
+def prompt_cache_usage(message: BaseMessage) -> tuple[int | None, int | None]:
+    """
+    Returns (cached prompt tokens, total prompt tokens) as reported by the provider
+    in the response metadata, or (None, None) if the provider did not report them.
+    """
+    metadata = getattr(message, "response_metadata", None) or {}
+
+    # OpenAI
+    token_usage = metadata.get("token_usage", None) or {}
+    if "prompt_tokens" in token_usage:
+        details = token_usage.get("prompt_tokens_details", None) or {}
+        return details.get("cached_tokens", 0), token_usage["prompt_tokens"]
+
+    # Anthropic reports cache reads separately from the uncached input tokens
+    usage = metadata.get("usage", None) or {}
+    if "input_tokens" in usage:
+        cached = usage.get("cache_read_input_tokens", 0) or 0
+        created = usage.get("cache_creation_input_tokens", 0) or 0
+        return cached, usage["input_tokens"] + cached + created
+
+    return None, None
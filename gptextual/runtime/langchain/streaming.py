@@ -0,0 +1,135 @@
+from __future__ import annotations
+
+from langchain_core.messages import AIMessageChunk, BaseMessage
+
+
+class StreamAccumulator:
+    """
+    Accumulates the chunks of a streamed LLM response.
+
+    Adding LangChain message chunks (chunk + chunk) copies the whole content string
+    and merges the additional kwargs into a new message object for every chunk, which
+    makes long responses quadratic in their length. The accumulator collects the
+    content and tool call argument fragments in lists instead, and only builds a
+    message when it is requested, e.g. when the UI refreshes or the stream ends.
+    """
+
+    def __init__(self) -> None:
+        self.chunks = 0
+        self._message_class = None
+        self._content: list[str] = []
+        self._kwargs: dict = {}
+        # Streamed string kwargs, by key
+        self._string_kwargs: dict[str, list[str]] = {}
+        # OpenAI tool call deltas, by tool call index
+        self._tool_calls: dict[int, dict] = {}
+        # OpenAI legacy function call deltas
+        self._function_call: dict | None = None
+        self._response_metadata: dict = {}
+        # Chunks with non-string content (e.g. content blocks) are merged by LangChain
+        self._merged: BaseMessage | None = None
+        self._message: BaseMessage | None = None
+
+    def add(self, chunk: BaseMessage):
+        self.chunks += 1
+        self._message = None
+        if self._message_class is None:
+            self._message_class = (
+                chunk.__class__ if isinstance(chunk, AIMessageChunk) else AIMessageChunk
+            )
+
+        if self._merged is not None or not isinstance(chunk.content, str):
+            self._merged = (
+                chunk if self._merged is None else self._merged + chunk
+            )
+            return
+
+        if chunk.content:
+            self._content.append(chunk.content)
+
+        for key, value in chunk.additional_kwargs.items():
+            if key == "tool_calls" and value:
+                self._add_tool_call_deltas(value)
+            elif key == "function_call" and value:
+                self._add_function_call_delta(value)
+            elif isinstance(value, str) and (
+                key in self._string_kwargs or key not in self._kwargs
+            ):
+                self._string_kwargs.setdefault(key, []).append(value)
+            elif value is not None:
+                self._kwargs[key] = value
+
+        metadata = getattr(chunk, "response_metadata", None)
+        if metadata:
+            self._response_metadata.update(metadata)
+
+    def _add_tool_call_deltas(self, deltas: list[dict]):
+        for position, delta in enumerate(deltas):
+            index = delta.get("index", position)
+            call = self._tool_calls.get(index, None)
+            if call is None:
+                call = self._tool_calls[index] = {
+                    "index": index,
+                    "id": None,
+                    "type": None,
+                    "name": [],
+                    "arguments": [],
+                }
+            for key in ("id", "type"):
+                if delta.get(key, None):
+                    call[key] = delta[key]
+            function = delta.get("function", None) or {}
+            if function.get("name", None):
+                call["name"].append(function["name"])
+            if function.get("arguments", None):
+                call["arguments"].append(function["arguments"])
+
+    def _add_function_call_delta(self, delta: dict):
+        if self._function_call is None:
+            self._function_call = {"name": [], "arguments": []}
+        for key in ("name", "arguments"):
+            if delta.get(key, None):
+                self._function_call[key].append(delta[key])
+
+    def _build(self) -> BaseMessage | None:
+        if self._merged is not None:
+            return self._merged
+        if self._message_class is None:
+            return None
+
+        content = "".join(self._content)
+        # Keep the joined content, so the next build only joins the new fragments
+        self._content = [content] if content else []
+
+        kwargs = {**self._kwargs}
+        for key, parts in self._string_kwargs.items():
+            kwargs[key] = "".join(parts)
+        if self._tool_calls:
+            kwargs["tool_calls"] = [
+                {
+                    "index": call["index"],
+                    "id": call["id"],
+                    "function": {
+                        "arguments": "".join(call["arguments"]),
+                        "name": "".join(call["name"]),
+                    },
+                    "type": call["type"],
+                }
+                for _, call in sorted(self._tool_calls.items())
+            ]
+        if self._function_call:
+            kwargs["function_call"] = {
+                key: "".join(parts) for key, parts in self._function_call.items()
+            }
+
+        message_kwargs = {"content": content, "additional_kwargs": kwargs}
+        if self._response_metadata:
+            message_kwargs["response_metadata"] = {**self._response_metadata}
+        return self._message_class(**message_kwargs)
+
+    @property
+    def message(self) -> BaseMessage | None:
+        """The response received so far, built on demand and cached until the next chunk"""
+        if self._message is None:
+            self._message = self._build()
+        return self._message
@@ -1,4 +1,5 @@
-from dataclasses import dataclass
+import threading
+from dataclasses import dataclass, field
 from typing import Optional
 
 from langchain_core.language_models import BaseLanguageModel
@@ -6,6 +7,7 @@ from langchain_core.language_models import BaseLanguageModel
 from gptextual.config.app_config import APIProviderConfig
 
 from gptextual.config import AppConfig, APIProvider
+from gptextual.runtime.context import ContextStrategy, create_context_strategies
 
 
 @dataclass
@@ -13,7 +15,14 @@ class ChatModel:
     name: str
     api_provider: str
     context_window: int = 4097
+    context_trim_ratio: float = 0.6
+    request_token_budget: int | None = None
+    context_strategies: list[ContextStrategy] = field(default_factory=list)
+    fallbacks: list[str] = field(default_factory=list)
+    hedge_after: float | None = None
     _model: BaseLanguageModel = None
+    # The model instance may be created by the pre-warm worker and a request at once
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
 
     def __hash__(self) -> int:
         return hash(self.name)
@@ -25,9 +34,37 @@ class ChatModel:
     def default_max_tokens(self):
         return int(min(self.context_window * 0.1, 2000))
 
+    @property
+    def request_budget(self) -> int:
+        """Maximum number of tokens per request, including the reserved output tokens"""
+        if self.request_token_budget:
+            return min(self.request_token_budget, self.context_window)
+        return self.context_window
+
+    def fallback_models(self) -> list["ChatModel"]:
+        """The configured fallback models, which are resolved in the model registry"""
+        models = []
+        for fallback in self.fallbacks:
+            name, _, api_provider = fallback.rpartition("@")
+            if not name:
+                name, api_provider = fallback, self.api_provider
+            model = ModelRegistry.model_from_name(name, api_provider)
+            if model is None:
+                raise ValueError(
+                    f"Configuration Error: Fallback model {fallback} of model {self.name}@{self.api_provider} is not configured"
+                )
+            if model is not self:
+                models.append(model)
+        return models
+
     @property
     def llm_model(self):
-        if not self._model:
+        if self._model:
+            return self._model
+
+        with self._lock:
+            if self._model:
+                return self._model
             config = AppConfig.get_instance()
             api_provider_config: APIProviderConfig = getattr(
                 config.api_config, self.api_provider
@@ -81,6 +118,13 @@ class ModelRegistry:
                             name=name,
                             api_provider=api_provider,
                             context_window=conf.context_window,
+                            context_trim_ratio=conf.context_trim_ratio,
+                            request_token_budget=conf.request_token_budget,
+                            context_strategies=create_context_strategies(
+                                conf.context_strategies
+                            ),
+                            fallbacks=conf.fallbacks or [],
+                            hedge_after=conf.hedge_after,
                         )
                         for name, conf in models.items()
                     },
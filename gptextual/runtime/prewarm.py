@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import httpx
+
+from gptextual.logging import logger
+from gptextual.runtime.conv_manager import ConversationManager
+from gptextual.runtime.models import ChatModel
+
+
+def models_to_prewarm(current_model: ChatModel | None, recent_models: int) -> list:
+    """The current model and the models of the most recently updated conversations"""
+    models = [current_model] if current_model else []
+    recent = 0
+    for conversation in ConversationManager.all_conversations():
+        if recent >= recent_models:
+            break
+        model = conversation.model
+        if model is not None and model not in models:
+            models.append(model)
+            recent += 1
+    return models
+
+
+def sdk_http_client(llm) -> tuple[httpx.AsyncClient, str] | None:
+    """
+    Returns the async HTTP client of the provider SDK that a LangChain model streams
+    with, and the base URL of the API. None if the model does not expose one.
+    """
+    for attr in ("async_client", "_async_client"):
+        obj, base_url = getattr(llm, attr, None), None
+        # OpenAI models hold a resource of the SDK client, Anthropic models the client
+        for _ in range(3):
+            if obj is None:
+                break
+            if isinstance(obj, httpx.AsyncClient):
+                return (obj, str(base_url)) if base_url else None
+            base_url = getattr(obj, "base_url", base_url)
+            obj = getattr(obj, "_client", None)
+    return None
+
+
+async def warm_up_connection(model: ChatModel) -> bool:
+    """
+    Opens a connection to the API of the model in the connection pool of its SDK
+    client, so the first request does not wait for the TCP and TLS handshakes.
+    """
+    client = sdk_http_client(model.llm_model)
+    if client is None:
+        return False
+    http_client, base_url = client
+    try:
+        # Any response will do, the connection is kept alive in the pool
+        await http_client.head(base_url, timeout=5)
+        return True
+    except httpx.HTTPError as ex:
+        logger().info(
+            f"Could not connect to the API of model {model.name}@{model.api_provider}: {ex}"
+        )
+        return False
+
+
+async def prewarm_models(models: list[ChatModel], *, connect: bool = False) -> list:
+    """
+    Creates the LangChain model instances of the given models in a thread and,
+    with connect, opens a connection to their APIs. Returns the timings per model.
+    """
+    timings = []
+    for model in models:
+        start = time.monotonic()
+        try:
+            await asyncio.to_thread(getattr, model, "llm_model")
+        except Exception as ex:
+            logger().error(
+                f"Error pre-warming model {model.name}@{model.api_provider}: {ex}"
+            )
+            continue
+        timing = {
+            "model": f"{model.name}@{model.api_provider}",
+            "create_seconds": round(time.monotonic() - start, 3),
+        }
+        if connect:
+            start = time.monotonic()
+            timing["connected"] = await warm_up_connection(model)
+            timing["connect_seconds"] = round(time.monotonic() - start, 3)
+        logger().info(f"Pre-warmed model {timing['model']}", extra=timing)
+        timings.append(timing)
+    return timings
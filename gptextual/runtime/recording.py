@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from langchain_core.messages import BaseMessage
+
+from gptextual.logging import logger
+
+recording_path = Path.home() / (".gptextual") / "recordings"
+
+# Appends the recordings off the event loop, one at a time and in order
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="stream-recorder")
+
+
+@dataclass
+class RecordedStream:
+    """A recorded response, its chunks with their arrival times and how it ended"""
+
+    model: str
+    # {"t": seconds after the request, "content": ..., "kwargs": {...}}
+    chunks: list[dict] = field(default_factory=list)
+    # {"t": ..., "completed": bool, "error": ..., "status": ...}
+    end: dict = field(default_factory=dict)
+
+
+class StreamRecorder:
+    """
+    Records the chunks of a streamed response with the time since the request was
+    started, including tool call deltas and errors. The streams of a conversation
+    are appended to one gzipped JSONL file in the recordings folder, which the mock
+    provider can replay (replay_file).
+    """
+
+    def __init__(self, conversation_id: str, messages: int) -> None:
+        self.path = recording_path / f"{conversation_id}.jsonl.gz"
+        self.messages = messages
+        self.started_at = time.time()
+        self.chunks: list[dict] = []
+        self.completed = False
+        self.error: Exception | None = None
+        self._start = time.monotonic()
+
+    def _elapsed(self) -> float:
+        return round(time.monotonic() - self._start, 4)
+
+    def add(self, chunk: BaseMessage):
+        line = {"t": self._elapsed()}
+        if chunk.content:
+            line["content"] = chunk.content
+        kwargs = {k: v for k, v in chunk.additional_kwargs.items() if v}
+        if kwargs:
+            line["kwargs"] = kwargs
+        self.chunks.append(line)
+
+    def save_in_background(self, model: str) -> Future:
+        """Saves the stream in the writer thread of the recordings, see save"""
+        return _writer.submit(self.save, model)
+
+    def save(self, model: str):
+        """Appends the stream to the recording file, errors are only logged"""
+        header = {
+            "type": "stream",
+            "model": model,
+            "started_at": self.started_at,
+            "messages": self.messages,
+        }
+        end = {"type": "end", "t": self._elapsed(), "completed": self.completed}
+        if self.error is not None:
+            end["error"] = str(self.error)
+            status = getattr(self.error, "status_code", None)
+            if status:
+                end["status"] = status
+        try:
+            os.makedirs(recording_path, exist_ok=True)
+            # Each stream is a gzip member of its own, members can be concatenated
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                for line in (header, *self.chunks, end):
+                    f.write(json.dumps(line, ensure_ascii=False) + "\n")
+        except Exception as ex:
+            logger().error(f"There was an error saving the stream recording: {ex}")
+
+
+def read_recording(path: Path | str) -> list[RecordedStream]:
+    """Reads the recorded streams of a recording file, in the order of recording"""
+    streams: list[RecordedStream] = []
+    with gzip.open(Path(path).expanduser(), "rt", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            kind = entry.pop("type", None)
+            if kind == "stream":
+                streams.append(RecordedStream(model=entry.get("model", None)))
+            elif streams and kind == "end":
+                streams[-1].end = entry
+            elif streams:
+                streams[-1].chunks.append(entry)
+    return streams
@@ -0,0 +1,255 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import re
+import time
+from collections import deque
+from enum import IntEnum
+
+from gptextual.config import AppConfig
+from gptextual.logging import logger
+
+# Schedulers by API provider
+_SCHEDULERS: dict[str, ProviderScheduler] = {}
+
+# A rate limit error halves the limits, they recover by this factor per minute
+_BACKOFF_FACTOR = 0.5
+_RECOVERY_FACTOR = 1.25
+_MIN_REQUESTS_PER_MINUTE = 1.0
+
+# Rate limit errors without a status code, "429" must not be part of a number
+_RATE_LIMIT_TEXT = re.compile(r"\b429\b|rate[ _]limit")
+
+
+class Priority(IntEnum):
+    FOREGROUND = 0  # the conversation the user is looking at
+    BACKGROUND = 1
+
+
+class TokenBucket:
+    """Allows rate_per_minute units per minute, with bursts of up to one minute"""
+
+    def __init__(self, rate_per_minute: float) -> None:
+        self.rate_per_minute = rate_per_minute
+        self.available = rate_per_minute
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(
+            self.rate_per_minute,
+            self.available + (now - self._updated) * self.rate_per_minute / 60,
+        )
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until amount units are available"""
+        self._refill()
+        # A single request may be larger than the limit, it waits for a full bucket
+        amount = min(amount, self.rate_per_minute)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) * 60 / self.rate_per_minute
+
+    def take(self, amount: float):
+        self._refill()
+        self.available -= min(amount, self.rate_per_minute)
+
+    def set_rate(self, rate_per_minute: float):
+        self._refill()
+        self.rate_per_minute = rate_per_minute
+        self.available = min(self.available, rate_per_minute)
+
+
+class ProviderScheduler:
+    """
+    Admits the requests to one API provider within its requests and tokens per
+    minute limits. Waiting requests are admitted by priority, so the conversation
+    in the foreground is not stuck behind background chats and function loops.
+
+    Rate limit errors reported by the provider halve the limits, which recover
+    while no further errors occur. Without configured limits, the first rate limit
+    error sets a requests per minute limit from the recent request rate.
+    """
+
+    def __init__(
+        self,
+        api_provider: str,
+        *,
+        requests_per_minute: int | None = None,
+        tokens_per_minute: int | None = None,
+    ) -> None:
+        self.api_provider = api_provider
+        self.configured = {
+            "requests": requests_per_minute,
+            "tokens": tokens_per_minute,
+        }
+        self.buckets: dict[str, TokenBucket] = {
+            key: TokenBucket(rate) for key, rate in self.configured.items() if rate
+        }
+        self._waiting: list = []
+        self._sequence = itertools.count()
+        self._changed: asyncio.Event | None = None
+        self._dispatcher: asyncio.Task | None = None
+        self._admitted_at: deque[float] = deque()
+        self._rate_limited_at: float | None = None
+        self._recovered_at: float | None = None
+        # Queueing metrics
+        self.admitted = 0
+        self.rate_limited = 0
+        self.max_queue_length = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    async def acquire(self, tokens: int, *, priority: Priority = Priority.BACKGROUND):
+        """Waits until a request of the given number of tokens may be sent"""
+        start = time.monotonic()
+        if self.buckets:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(
+                self._waiting, (priority, next(self._sequence), tokens, future)
+            )
+            self.max_queue_length = max(self.max_queue_length, len(self._waiting))
+            self._wake_dispatcher()
+            await future
+        else:
+            self._admit(tokens)
+
+        waited = time.monotonic() - start
+        self.total_wait_seconds += waited
+        self.max_wait_seconds = max(self.max_wait_seconds, waited)
+        if waited > 0.1:
+            logger().info(
+                f"Request to API provider {self.api_provider} waited {waited:.2f}s for its rate limits",
+                extra=self.metrics(),
+            )
+
+    def _wake_dispatcher(self):
+        if self._changed is None:
+            self._changed = asyncio.Event()
+        self._changed.set()
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    async def _dispatch(self):
+        while self._waiting:
+            _, _, tokens, future = self._waiting[0]
+            if future.done():
+                # The waiting request was cancelled
+                heapq.heappop(self._waiting)
+                continue
+
+            delay = max(
+                (
+                    bucket.wait_time(1 if key == "requests" else tokens)
+                    for key, bucket in self.buckets.items()
+                ),
+                default=0.0,
+            )
+            if delay > 0:
+                # Wake up early if a request with a higher priority arrives
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            heapq.heappop(self._waiting)
+            self._admit(tokens)
+            future.set_result(None)
+
+    def _admit(self, tokens: int):
+        for key, bucket in self.buckets.items():
+            bucket.take(1 if key == "requests" else tokens)
+        now = time.monotonic()
+        self.admitted += 1
+        self._admitted_at.append(now)
+        while self._admitted_at and self._admitted_at[0] < now - 60:
+            self._admitted_at.popleft()
+        self._recover(now)
+
+    def _recover(self, now: float):
+        if self._rate_limited_at is None or now - self._recovered_at < 60:
+            return
+        self._recovered_at = now
+        recovered = True
+        for key, bucket in self.buckets.items():
+            limit = self.configured.get(key, None)
+            rate = bucket.rate_per_minute * _RECOVERY_FACTOR
+            if limit:
+                rate = min(rate, limit)
+                recovered = recovered and rate >= limit
+            else:
+                recovered = False
+            bucket.set_rate(rate)
+        if recovered:
+            self._rate_limited_at = None
+
+    def report_rate_limited(self):
+        """Reduces the limits after the provider rejected a request with a rate limit error"""
+        now = time.monotonic()
+        self.rate_limited += 1
+        self._rate_limited_at = self._recovered_at = now
+        if "requests" not in self.buckets:
+            # Learn a limit from the requests that were admitted in the last minute
+            self.buckets["requests"] = TokenBucket(
+                max(len(self._admitted_at), _MIN_REQUESTS_PER_MINUTE)
+            )
+        for bucket in self.buckets.values():
+            bucket.set_rate(
+                max(bucket.rate_per_minute * _BACKOFF_FACTOR, _MIN_REQUESTS_PER_MINUTE)
+            )
+        logger().warning(
+            f"API provider {self.api_provider} rate limited a request, reducing the request rate",
+            extra=self.metrics(),
+        )
+
+    def metrics(self) -> dict:
+        return {
+            "api_provider": self.api_provider,
+            "queued": sum(1 for *_, future in self._waiting if not future.done()),
+            "max_queue_length": self.max_queue_length,
+            "admitted": self.admitted,
+            "rate_limited": self.rate_limited,
+            "total_wait_seconds": round(self.total_wait_seconds, 3),
+            "max_wait_seconds": round(self.max_wait_seconds, 3),
+            **{
+                f"{key}_per_minute": round(bucket.rate_per_minute, 1)
+                for key, bucket in self.buckets.items()
+            },
+        }
+
+
+def get_scheduler(api_provider: str) -> ProviderScheduler:
+    scheduler = _SCHEDULERS.get(api_provider, None)
+    if scheduler is None:
+        config = getattr(
+            AppConfig.get_instance().api_config, api_provider.replace("-", "_"), None
+        )
+        scheduler = _SCHEDULERS[api_provider] = ProviderScheduler(
+            api_provider,
+            requests_per_minute=config.requests_per_minute if config else None,
+            tokens_per_minute=config.tokens_per_minute if config else None,
+        )
+    return scheduler
+
+
+def scheduler_metrics() -> list[dict]:
+    return [scheduler.metrics() for scheduler in _SCHEDULERS.values()]
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    Whether the provider rejected a request because of its rate limits. The status
+    code of the error is trusted if there is one, the error text is only checked for
+    errors without one, e.g. of SDKs that wrap the HTTP error.
+    """
+    status = getattr(error, "status_code", None) or getattr(
+        getattr(error, "response", None), "status_code", None
+    )
+    if status is not None:
+        return status == 429
+    return _RATE_LIMIT_TEXT.search(str(error).lower()) is not None
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import re
+from functools import cache
+
+import tiktoken
+from tiktoken import Encoding
+
+
+# Splits text before line breaks and before the space after a sentence end. The
+# tokenizers of the LLMs never merge tokens across these positions, so the token count
+# of a text is (almost exactly) the sum of the token counts of its segments.
+_SEGMENT_BOUNDARY = re.compile(r"(?=\n)|(?<=[.!?])(?= )")
+
+
+@cache
+def get_encoder(model_name: str) -> Encoding | None:
+    """
+    Returns the tiktoken encoding for the given model name, or None if there is no
+    tokenizer available for the model.
+
+    Loading an encoding is expensive (the BPE ranks are read from disk or downloaded),
+    so encoders are shared across the whole app.
+    """
+    if not model_name:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model_name)
+    except Exception:
+        return None
+
+
+def count_tokens(text: str, model_name: str) -> int:
+    """Counts the tokens of text, or estimates them without a tokenizer for the model"""
+    encoder = get_encoder(model_name)
+    if encoder:
+        return len(encoder.encode(text, disallowed_special=()))
+    return int(len(text) / 3.5)
+
+
+def truncate_text(text: str, max_tokens: int, model_name: str) -> str:
+    """
+    Shortens text to about max_tokens by keeping its head and tail and replacing
+    the middle with a marker. Without a tokenizer for the model, tokens are
+    estimated from the number of characters.
+    """
+    encoder = get_encoder(model_name)
+    if encoder:
+        tokens = encoder.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        head, tail = (max_tokens + 1) // 2, max_tokens // 2
+        omitted = len(tokens) - head - tail
+        return (
+            encoder.decode(tokens[:head])
+            + f"\n[... {omitted} tokens omitted ...]\n"
+            + (encoder.decode(tokens[-tail:]) if tail else "")
+        )
+
+    # Very rough estimate, see Conversation.get_num_tokens_from_messages
+    max_chars = int(max_tokens * 3.5)
+    if len(text) <= max_chars:
+        return text
+    head, tail = (max_chars + 1) // 2, max_chars // 2
+    omitted = int((len(text) - head - tail) / 3.5)
+    return (
+        text[:head]
+        + f"\n[... ~{omitted} tokens omitted ...]\n"
+        + (text[-tail:] if tail else "")
+    )
+
+
+class IncrementalTokenCounter:
+    """
+    Counts the tokens of a text which is edited over time, e.g. in an input field.
+
+    The text is split into segments at content defined boundaries and the token
+    count of each segment is cached, so after an edit only the edited segments are
+    encoded again.
+    """
+
+    def __init__(self, model_name: str) -> None:
+        self.encoder = get_encoder(model_name)
+        self._segment_counts: dict[str, int] = {}
+
+    def _count_segment(self, segment: str) -> int:
+        if self.encoder:
+            return len(self.encoder.encode(segment, disallowed_special=()))
+        return int(len(segment) / 3.5)
+
+    def count(self, text: str) -> int:
+        counts = {}
+        total = 0
+        for segment in _SEGMENT_BOUNDARY.split(text):
+            n = counts.get(segment, None)
+            if n is None:
+                n = self._segment_counts.get(segment, None)
+                if n is None:
+                    n = self._count_segment(segment)
+                counts[segment] = n
+            total += n
+        # Only keep the segments of the current text
+        self._segment_counts = counts
+        return total
@@ -1,22 +1,30 @@
 import os
+import sys
 from typing import Optional
 
 from textual.app import App
 
 from toolong.watcher import get_watcher
 
-from gptextual.logging import setup_logging, log_path
+from gptextual.logging import setup_logging, log_path, logger
 from gptextual.config import AppConfig
 from gptextual.runtime.function_calling.function_call_support import (
     load_function_entry_points,
 )
+from gptextual.runtime.function_calling.executors import shutdown_process_pools
+from gptextual.runtime.http_clients import aclose_http_clients, pool_stats
 from gptextual.runtime.models import AppContext
+from gptextual.runtime.prewarm import models_to_prewarm, prewarm_models
+from gptextual.runtime.scheduler import scheduler_metrics
 from gptextual.runtime.conv_manager import ConversationManager
 from gptextual.runtime.conversation import conversation_path, export_path
 
 from gptextual.textual_ui.screens import ChatScreenDark, ChatScreenLight
 from gptextual.textual_ui.widgets.footer import CommandFooter, Command, Field
 
+# Seconds between logs of the HTTP connection pools during the session
+POOL_STATS_INTERVAL = 300
+
 
 class GPTextual(App):
     def __init__(self, context: Optional[AppContext] = None) -> None:
@@ -34,6 +42,7 @@ class GPTextual(App):
         self.merge = True
         self.save_merge = False
         self.watcher = None
+        self._logged_pool_requests = None
 
     def start_log_watcher(self):
         if self.watcher:
@@ -66,12 +75,51 @@ class GPTextual(App):
         self.push_screen(
             ChatScreenLight() if config.theme == "light" else ChatScreenDark()
         )
+        self.call_after_refresh(self.prewarm)
+        self.set_interval(POOL_STATS_INTERVAL, self.log_pool_stats)
+
+    def log_pool_stats(self) -> None:
+        """Logs the HTTP connection pools, if requests were sent since the last log"""
+        stats = pool_stats()
+        requests = {name: pool["requests"] for name, pool in stats.items()}
+        if stats and requests != self._logged_pool_requests:
+            self._logged_pool_requests = requests
+            logger().info("HTTP connection pools", extra={"pools": stats})
+
+    def prewarm(self) -> None:
+        """Creates the LLM clients in the background, see PrewarmConfig"""
+        config = AppConfig.get_instance().runtime.prewarm
+        if not config.enabled:
+            return
+        try:
+            current_model = self.app_context.current_model
+        except ValueError:
+            current_model = None
+        self.run_worker(
+            prewarm_models(
+                models_to_prewarm(current_model, config.recent_models),
+                connect=config.connect,
+            ),
+            group="prewarm",
+            exit_on_error=False,
+        )
 
-    def on_unmount(self) -> None:
+    async def on_unmount(self) -> None:
         self.stop_log_watcher()
+        shutdown_process_pools()
+        self.log_pool_stats()
+        schedulers = scheduler_metrics()
+        if schedulers:
+            logger().info("Request schedulers", extra={"schedulers": schedulers})
+        await aclose_http_clients()
 
 
 def run():
+    if sys.argv[1:2] == ["batch"]:
+        from gptextual.runtime.batch import main
+
+        sys.exit(main(sys.argv[2:]))
+
     app = GPTextual()
     app.run()
 
@@ -1,3 +1,4 @@
 from .chat_screen import ChatScreen, ChatScreenDark, ChatScreenLight
+from .fan_out_screen import FanOutScreen
 from .message_info_modal import MessageInfo
 from .search_screen import SearchScreen
@@ -28,6 +28,12 @@ class ChatScreen(Screen):
         Binding(
             "ctrl+l", action="open_log", description="Show Log File", key_display="^l"
         ),
+        Binding(
+            "escape",
+            action="cancel_stream",
+            description="Cancel Response",
+            key_display="esc",
+        ),
     ]
 
     def __init__(self):
@@ -69,6 +75,11 @@ class ChatScreen(Screen):
         chat_list.current_chat_id = event.chat_id
         self.chat.allow_input_submit = True
 
+    @on(Chat.FanOutSaved)
+    async def on_fan_out_saved(self, event: Chat.FanOutSaved) -> None:
+        self.query_one(ChatList).reload_and_refresh()
+        await self.on_chat_opened(ChatList.ChatOpened(event.chat_ids[0]))
+
     @on(ChatList.ChatDeleted)
     async def on_chat_deleted(self, event: ChatList.ChatDeleted) -> None:
         await self.action_new_chat()
@@ -106,6 +117,9 @@ class ChatScreen(Screen):
         await chat.prepare_for_new_chat()
         chat.chat_options.provider_select.focus()
 
+    def action_cancel_stream(self) -> None:
+        self.chat.action_cancel_stream()
+
     def action_open_log(self) -> None:
         self.app.push_screen(LogScreen())
 
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+from langchain.schema import BaseMessage, HumanMessage
+
+from textual import on
+from textual.app import ComposeResult
+from textual.binding import Binding
+from textual.containers import (
+    Horizontal,
+    ScrollableContainer,
+    Vertical,
+    VerticalScroll,
+)
+from textual.screen import Screen
+from textual.widgets import Button, SelectionList, Static, TextArea
+from textual.worker import Worker, WorkerState
+
+from gptextual.config import AppConfig
+from gptextual.runtime import ChatModel, ModelRegistry, StreamingMessage
+from gptextual.runtime.fan_out import (
+    create_fan_out_conversations,
+    save_linked_conversations,
+    stream_with_metrics,
+)
+from gptextual.runtime.langchain.schema import new_message_of_type
+from gptextual.textual_ui.widgets.chatbox import Chatbox
+
+
+class FanOutColumn(Vertical):
+    """The streamed response of one model, with its metrics"""
+
+    def __init__(self, conversation, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.conversation = conversation
+        self.chatbox = Chatbox(model_name=conversation.model.name)
+        self.metrics = Static("Waiting for the first token...", classes="metrics")
+
+    def compose(self) -> ComposeResult:
+        model = self.conversation.model
+        yield Static(f"{model.name}@{model.api_provider}", classes="title")
+        yield self.metrics
+        with VerticalScroll():
+            yield self.chatbox
+
+    def show_metrics(self, response: BaseMessage | None):
+        metrics = response.additional_kwargs.get("stream_metrics") if response else None
+        if not metrics:
+            self.metrics.update("No response")
+            return
+        self.metrics.update(
+            f"first token {metrics['ttft_seconds']:.2f}s · "
+            f"total {metrics['latency_seconds']:.2f}s · "
+            f"{metrics['output_tokens']} tokens · "
+            f"{metrics['tokens_per_second'] or 0:.1f} tokens/s"
+        )
+
+
+class FanOutScreen(Screen):
+    """Sends one prompt to several models at once and streams their responses"""
+
+    BINDINGS = [
+        Binding("escape", "close", "Close"),
+        Binding("ctrl+t", "toggle_layout", "Side by side / stacked", key_display="^t"),
+        Binding("ctrl+s", "save", "Save as linked chats", key_display="^s"),
+    ]
+
+    DEFAULT_CSS = """
+    FanOutScreen #fan-out-options {
+      height: 12;
+      margin: 1 2;
+    }
+
+    FanOutScreen SelectionList {
+      width: 40;
+      height: 12;
+    }
+
+    FanOutScreen #fan-out-prompt {
+      height: 9;
+    }
+
+    FanOutScreen #fan-out-buttons {
+      height: 3;
+    }
+
+    FanOutScreen #fan-out-buttons Button {
+      margin-right: 2;
+    }
+
+    FanOutScreen #fan-out-results {
+      layout: horizontal;
+      height: 1fr;
+    }
+
+    FanOutScreen #fan-out-results.stacked {
+      layout: vertical;
+    }
+
+    FanOutScreen FanOutColumn {
+      width: 1fr;
+      height: 1fr;
+      margin: 0 1;
+    }
+
+    FanOutScreen #fan-out-results.stacked FanOutColumn {
+      height: auto;
+    }
+
+    FanOutScreen #fan-out-results.stacked FanOutColumn VerticalScroll {
+      height: auto;
+    }
+
+    FanOutScreen FanOutColumn .title {
+      text-style: bold;
+    }
+
+    FanOutScreen FanOutColumn .metrics {
+      color: $text-muted;
+    }
+    """
+
+    def __init__(
+        self,
+        *args,
+        prompt: str = "",
+        selected: list[ChatModel] = None,
+        system_message: str = None,
+        **kwargs,
+    ) -> None:
+        super().__init__(*args, **kwargs)
+        self.prompt = prompt
+        self.system_message = system_message
+        selected = selected or []
+        self.models = list(ModelRegistry.get_instance().all_models())
+        self.model_list = SelectionList[int](
+            *(
+                (f"{model.name}@{model.api_provider}", index, model in selected)
+                for index, model in enumerate(self.models)
+            ),
+            id="fan-out-models",
+        )
+        self.columns: list[FanOutColumn] = []
+
+    def compose(self) -> ComposeResult:
+        with Horizontal(id="fan-out-options"):
+            yield self.model_list
+            with Vertical():
+                yield TextArea(self.prompt, id="fan-out-prompt")
+                with Horizontal(id="fan-out-buttons"):
+                    yield Button("Send to all", id="fan-out-send", variant="primary")
+                    yield Button(
+                        "Save as linked chats", id="fan-out-save", disabled=True
+                    )
+        yield ScrollableContainer(id="fan-out-results")
+
+    def on_mount(self) -> None:
+        self.query_one("#fan-out-prompt", TextArea).focus()
+
+    @property
+    def fan_out_workers(self) -> list[Worker]:
+        return [
+            worker
+            for worker in self.workers
+            if worker.node is self and worker.group == "fan_out"
+        ]
+
+    @property
+    def streaming(self) -> bool:
+        return any(worker.is_running for worker in self.fan_out_workers)
+
+    @on(Button.Pressed, "#fan-out-send")
+    async def send(self, event: Button.Pressed) -> None:
+        event.stop()
+        prompt = self.query_one("#fan-out-prompt", TextArea).text
+        models = [self.models[index] for index in self.model_list.selected]
+        if self.streaming:
+            return
+        if not prompt or len(models) < 2:
+            self.notify(
+                "Enter a prompt and select at least two models", severity="warning"
+            )
+            return
+
+        message = new_message_of_type(HumanMessage, content=prompt)
+        results = self.query_one("#fan-out-results")
+        await results.remove_children()
+        self.columns = [
+            FanOutColumn(conversation)
+            for conversation in create_fan_out_conversations(
+                models, system_message=self.system_message
+            )
+        ]
+        await results.mount_all(self.columns)
+        self.query_one("#fan-out-save", Button).disabled = True
+        for column in self.columns:
+            self._bind_stream_to_column(column)
+            self.run_worker(
+                self._stream(column, message), group="fan_out", exclusive=False
+            )
+
+    async def _stream(self, column: FanOutColumn, message: HumanMessage) -> None:
+        response = await stream_with_metrics(column.conversation, message)
+        column.conversation.on_stream_chunk = None
+        column.show_metrics(response)
+
+    def _bind_stream_to_column(self, column: FanOutColumn) -> None:
+        config = AppConfig.get_instance().textual
+        chatbox = column.chatbox
+
+        async def on_chunk(chunk, chunk_no):
+            if isinstance(chunk, StreamingMessage):
+                if (
+                    chunk_no % config.refresh_no_stream_chunks != 0
+                    and chunk.status == chatbox.status
+                ):
+                    return
+                chatbox.status = chunk.status
+                if chunk.message is not None:
+                    chatbox.message = chunk.message
+            elif isinstance(chunk, BaseMessage):
+                chatbox.message = chunk
+                chatbox.status = None
+            chatbox.refresh(layout=True)
+
+        column.conversation.on_stream_chunk = on_chunk
+
+    @on(Worker.StateChanged)
+    def on_worker_state_changed(self, event: Worker.StateChanged) -> None:
+        if event.worker.group == "fan_out" and event.state in (
+            WorkerState.SUCCESS,
+            WorkerState.ERROR,
+            WorkerState.CANCELLED,
+        ):
+            self.query_one("#fan-out-save", Button).disabled = self.streaming
+
+    @on(Button.Pressed, "#fan-out-save")
+    def on_save(self, event: Button.Pressed) -> None:
+        event.stop()
+        self.action_save()
+
+    def action_save(self) -> None:
+        if not self.columns or self.streaming:
+            return
+        ids = save_linked_conversations([c.conversation for c in self.columns])
+        self.dismiss(ids)
+
+    def action_toggle_layout(self) -> None:
+        self.query_one("#fan-out-results").toggle_class("stacked")
+
+    def action_close(self) -> None:
+        for worker in self.fan_out_workers:
+            worker.cancel()
+        self.dismiss([])
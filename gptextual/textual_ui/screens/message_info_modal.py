@@ -54,13 +54,14 @@ class MessageInfo(ModalScreen):
                     )
 
             with Horizontal(id="message-info-footer"):
-                if self.model_name:
-                    token_count = len(self.token_analysis.tokens)
-
                 timestamp = self.message.additional_kwargs.get("timestamp", 0)
                 timestamp_string = format_timestamp(timestamp)
                 yield Static(f"Message sent at {timestamp_string}", id="timestamp")
-                yield Static(f"{token_count} tokens", id="token-count")
+                yield Static("... tokens", id="token-count")
+
+    @on(TokenAnalysis.Tokenized)
+    def tokens_counted(self, event: TokenAnalysis.Tokenized) -> None:
+        self.query_one("#token-count", Static).update(f"{event.token_count} tokens")
 
     @on(Tabs.TabActivated)
     def tab_activated(self, event: Tabs.TabActivated) -> None:
@@ -1,7 +1,10 @@
 from __future__ import annotations
 
+import asyncio
+from contextlib import aclosing
 from dataclasses import dataclass
 from langchain.schema import (
+    AIMessage,
     BaseMessage,
     HumanMessage,
 )
@@ -26,10 +29,17 @@ from gptextual.runtime import (
 )
 from gptextual.runtime.langchain.schema import new_message_of_type
 
+from gptextual.textual_ui.screens.fan_out_screen import FanOutScreen
+
 from gptextual.textual_ui.widgets.typing_indicator import IsTyping
 from gptextual.textual_ui.widgets.header import ChatHeader
 from gptextual.textual_ui.widgets.model_select import ModelSelect
 from gptextual.textual_ui.widgets.chatbox import Chatbox, ChatboxContainer
+from gptextual.textual_ui.widgets.token_meter import TokenMeter
+
+
+# Status of the chatboxes of messages queued while a response is streaming
+PENDING_STATUS = "Pending, sent when the current response is complete"
 
 
 class ChatInputArea(TextArea):
@@ -80,6 +90,15 @@ class Chat(Widget):
     
     
     """
+    BINDINGS = [
+        Binding(
+            key="ctrl+o",
+            action="fan_out",
+            description="Fan-out",
+            key_display="^o",
+        ),
+    ]
+
     allow_input_submit = var(True)
     """Used to lock the chat input while the agent is responding."""
 
@@ -92,12 +111,23 @@ class Chat(Widget):
         self.input_area = ChatInputArea(self, id="chat-input", classes="singleline")
         self.responding_indicator = IsTyping()
         self.responding_indicator.display = False
+        self.token_meter = TokenMeter(id="token-meter")
         self.multiline = False
 
         # needed for search
         self.chatboxes_by_id = {}
         self.uuid_gen = ShortUUID()
 
+    @property
+    def chat_id(self) -> str | None:
+        return self._chat_id
+
+    @chat_id.setter
+    def chat_id(self, chat_id: str | None):
+        self._chat_id = chat_id
+        # Requests of the conversation on screen are scheduled first
+        Conversation.foreground_id = chat_id
+
     @dataclass
     class FirstMessageSent(Message):
         chat_data: Conversation
@@ -111,12 +141,17 @@ class Chat(Widget):
         chat_id: str
         message: BaseMessage
 
+    @dataclass
+    class FanOutSaved(Message):
+        chat_ids: list[str]
+
     def compose(self) -> ComposeResult:
         yield ChatHeader()
         with Vertical(id="chat-input-container"):
             with Horizontal(id="chat-input-text-container"):
                 yield self.input_area
                 yield Button("Send", id="btn-submit")
+            yield self.token_meter
             yield self.responding_indicator
 
         with VerticalScroll(id="chat-scroll-container") as vertical_scroll:
@@ -141,6 +176,21 @@ class Chat(Widget):
 
         height = self.input_area.get_content_height(None, None, None)
         update_height(height)
+        self.update_token_meter()
+
+    @on(ModelSelect.ModelSelected)
+    def on_model_selected(self, event: ModelSelect.ModelSelected):
+        self.update_token_meter()
+
+    def update_token_meter(self):
+        conversation = self.current_conversation
+        self.token_meter.update_count(
+            text=self.input_area.text,
+            model=conversation.model
+            if conversation
+            else self.app.app_context.current_model,
+            conversation=conversation,
+        )
 
     @on(ChatInputArea.Submit)
     async def user_chat_message_submitted(self, event: ChatInputArea.Submit) -> None:
@@ -215,22 +265,27 @@ class Chat(Widget):
             chat_boxes.append(
                 Chatbox(model_name=model_name, message=stream_message.message)
             )
+            chat_boxes[-1].status = stream_message.status
             # By binding the current stream to the new chatbox, we can resume the stream
             # even after the user navigated to another conversation in between
             self._bind_stream_to_chatbox(chatbox=chat_boxes[-1], conversation=chat)
-            self.allow_input_submit = False
-        else:
-            self.allow_input_submit = True
+        for message in chat.pending:
+            chat_boxes.append(Chatbox(model_name=model_name, message=message))
+            chat_boxes[-1].status = PENDING_STATUS
+        # Messages sent while the response is streaming are queued
+        self.allow_input_submit = True
 
         await self.mount_chat_boxes(chat_boxes)
         # await self.chat_container.mount_all(chat_boxes)
         self.chat_container.scroll_end(animate=False)
         self.update_header()
+        self.update_token_meter()
 
     async def prepare_for_new_chat(self) -> None:
         await self.clear_chat_view()
         self.update_header()
         self.chat_options.display = True
+        self.update_token_meter()
 
     async def clear_chat_view(self) -> None:
         assert self.chat_container is not None
@@ -268,28 +323,31 @@ class Chat(Widget):
         assert self.chat_id is not None
         assert message is not None
 
+        conversation = self.current_conversation
         user_message_chatbox = Chatbox(
-            message=message, model_name=self.current_conversation.model.name
+            message=message, model_name=conversation.model.name
         )
+        # Reserved right away, a message sent before the worker below starts
+        # streaming is queued instead of starting another worker
+        queued = not conversation.reserve_progress()
+        if queued:
+            conversation.enqueue(message)
+            user_message_chatbox.status = PENDING_STATUS
 
         assert self.chat_container is not None
         await self.mount_chat_boxes([user_message_chatbox])
         # await self.chat_container.mount(user_message_chatbox)
         self.scroll_to_latest_message()
+        if queued:
+            return
 
         self.responding_indicator.display = True
-        self.allow_input_submit = False
-
-        def stream_in_background():
-            self.run_worker(
-                self._stream_llm_response(
-                    conversation=self.current_conversation, message=message
-                ),
-                group="llm_stream",
-                exclusive=False,
-            )
-
-        self.app.call_after_refresh(stream_in_background)
+        self.run_worker(
+            self._stream_llm_response(conversation=conversation, message=message),
+            name=self.chat_id,
+            group="llm_stream",
+            exclusive=False,
+        )
 
     async def _stream_llm_response(
         self, *, conversation: Conversation, message: BaseMessage
@@ -308,32 +366,76 @@ class Chat(Widget):
             )
             return response_chatbox
 
-        async for resp in conversation.progress(message):
-            response = resp
-            if response_chatbox is None:
-                chunk = response
-                if isinstance(response, StreamingMessage):
-                    chunk = response.message
-                response_chatbox = await create_response_chatbox()
-                await conversation.on_stream_chunk(chunk, 0)
-            if isinstance(response, BaseMessage):
-                """
-                This logic ensures that a conversation can also create more than one
-                full response messages. 
-                """
-                if "id" in response_chatbox.message.additional_kwargs:
-                    self.chatboxes_by_id[
-                        response_chatbox.message.additional_kwargs["id"]
-                    ] = response_chatbox
-                response_chatbox = None
-                conversation.on_stream_chunk = None
+        try:
+            async with aclosing(conversation.progress(message)) as stream:
+                async for resp in stream:
+                    response = resp
+                    if response_chatbox is None:
+                        self._update_pending_chatboxes(conversation)
+                        # Queued messages may be sent while the user looks at
+                        # another conversation, load_conversation binds the stream
+                        # when it is opened again
+                        if (
+                            self.chat_id == conversation.id
+                            and conversation.on_stream_chunk is None
+                        ):
+                            chunk = response
+                            if isinstance(response, StreamingMessage):
+                                chunk = response.message
+                            response_chatbox = await create_response_chatbox()
+                            await conversation.on_stream_chunk(chunk, 0)
+                    if isinstance(response, BaseMessage):
+                        """
+                        This logic ensures that a conversation can also create more
+                        than one full response messages.
+                        """
+                        if (
+                            response_chatbox is not None
+                            and "id" in response_chatbox.message.additional_kwargs
+                        ):
+                            self.chatboxes_by_id[
+                                response_chatbox.message.additional_kwargs["id"]
+                            ] = response_chatbox
+                        response_chatbox = None
+                        conversation.on_stream_chunk = None
+        except asyncio.CancelledError:
+            # The conversation kept the partial response, show it in place of the
+            # streaming one
+            response = conversation.last_message_of_types(AIMessage)
+            if conversation.on_stream_chunk and response is not None:
+                await conversation.on_stream_chunk(response, 0)
+            conversation.on_stream_chunk = None
+            self._response_finished(conversation, response)
+            raise
+
+        self._response_finished(conversation, response)
+
+    def _update_pending_chatboxes(self, conversation: Conversation) -> None:
+        """
+        Clears the pending status of queued messages that have been sent, and moves
+        them below the previous responses, where the next response follows them.
+        """
+        if self.chat_id != conversation.id:
+            return
+        pending = {m.additional_kwargs.get("id") for m in conversation.pending}
+        for message_id, chatbox in self.chatboxes_by_id.items():
+            if chatbox.status == PENDING_STATUS and message_id not in pending:
+                chatbox.status = None
+                last = self.chat_container.children[-1]
+                if chatbox.parent is not last:
+                    self.chat_container.move_child(chatbox.parent, after=last)
+                chatbox.refresh(layout=True)
 
+    def _response_finished(
+        self, conversation: Conversation, response: BaseMessage | None
+    ) -> None:
         self.responding_indicator = self.query_one(IsTyping)
         self.responding_indicator.display = False
         self.allow_input_submit = True
         self.post_message(
             self.AIResponseReceived(chat_id=conversation.id, message=response)
         )
+        self.update_token_meter()
         self.input_area.focus()
 
     def _bind_stream_to_chatbox(
@@ -351,15 +453,18 @@ class Chat(Widget):
 
         async def func(chunk, chunk_no, chatbox=chatbox):
             if isinstance(chunk, StreamingMessage):
-                chatbox.message = chunk.message
                 if chunk_no == 0:
                     self.post_message(self.MessageSubmitted(self.chat_id))
-                if chunk_no % config.refresh_no_stream_chunks == 0:
+                # The streamed message is only built when the chatbox is refreshed
+                scroll = chunk_no % config.refresh_no_stream_chunks == 0
+                if chunk.status != chatbox.status:
+                    chatbox.status = chunk.status
                     scroll = True
-                else:
-                    scroll = False
+                if scroll and chunk.message is not None:
+                    chatbox.message = chunk.message
             elif isinstance(chunk, BaseMessage):
                 chatbox.message = chunk
+                chatbox.status = None
                 scroll = True
 
             if scroll:
@@ -381,6 +486,50 @@ class Chat(Widget):
             await self.chat(app_context.chat_message)
             self.input_area.focus()
 
+    def action_cancel_stream(self) -> None:
+        """
+        Cancels the response streaming into the current conversation and discards
+        the queued messages. The part of the response streamed so far is kept and
+        saved, marked as truncated.
+        """
+        conversation = self.current_conversation
+        if conversation is None or not conversation.is_progressing:
+            return
+        # The queued messages are discarded, too
+        for message in conversation.pending:
+            message_id = message.additional_kwargs.get("id")
+            chatbox = self.chatboxes_by_id.pop(message_id, None)
+            if chatbox is not None:
+                chatbox.parent.remove()
+        for worker in self.workers:
+            if (
+                worker.node is self
+                and worker.group == "llm_stream"
+                and worker.name == conversation.id
+                and worker.is_running
+            ):
+                worker.cancel()
+
+    def action_fan_out(self) -> None:
+        """Sends the prompt in the input to several models, see FanOutScreen"""
+        conversation = self.current_conversation
+        model = (
+            conversation.model if conversation else self.app.app_context.current_model
+        )
+
+        def on_close(chat_ids: list[str]):
+            if chat_ids:
+                self.post_message(self.FanOutSaved(chat_ids))
+
+        self.app.push_screen(
+            FanOutScreen(
+                prompt=self.input_area.text,
+                selected=[model] if model else [],
+                system_message=self.app.app_context.system_message,
+            ),
+            on_close,
+        )
+
     @on(Button.Pressed, selector="#btn-submit")
     def on_submit(self, event: Button.Pressed):
         event.stop()
@@ -5,8 +5,9 @@ from langchain.schema import BaseMessage, AIMessage
 
 import pyperclip
 
-from rich.console import RenderableType
+from rich.console import Group, RenderableType
 from rich.markdown import Markdown
+from rich.text import Text
 from textual.binding import Binding
 from textual.geometry import Size
 from textual.widget import Widget
@@ -59,6 +60,8 @@ class Chatbox(Widget, can_focus=True):
             disabled=disabled,
         )
         self._message = message or new_message_of_type(AIMessage)
+        # Progress line shown above a streaming response, e.g. the function call round
+        self.status: str | None = None
 
         self.model_name = model_name
         timestamp = format_timestamp(
@@ -104,12 +107,16 @@ class Chatbox(Widget, can_focus=True):
         return Markdown(self.message.content or "")
 
     def render(self) -> RenderableType:
+        if self.status:
+            return Group(Text(self.status, style="italic dim"), self.markdown)
+        if self.is_ai_message and self.message.additional_kwargs.get("truncated"):
+            return Group(self.markdown, Text("Response cancelled", style="italic dim"))
         return self.markdown
 
     def get_content_width(self, container: Size, viewport: Size) -> int:
         # Naive approach. Can sometimes look strange, but works well enough.
         content = self.message.content or ""
-        return min(len(content), container.width)
+        return min(max(len(content), len(self.status or "")), container.width)
 
     @property
     def message(self):
@@ -1,37 +1,37 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from itertools import cycle
-
-import tiktoken
-from rich.console import RenderableType, Console, ConsoleOptions, RenderResult
+from rich.cells import cell_len, get_character_cell_size
+from rich.segment import Segment
 from rich.style import Style
-from rich.text import Text
+from textual.geometry import Size
+from textual.message import Message
+from textual.strip import Strip
 from textual.widget import Widget
-from tiktoken import Encoding
 
+from gptextual.runtime.tokenizer import get_encoder
 
-@dataclass
-class TokenAnalysisRenderable:
-    tokens: list[int]
-    encoder: Encoding
+TOKEN_STYLES = (Style.parse("red"), Style.parse("green"), Style.parse("blue"))
 
-    def __post_init__(self):
-        self.parts = (
-            self.encoder.decode_tokens_bytes(self.tokens) if self.encoder else []
-        )
 
-    def __rich_console__(
-        self, console: Console, options: ConsoleOptions
-    ) -> RenderResult:
-        colours = cycle([Style.parse("red"), Style.parse("green"), Style.parse("blue")])
-        parts = [Text(part.decode("utf-8"), next(colours)) for part in self.parts]
-        text = Text("").join(parts)
-        lines = text.wrap(console, width=options.max_width)
-        yield lines
+class TokenAnalysis(Widget):
+    """
+    Shows the tokens of a text in alternating colours.
 
+    Tokenization runs in a worker thread, so opening the widget on very long
+    messages does not block the UI. The token view is laid out once per width
+    and only the lines inside the visible region are rendered.
+    """
+
+    class Tokenized(Message):
+        def __init__(self, token_analysis: TokenAnalysis, token_count: int) -> None:
+            super().__init__()
+            self.token_analysis = token_analysis
+            self.token_count = token_count
+
+        @property
+        def control(self):
+            return self.token_analysis
 
-class TokenAnalysis(Widget):
     def __init__(
         self,
         *,
@@ -48,14 +48,103 @@ class TokenAnalysis(Widget):
             classes=classes,
             disabled=disabled,
         )
+        self.text = text
+        self.model_name = model_name
+        # None while the tokenizer worker is still running
+        self.tokens: list[int] | None = None
+        self._parts: list[str] = []
+        self._lines: list[list[tuple[str, int]]] = []
+        self._layout_width: int | None = None
+
+    def on_mount(self) -> None:
+        self.run_worker(self._tokenize, thread=True, exclusive=True)
+
+    def _tokenize(self) -> None:
+        tokens, parts = [], []
         try:
-            encoder = tiktoken.encoding_for_model(model_name)
-            tokens = encoder.encode(text)
-            self.tokens = tokens
-            self.encoder = encoder
+            encoder = get_encoder(self.model_name)
+            if encoder:
+                tokens = encoder.encode(self.text, disallowed_special=())
+                parts = [
+                    part.decode("utf-8", errors="replace")
+                    .replace("\t", "    ")
+                    .replace("\r", "")
+                    for part in encoder.decode_tokens_bytes(tokens)
+                ]
         except Exception:
-            self.tokens = []
-            self.encoder = None
+            tokens, parts = [], []
+        self.app.call_from_thread(self._set_tokens, tokens, parts)
+
+    def _set_tokens(self, tokens: list[int], parts: list[str]) -> None:
+        self.tokens = tokens
+        self._parts = parts
+        self._layout_width = None
+        self.refresh(layout=True)
+        self.post_message(self.Tokenized(self, len(tokens)))
+
+    def _layout(self, width: int) -> None:
+        """Wraps the decoded tokens into lines of (text, style index) fragments."""
+        if width == self._layout_width:
+            return
+
+        width = max(width, 1)
+        lines = []
+        line = []
+        x = 0
+        for index, part in enumerate(self._parts):
+            style = index % len(TOKEN_STYLES)
+            for n, fragment in enumerate(part.split("\n")):
+                if n:
+                    lines.append(line)
+                    line, x = [], 0
+                if not fragment:
+                    continue
+                length = cell_len(fragment)
+                if x + length <= width:
+                    line.append((fragment, style))
+                    x += length
+                    continue
+                # Fragment does not fit, break it up character by character
+                chars = []
+                for char in fragment:
+                    char_width = get_character_cell_size(char)
+                    if x + char_width > width:
+                        if chars:
+                            line.append(("".join(chars), style))
+                        lines.append(line)
+                        line, chars, x = [], [], 0
+                    chars.append(char)
+                    x += char_width
+                if chars:
+                    line.append(("".join(chars), style))
+        if line:
+            lines.append(line)
+
+        self._lines = lines
+        self._layout_width = width
+
+    def get_content_height(self, container: Size, viewport: Size, width: int) -> int:
+        if self.tokens is None:
+            return 1
+        self._layout(width)
+        return max(len(self._lines), 1)
+
+    def render_line(self, y: int) -> Strip:
+        rich_style = self.rich_style
+        width = self.size.width
+        if self.tokens is None:
+            if y == 0:
+                return Strip([Segment("Tokenizing...", rich_style)]).extend_cell_length(
+                    width, rich_style
+                )
+            return Strip.blank(width, rich_style)
+
+        self._layout(width)
+        if y >= len(self._lines):
+            return Strip.blank(width, rich_style)
 
-    def render(self) -> RenderableType:
-        return TokenAnalysisRenderable(self.tokens, self.encoder)
+        segments = [
+            Segment(text, rich_style + TOKEN_STYLES[style])
+            for text, style in self._lines[y]
+        ]
+        return Strip(segments).extend_cell_length(width, rich_style)
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+from rich.text import Text
+from textual.timer import Timer
+from textual.widgets import Static
+
+from gptextual.runtime import ChatModel, Conversation
+from gptextual.runtime.tokenizer import IncrementalTokenCounter
+
+
+class TokenMeter(Static):
+    """
+    Shows how many tokens of the request budget of the model the chat input and
+    the conversation history use.
+
+    Counting is debounced and runs in a worker thread, so typing is never blocked,
+    even for very large pastes.
+    """
+
+    DEFAULT_CSS = """
+    TokenMeter {
+      width: 1fr;
+      height: 1;
+      text-align: right;
+      padding-right: 2;
+    }
+    """
+
+    DEBOUNCE_SECONDS = 0.3
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__("", *args, **kwargs)
+        self._timer: Timer | None = None
+        self._counter: IncrementalTokenCounter | None = None
+        self._counter_model: str | None = None
+        # (conversation id, number of messages) -> history token count
+        self._history_key = None
+        self._history_tokens = 0
+        # Results of outdated counts are discarded
+        self._generation = 0
+
+    def update_count(
+        self, *, text: str, model: ChatModel | None, conversation: Conversation | None
+    ) -> None:
+        if self._timer is not None:
+            self._timer.stop()
+        self._generation += 1
+        generation = self._generation
+
+        def start_worker():
+            # The worker counts with a snapshot of the cached counts, which are only
+            # updated on the UI thread (see _show), so a worker of an outdated count
+            # cannot mix up the counts of two conversations
+            counter = self._counter
+            if model is None or self._counter_model != model.name:
+                counter = None
+            history = (self._history_key, self._history_tokens)
+            self.run_worker(
+                lambda: self._count(
+                    generation, text, model, conversation, counter, *history
+                ),
+                thread=True,
+                group="token-meter",
+                exclusive=True,
+            )
+
+        self._timer = self.set_timer(self.DEBOUNCE_SECONDS, start_worker)
+
+    def _count(
+        self,
+        generation: int,
+        text: str,
+        model: ChatModel | None,
+        conversation: Conversation | None,
+        counter: IncrementalTokenCounter | None,
+        history_key,
+        history_tokens: int,
+    ) -> None:
+        if model is None:
+            return
+        try:
+            counter = counter or IncrementalTokenCounter(model.name)
+            input_tokens = counter.count(text)
+
+            key = conversation and (conversation.id, len(conversation))
+            if key != history_key:
+                history_tokens = (
+                    conversation.context_token_count() if conversation else 0
+                )
+        except Exception:
+            return
+
+        budget = (
+            conversation.request_budget if conversation else model.request_budget
+        ) - model.default_max_tokens
+        self.app.call_from_thread(
+            self._show,
+            generation,
+            model.name,
+            counter,
+            key,
+            input_tokens,
+            history_tokens,
+            budget,
+        )
+
+    def _show(
+        self,
+        generation: int,
+        model_name: str,
+        counter: IncrementalTokenCounter,
+        history_key,
+        input_tokens: int,
+        history_tokens: int,
+        budget: int,
+    ) -> None:
+        if generation != self._generation:
+            return
+        self._counter, self._counter_model = counter, model_name
+        self._history_key, self._history_tokens = history_key, history_tokens
+        remaining = budget - input_tokens - history_tokens
+        self.update(
+            Text.assemble(
+                f"{input_tokens:,} + {history_tokens:,} history / {budget:,} tokens, ",
+                (f"{remaining:,} left", "bold red" if remaining < 0 else "bold"),
+            )
+        )
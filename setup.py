@@ -41,7 +41,6 @@ setup(
         "tiktoken~=0.5.2",
         "toolong==1.2.0",
         "pyyaml~=6.0.1",
-        "setuptools~=69.1.0",
     ],
     extras_require={
         "openai": ["langchain-openai~=0.0.8"],
@@ -0,0 +1,43 @@
+import logging
+
+import pytest
+
+import gptextual.logging
+
+import gptextual.config.app_config as app_config
+from gptextual.config.app_config import APIConfig, AppConfig, MockConfig, RuntimeConfig
+from gptextual.runtime import scheduler
+from gptextual.runtime.models import ModelRegistry
+
+
+@pytest.fixture(autouse=True)
+def test_logger(monkeypatch):
+    """Logs to the logging of pytest instead of the log file of the app"""
+    monkeypatch.setattr(gptextual.logging, "_logger", logging.getLogger("gptextual"))
+
+
+@pytest.fixture
+def mock_config(monkeypatch):
+    """
+    Uses the mock provider, streaming without delays, instead of the config.yml of
+    the user. Returns a function to replace the config with other settings of the
+    mock provider, functions and runtime.
+    """
+
+    def configure(*, functions=None, runtime=None, **mock_settings) -> AppConfig:
+        config = AppConfig(
+            functions=functions or {},
+            runtime=RuntimeConfig(**(runtime or {})),
+            api_config=APIConfig(
+                mock=MockConfig(
+                    **{"ttft": 0, "tokens_per_second": 0, "seed": 0, **mock_settings}
+                )
+            ),
+        )
+        monkeypatch.setattr(app_config, "_instance", config)
+        monkeypatch.setattr(ModelRegistry, "_instance", None)
+        return config
+
+    monkeypatch.setattr(scheduler, "_SCHEDULERS", {})
+    configure()
+    return configure
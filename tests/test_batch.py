@@ -0,0 +1,116 @@
+import asyncio
+import io
+import json
+
+import pytest
+
+from gptextual.runtime.batch import (
+    BatchPrompt,
+    BatchRunner,
+    parse_args,
+    read_prompts,
+    resolve_model,
+    run_batch,
+    summarize,
+)
+
+
+def run_prompts(prompts: list[BatchPrompt]) -> tuple[list[dict], list[dict]]:
+    output = io.StringIO()
+    runner = BatchRunner(output, model=resolve_model("mock-model@mock"))
+    results = asyncio.run(runner.run(prompts))
+    written = [json.loads(line) for line in output.getvalue().splitlines()]
+    return results, written
+
+
+def test_unknown_model_fails_only_its_row(mock_config):
+    mock_config(response="Hello from the mock")
+    results, written = run_prompts(
+        [
+            BatchPrompt(index=0, prompt="Hi"),
+            BatchPrompt(index=1, prompt="Hi", model="unknown-model@mock"),
+        ]
+    )
+    assert written == results
+    rows = {row["index"]: row for row in results}
+    assert rows[0]["response"] == "Hello from the mock"
+    assert rows[0]["error"] is None
+    assert rows[0]["model"] == "mock-model@mock"
+    assert rows[1]["response"] is None
+    assert "unknown-model@mock is not configured" in rows[1]["error"]
+    assert rows[1]["model"] == "unknown-model@mock"
+
+    summary = summarize(results, 1.0)
+    assert (summary["succeeded"], summary["failed"]) == (1, 1)
+
+
+def test_api_errors_are_error_rows(mock_config):
+    mock_config(error_rate=1.0, error_status=500)
+    results, _ = run_prompts([BatchPrompt(index=0, prompt="Hi", id="a")])
+    assert len(results) == 1
+    assert results[0]["id"] == "a"
+    assert "Injected error" in results[0]["error"]
+    assert summarize(results, 1.0)["failed"] == 1
+
+
+def test_read_prompts(tmp_path):
+    jsonl = tmp_path / "prompts.jsonl"
+    jsonl.write_text(
+        '"Hi"\n\n{"prompt": "Hello", "id": "b", "model": "mock-model@mock"}\n'
+    )
+    assert list(read_prompts(jsonl)) == [
+        BatchPrompt(index=0, prompt="Hi"),
+        BatchPrompt(index=1, prompt="Hello", id="b", model="mock-model@mock"),
+    ]
+
+    csv = tmp_path / "prompts.csv"
+    csv.write_text("id,prompt,system_message\na,Hi,Be brief\nb,Hello,\n")
+    assert list(read_prompts(csv)) == [
+        BatchPrompt(index=0, prompt="Hi", id="a", system_message="Be brief"),
+        BatchPrompt(index=1, prompt="Hello", id="b"),
+    ]
+
+
+def test_prompt_without_prompt_field(tmp_path):
+    jsonl = tmp_path / "prompts.jsonl"
+    jsonl.write_text('{"id": "a"}\n')
+    with pytest.raises(ValueError):
+        list(read_prompts(jsonl))
+
+
+def test_concurrency_per_api_provider(mock_config):
+    mock_config(response="Hello", ttft=0.1)
+    runner = BatchRunner(
+        io.StringIO(),
+        model=resolve_model("mock-model@mock"),
+        concurrency={"mock": 2},
+    )
+    prompts = [BatchPrompt(index=i, prompt="Hi") for i in range(4)]
+    results = asyncio.run(runner.run(prompts))
+    assert sorted(r["index"] for r in results) == [0, 1, 2, 3]
+    # Two rounds of two prompts
+    assert 0.2 <= runner.elapsed_seconds < 0.35
+
+
+def test_summary(mock_config):
+    mock_config(response="one two three")
+    results, _ = run_prompts([BatchPrompt(index=i, prompt="Hi") for i in range(3)])
+    summary = summarize(results, 0.5)
+    assert summary["prompts"] == summary["succeeded"] == 3
+    assert summary["prompts_per_second"] == 6
+    assert summary["output_tokens"] > 0
+    assert summary["input_tokens"] > 0
+    assert summary["latency_p50_seconds"] is not None
+    assert summary["ttft_p99_seconds"] is not None
+
+
+def test_run_batch(mock_config, tmp_path, capsys):
+    mock_config(response="Hello from the mock")
+    prompts = tmp_path / "prompts.jsonl"
+    prompts.write_text('"Hi"\n"Hello"\n')
+    output = tmp_path / "results.jsonl"
+    args = parse_args([str(prompts), "-o", str(output), "-m", "mock-model@mock"])
+    assert asyncio.run(run_batch(args)) == 0
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(row["prompt"] for row in rows) == ["Hello", "Hi"]
+    assert "2 prompts, 2 succeeded, 0 failed" in capsys.readouterr().err
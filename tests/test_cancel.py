@@ -0,0 +1,109 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from gptextual.runtime.conversation import Conversation, StreamingMessage
+from gptextual.runtime.function_calling import register_for_function_calling
+from gptextual.runtime.langchain.mock import MockChatModel
+from gptextual.runtime.models import ChatModel
+
+
+@register_for_function_calling
+async def cancel_slow_lookup(key: str) -> str:
+    """
+    Looks up a key, slowly.
+
+    Args:
+        key: the key to look up
+    """
+    await asyncio.sleep(5)
+    return f"value of {key}"
+
+
+class ClosingMockModel(MockChatModel):
+    """Records whether its streams were closed before they ended"""
+
+    closed: list = []
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        complete = False
+        try:
+            async for chunk in super()._astream(messages, stop, run_manager, **kwargs):
+                yield chunk
+            complete = True
+        finally:
+            self.closed.append(not complete)
+
+
+def conversation(**llm_settings) -> tuple[Conversation, ClosingMockModel]:
+    llm = ClosingMockModel(
+        **{"ttft": 0, "tokens_per_second": 20, "closed": [], **llm_settings}
+    )
+    model = ChatModel(name="cancel-model", api_provider="openai", _model=llm)
+    return Conversation.create_new(model=model, in_memory=True), llm
+
+
+def progress_and_cancel(conv: Conversation, after: float):
+    """Cancels the progress of the conversation after some seconds"""
+
+    async def consume():
+        async for _ in conv.progress(HumanMessage(content="Hi"), autosave=False):
+            pass
+
+    async def run():
+        task = asyncio.create_task(consume())
+        await asyncio.sleep(after)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+
+
+def test_cancel_keeps_partial_response(mock_config):
+    conv, llm = conversation(response="word " * 40)
+    progress_and_cancel(conv, 0.3)
+    response = conv.messages[-1]
+    assert isinstance(response, AIMessage)
+    assert response.additional_kwargs["truncated"]
+    assert 0 < len(response.content) < len("word " * 40)
+    assert not any(isinstance(m, StreamingMessage) for m in conv.messages)
+    assert not conv.is_progressing
+    # The stream of the model was closed right away
+    assert llm.closed == [True]
+
+
+def test_cancel_before_first_token(mock_config):
+    conv, _ = conversation(ttft=5, response="Answer")
+    progress_and_cancel(conv, 0.1)
+    assert isinstance(conv.messages[-1], HumanMessage)
+    assert not any(isinstance(m, StreamingMessage) for m in conv.messages)
+
+
+def test_cancel_while_functions_run(mock_config):
+    mock_config(functions={"cancel_slow_lookup": {}})
+    conv, _ = conversation(
+        tool_calls=[{"name": "cancel_slow_lookup", "arguments": {"key": "a"}}],
+        response="Answer",
+    )
+    progress_and_cancel(conv, 0.3)
+    response = conv.messages[-1]
+    # Calls without results would make the next request invalid
+    assert isinstance(response, AIMessage)
+    assert response.additional_kwargs["truncated"]
+    assert "tool_calls" not in response.additional_kwargs
+
+
+def test_conversation_continues_after_cancel(mock_config):
+    conv, _ = conversation(response="Answer", tokens_per_second=0, ttft=5)
+    progress_and_cancel(conv, 0.1)
+    conv.model.llm_model.ttft = 0
+
+    async def run():
+        async for _ in conv.progress(HumanMessage(content="Again"), autosave=False):
+            pass
+
+    asyncio.run(run())
+    assert conv.messages[-1].content == "Answer"
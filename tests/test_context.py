@@ -0,0 +1,132 @@
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from gptextual.runtime.context import (
+    CapMessageTokens,
+    MiddleOut,
+    TruncateStaleToolResults,
+    create_context_strategies,
+)
+from gptextual.runtime.conversation import Conversation
+from gptextual.runtime.models import ChatModel
+
+
+def conversation(context_window=4000, **model_settings) -> Conversation:
+    model = ChatModel(
+        name="mock-model",
+        api_provider="mock",
+        context_window=context_window,
+        **model_settings,
+    )
+    return Conversation.create_new(model=model, in_memory=True)
+
+
+def tool_call(call_id: str) -> AIMessage:
+    return AIMessage(
+        content="Let me look that up",
+        additional_kwargs={
+            "tool_calls": [
+                {
+                    "id": call_id,
+                    "type": "function",
+                    "function": {"name": "lookup", "arguments": "{}"},
+                }
+            ]
+        },
+    )
+
+
+def test_create_context_strategies():
+    strategies = create_context_strategies(
+        {"cap_message_tokens": {"max_tokens": 50}, "middle_out": None}
+    )
+    assert strategies == [CapMessageTokens(max_tokens=50), MiddleOut()]
+    assert create_context_strategies(None) == []
+    with pytest.raises(ValueError, match="Unknown context strategy"):
+        create_context_strategies({"no_such_strategy": {}})
+
+
+def test_request_budget():
+    assert ChatModel("m", "mock", context_window=1000).request_budget == 1000
+    model = ChatModel("m", "mock", context_window=1000, request_token_budget=300)
+    assert model.request_budget == 300
+    model = ChatModel("m", "mock", context_window=1000, request_token_budget=3000)
+    assert model.request_budget == 1000
+
+
+def test_cap_message_tokens(mock_config):
+    conv = conversation()
+    long, short = HumanMessage(content="word " * 200), AIMessage(content="short")
+    messages = [SystemMessage(content="system " * 200), long, short]
+    reduced = CapMessageTokens(max_tokens=50).reduce(
+        messages, budget=4000, conversation=conv
+    )
+    assert reduced[0] is messages[0]
+    assert "tokens omitted" in reduced[1].content
+    assert conv._get_message_length(reduced[1]) <= 60
+    assert reduced[2] is short
+    # The messages of the conversation are not changed
+    assert long.content == "word " * 200
+
+
+def test_truncate_stale_tool_results(mock_config):
+    conv = conversation()
+    messages = [
+        HumanMessage(content="Look it up"),
+        tool_call("1"),
+        ToolMessage(content="old result " * 100, tool_call_id="1"),
+        tool_call("2"),
+        ToolMessage(content="new result " * 100, tool_call_id="2"),
+    ]
+    reduced = TruncateStaleToolResults(keep_last=1, max_tokens=20).reduce(
+        messages, budget=4000, conversation=conv
+    )
+    assert "tokens omitted" in reduced[2].content
+    assert reduced[2].tool_call_id == "1"
+    assert reduced[4] is messages[4]
+    assert reduced[:2] == messages[:2]
+
+
+def test_middle_out(mock_config):
+    conv = conversation()
+    messages = [
+        SystemMessage(content="system"),
+        HumanMessage(content="the task " * 20),
+        tool_call("1"),
+        ToolMessage(content="result " * 100, tool_call_id="1"),
+        AIMessage(content="answer " * 100),
+        HumanMessage(content="the question"),
+    ]
+    lengths = [conv._get_message_length(m) for m in messages]
+    budget = sum(lengths) - lengths[2]
+    reduced = MiddleOut(keep_first=1).reduce(
+        messages, budget=budget, conversation=conv
+    )
+    # Dropping the call is enough, but its result is dropped with it
+    assert reduced == [messages[0], messages[1], messages[4], messages[5]]
+
+    unchanged = MiddleOut().reduce(messages, budget=sum(lengths), conversation=conv)
+    assert unchanged is messages
+
+
+def test_conversation_applies_strategies_of_model(mock_config):
+    conv = conversation(context_strategies=[CapMessageTokens(max_tokens=20)])
+    conv.append(HumanMessage(content="word " * 200))
+    context = conv._messages_for_context_size(conv.messages)
+    assert "tokens omitted" in context[-1].content
+    assert "tokens omitted" not in conv.messages[-1].content
+
+    # Strategies of the conversation replace those of the model
+    conv.context_strategies = []
+    context = conv._messages_for_context_size(conv.messages)
+    assert context[-1].content == "word " * 200
+
+
+def test_conversation_fits_request_budget(mock_config):
+    conv = conversation(context_window=4000, request_token_budget=200)
+    for i in range(20):
+        conv.append(HumanMessage(content=f"question {i} " * 10))
+        conv.append(AIMessage(content=f"answer {i} " * 10))
+    context = conv._messages_for_context_size(conv.messages)
+    assert sum(conv._get_message_length(m) for m in context) <= 200
+    assert context[-1] == conv.messages[-1]
@@ -0,0 +1,109 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from gptextual.runtime.conversation import Conversation
+from gptextual.runtime.function_calling import register_for_function_calling
+from gptextual.runtime.langchain.mock import MockAPIError, MockChatModel
+from gptextual.runtime.models import ChatModel
+
+LIMIT = 1000
+
+
+@register_for_function_calling
+async def overflow_lookup(key: str) -> str:
+    """
+    Looks up a key.
+
+    Args:
+        key: the key to look up
+    """
+    return f"value of {key} " * 120
+
+
+class StrictMockModel(MockChatModel):
+    """
+    Rejects requests over the limit like the OpenAI API, and counts 50% more tokens
+    than gptextual, so the conversation underestimates its requests
+    """
+
+    requested: list = []
+
+    def _plan_response(self, messages, kwargs) -> list:
+        requested = int(self.get_num_tokens_from_messages(messages) * 1.5)
+        self.requested.append(requested)
+        if requested > LIMIT:
+            error = MockAPIError(
+                400,
+                f"This model's maximum context length is {LIMIT} tokens. However, "
+                f"your messages resulted in {requested} tokens.",
+            )
+            return [(error, 0)]
+        return super()._plan_response(messages, kwargs)
+
+
+def conversation(**llm_settings) -> tuple[Conversation, StrictMockModel]:
+    llm = StrictMockModel(
+        ttft=0, tokens_per_second=0, response="Answer", requested=[], **llm_settings
+    )
+    model = ChatModel(
+        name="strict-model", api_provider="openai", context_window=LIMIT, _model=llm
+    )
+    conv = Conversation.create_new(model=model, in_memory=True)
+    for i in range(12):
+        conv.append(HumanMessage(content=f"question {i} " * 10))
+        conv.append(AIMessage(content=f"answer {i} " * 10))
+    return conv, llm
+
+
+def progress(conv: Conversation, content: str):
+    async def run():
+        async for _ in conv.progress(HumanMessage(content=content), autosave=False):
+            pass
+
+    asyncio.run(run())
+    return conv.messages[-1]
+
+
+def test_retries_with_smaller_budget(mock_config):
+    conv, llm = conversation()
+    response = progress(conv, "Hello")
+    assert response.content == "Answer"
+    assert response.additional_kwargs["context_overflow_retries"] == 1
+    assert llm.requested[0] > LIMIT >= llm.requested[1]
+    assert conv.request_budget < conv.model.request_budget
+
+
+def test_smaller_budget_is_kept_for_later_turns(mock_config):
+    conv, llm = conversation()
+    progress(conv, "Hello")
+    rejected = len(llm.requested)
+
+    # The conversation grows past the budget of the model again
+    for i in range(6):
+        response = progress(conv, f"more {i} " * 30)
+        assert "context_overflow_retries" not in response.additional_kwargs
+    assert len(llm.requested) == rejected + 6
+    assert all(requested <= LIMIT for requested in llm.requested[rejected:])
+
+
+def test_smaller_budget_is_kept_for_function_call_rounds(mock_config):
+    mock_config(functions={"overflow_lookup": {}})
+    conv, llm = conversation(
+        tool_calls=[{"name": "overflow_lookup", "arguments": {"key": "a"}}]
+    )
+    response = progress(conv, "Look it up")
+    assert response.content == "Answer"
+    assert len(response.additional_kwargs["function_call_rounds"]) == 1
+    # Only the first request of the turn is rejected
+    assert llm.requested[0] > LIMIT
+    assert all(requested <= LIMIT for requested in llm.requested[1:])
+
+
+def test_gives_up_after_retries(mock_config):
+    mock_config(runtime={"context_overflow_retries": 0})
+    conv, llm = conversation()
+    response = progress(conv, "Hello")
+    assert response.additional_kwargs["error"]
+    assert "maximum context length" in response.content
+    assert len(llm.requested) == 1
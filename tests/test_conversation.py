@@ -0,0 +1,86 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from gptextual.runtime.conversation import Conversation
+from gptextual.runtime.models import ChatModel
+
+MESSAGE_TOKENS = 10
+
+
+def conversation(monkeypatch, messages: int) -> Conversation:
+    """
+    A conversation with a context window of 10 messages, the system message
+    included, and the given number of user and assistant messages
+    """
+    model = ChatModel(
+        name="mock-model",
+        api_provider="mock",
+        context_window=10 * MESSAGE_TOKENS,
+        context_trim_ratio=0.6,
+    )
+    conv = Conversation.create_new(model=model, in_memory=True)
+    monkeypatch.setattr(conv, "_get_message_length", lambda message: MESSAGE_TOKENS)
+    add_messages(conv, messages)
+    return conv
+
+
+def add_messages(conv: Conversation, messages: int):
+    for i in range(messages):
+        message_class = HumanMessage if i % 2 == 0 else AIMessage
+        conv.append(message_class(content=f"message {len(conv.messages)}"))
+
+
+def window(conv: Conversation, **kwargs) -> list[str]:
+    return [m.content for m in conv._messages_for_context_size(conv.messages, **kwargs)]
+
+
+def test_window_keeps_all_messages_that_fit(monkeypatch, mock_config):
+    conv = conversation(monkeypatch, 9)
+    assert window(conv) == [m.content for m in conv.messages]
+
+
+def test_window_moves_in_one_block_and_then_stays(monkeypatch, mock_config):
+    conv = conversation(monkeypatch, 10)
+    # 90 tokens are available after the system message, the window is moved to
+    # the newest messages within 60% of them
+    trimmed = window(conv)
+    assert trimmed[0] == conv.messages[0].content
+    assert trimmed[1:] == [f"message {i}" for i in range(6, 11)]
+
+    # The start of the window is kept while the messages fit
+    for _ in range(4):
+        add_messages(conv, 1)
+        assert window(conv)[1] == "message 6"
+
+    # The window moves again once they do not
+    add_messages(conv, 1)
+    assert window(conv)[1] == "message 11"
+
+
+
+def test_window_does_not_start_with_function_results(monkeypatch, mock_config):
+    conv = conversation(monkeypatch, 4)
+    conv.append(
+        AIMessage(
+            content="",
+            additional_kwargs={
+                "tool_calls": [
+                    {"id": "1", "type": "function", "function": {"name": "f"}}
+                ]
+            },
+        )
+    )
+    conv.append(ToolMessage(content="result", tool_call_id="1"))
+    add_messages(conv, 4)
+    # The trimmed window would start with the function result of the dropped call
+    assert conv.messages[6].content == "result"
+    assert window(conv)[1] == "message 7"
+
+
+def test_counting_does_not_move_the_window(monkeypatch, mock_config):
+    conv = conversation(monkeypatch, 10)
+    window(conv)
+    start_id = conv._context_start_id
+    add_messages(conv, 5)
+    assert window(conv, update_start=False)[1] == "message 11"
+    assert conv.context_token_count() == 6 * MESSAGE_TOKENS
+    assert conv._context_start_id == start_id
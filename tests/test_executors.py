@@ -0,0 +1,92 @@
+import asyncio
+import os
+import threading
+import time
+
+import pytest
+
+from gptextual.runtime.function_calling import (
+    executors,
+    function_call_support,
+    register_for_function_calling,
+)
+
+from .test_function_calls import execute, tool_calls
+
+
+@register_for_function_calling
+def where_am_i() -> str:
+    """
+    Tells where the function is called.
+    """
+    return f"{os.getpid()} {threading.get_ident()}"
+
+
+@register_for_function_calling
+def sleepy(seconds: float) -> str:
+    """
+    Sleeps.
+
+    Args:
+        seconds: how long to sleep
+    """
+    time.sleep(seconds)
+    return "awake"
+
+
+def registered_later(text: str) -> str:
+    """
+    Echoes the text.
+
+    Args:
+        text: the text to echo
+    """
+    return text
+
+
+@pytest.fixture(autouse=True)
+def process_pools():
+    yield
+    executors.shutdown_process_pools()
+
+
+@pytest.mark.parametrize(
+    "mode,same_process,same_thread",
+    [("inline", True, True), ("thread", True, False), ("process", False, False)],
+)
+def test_execution_modes(mock_config, mode, same_process, same_thread):
+    mock_config(functions={"where_am_i": {"execution_mode": mode}})
+    [result] = execute(tool_calls(("where_am_i", {})))
+    pid, thread = result.content.split()
+    assert (pid == str(os.getpid())) == same_process
+    assert (thread == str(threading.get_ident())) == same_thread
+
+
+def test_pool_startup_does_not_count_against_timeout(mock_config):
+    mock_config(functions={"sleepy": {"execution_mode": "process", "timeout": 0.5}})
+    # Spawning a worker takes longer than the timeout
+    [result] = execute(tool_calls(("sleepy", {"seconds": 0})))
+    assert result.content == "awake"
+
+
+def test_timeout_restarts_process_pool(mock_config):
+    mock_config(functions={"sleepy": {"execution_mode": "process", "timeout": 0.5}})
+    [result] = execute(tool_calls(("sleepy", {"seconds": 10})))
+    assert "did not return within 0.5 seconds" in result.content
+
+    # A replacement pool is started right away, and the function recovers
+    assert "sleepy" in executors._PROCESS_POOLS
+    [result] = execute(tool_calls(("sleepy", {"seconds": 0})))
+    assert result.content == "awake"
+
+
+def test_functions_registered_later_are_warmed_up(mock_config, monkeypatch):
+    mock_config(functions={"registered_later": {"execution_mode": "process"}})
+    monkeypatch.setattr(function_call_support, "_WARM_UP_PROCESS_POOLS", True)
+    register_for_function_calling(registered_later)
+    assert "registered_later" in executors._PROCESS_POOLS
+
+    async def ready():
+        await asyncio.wait_for(executors.process_pool_ready("registered_later"), 30)
+
+    asyncio.run(ready())
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import time
+
+from langchain_core.messages import HumanMessage
+
+from gptextual.config.app_config import ModelConfig
+from gptextual.runtime import conversation as conversation_module
+from gptextual.runtime.conv_manager import ConversationManager
+from gptextual.runtime.fan_out import (
+    create_fan_out_conversations,
+    save_linked_conversations,
+    stream_with_metrics,
+)
+from gptextual.runtime.models import ModelRegistry
+
+
+def fan_out_models(mock_config, **ttfts) -> list:
+    mock_config(
+        response="one two three four five",
+        tokens_per_second=100,
+        models={name: ModelConfig() for name in ttfts},
+    )
+    models = []
+    for name, ttft in ttfts.items():
+        model = ModelRegistry.model_from_name(name, "mock")
+        model.llm_model.ttft = ttft
+        models.append(model)
+    return models
+
+
+def send(conversations, prompt="Hi") -> list:
+    async def run():
+        message = HumanMessage(content=prompt)
+        return await asyncio.gather(
+            *(stream_with_metrics(c, message) for c in conversations)
+        )
+
+    return asyncio.run(run())
+
+
+def test_prompt_is_streamed_to_all_models_in_parallel(mock_config):
+    models = fan_out_models(mock_config, fast=0.05, slow=0.3)
+    conversations = create_fan_out_conversations(models, system_message="Be brief")
+    assert [c.model for c in conversations] == models
+    assert all(c.in_memory for c in conversations)
+
+    start = time.monotonic()
+    responses = send(conversations)
+    assert time.monotonic() - start < 0.6
+    assert [r.content for r in responses] == ["one two three four five"] * 2
+
+    fast, slow = (r.additional_kwargs["stream_metrics"] for r in responses)
+    assert 0.05 <= fast["ttft_seconds"] < 0.2
+    assert 0.3 <= slow["ttft_seconds"] < 0.5
+    assert slow["latency_seconds"] >= slow["ttft_seconds"]
+    assert fast["output_tokens"] > 0
+    assert fast["tokens_per_second"] > 0
+
+
+def test_prompt_is_not_shared_between_conversations(mock_config):
+    conversations = create_fan_out_conversations(
+        fan_out_models(mock_config, a=0, b=0)
+    )
+    send(conversations)
+    first, second = (c.last_message_of_types(HumanMessage) for c in conversations)
+    assert first.content == second.content == "Hi"
+    assert first is not second
+
+
+def test_linked_conversations_are_saved(mock_config, monkeypatch, tmp_path):
+    monkeypatch.setattr(conversation_module, "conversation_path", tmp_path)
+    monkeypatch.setattr(ConversationManager, "conversations", {})
+    conversations = create_fan_out_conversations(
+        fan_out_models(mock_config, a=0, b=0, c=0)
+    )
+    # The third model was not sent the prompt
+    send(conversations[:2])
+
+    ids = save_linked_conversations(conversations)
+    assert ids == [conversations[0].id, conversations[1].id]
+    assert list(ConversationManager.conversations) == ids
+    for id, other in ((ids[0], ids[1]), (ids[1], ids[0])):
+        with open(tmp_path / f"{id}.json") as f:
+            assert json.load(f)["linked_ids"] == [other]
+        assert (tmp_path / f"{id}.parquet").exists()
+    assert not conversations[0].in_memory
+    assert conversations[2].in_memory
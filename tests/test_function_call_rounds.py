@@ -0,0 +1,107 @@
+import asyncio
+
+from langchain_core.messages import HumanMessage
+
+from gptextual.runtime.conversation import Conversation
+from gptextual.runtime.function_calling import register_for_function_calling
+from gptextual.runtime.langchain.mock import MockChatModel
+from gptextual.runtime.models import ChatModel
+
+calls = []
+
+
+@register_for_function_calling
+async def round_lookup(key: str) -> str:
+    """
+    Looks up a key.
+
+    Args:
+        key: the key to look up
+    """
+    calls.append(key)
+    return f"value of {key}"
+
+
+class EagerMockModel(MockChatModel):
+    """Calls the functions in every round, and ignores tool_choice if stubborn"""
+
+    stubborn: bool = False
+    requests: list = []
+
+    def _requested_tool_calls(self, messages, kwargs) -> list:
+        self.requests.append(kwargs)
+        if self.stubborn:
+            kwargs = {**kwargs, "tool_choice": "auto"}
+        return super()._requested_tool_calls(messages[:-1], kwargs)
+
+
+def conversation(**llm_settings) -> tuple[Conversation, EagerMockModel]:
+    llm = EagerMockModel(
+        ttft=0,
+        tokens_per_second=0,
+        response="Answer",
+        tool_calls=[{"name": "round_lookup", "arguments": {"key": "a"}}],
+        requests=[],
+        **llm_settings,
+    )
+    model = ChatModel(name="eager-model", api_provider="openai", _model=llm)
+    return Conversation.create_new(model=model, in_memory=True), llm
+
+
+def progress(conv: Conversation) -> list[str]:
+    """Progresses the conversation, returns the statuses shown while streaming"""
+    statuses = []
+
+    async def on_stream_chunk(message, chunks):
+        status = getattr(message, "status", None)
+        if status and (not statuses or statuses[-1] != status):
+            statuses.append(status)
+
+    async def run():
+        async for _ in conv.progress(HumanMessage(content="Hi"), autosave=False):
+            pass
+
+    conv.on_stream_chunk = on_stream_chunk
+    calls.clear()
+    asyncio.run(run())
+    return statuses
+
+
+def test_rounds_are_limited(mock_config):
+    mock_config(
+        functions={"round_lookup": {}}, runtime={"max_function_call_rounds": 3}
+    )
+    conv, llm = conversation()
+    progress(conv)
+    response = conv.messages[-1]
+    assert response.content == "Answer"
+    assert calls == ["a", "a", "a"]
+    rounds = response.additional_kwargs["function_call_rounds"]
+    assert [r["round"] for r in rounds] == [1, 2, 3]
+    assert all(r["functions"] == "round_lookup" for r in rounds)
+    # The last request asks the model to answer without calling functions
+    assert [r["tool_choice"] for r in llm.requests] == ["auto", "auto", "auto", "none"]
+
+
+def test_calls_after_last_round_are_ignored(mock_config):
+    mock_config(
+        functions={"round_lookup": {}}, runtime={"max_function_call_rounds": 1}
+    )
+    conv, llm = conversation(stubborn=True)
+    progress(conv)
+    response = conv.messages[-1]
+    assert calls == ["a"]
+    assert len(response.additional_kwargs["function_call_rounds"]) == 1
+    assert "tool_calls" not in response.additional_kwargs
+
+
+def test_progress_of_rounds_is_shown(mock_config):
+    mock_config(
+        functions={"round_lookup": {}}, runtime={"max_function_call_rounds": 2}
+    )
+    conv, _ = conversation()
+    statuses = progress(conv)
+    assert statuses[0] == "Round 1: calling round_lookup"
+    assert statuses[1].startswith("Round 1: round_lookup returned after")
+    assert statuses[2] == "Round 2: calling round_lookup"
+    assert len(statuses) == 4
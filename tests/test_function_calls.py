@@ -0,0 +1,122 @@
+import asyncio
+import json
+import time
+
+from langchain_core.messages import AIMessage
+
+from gptextual.runtime.function_calling import register_for_function_calling
+from gptextual.runtime.function_calling.function_call_support import (
+    FunctionCallSupport,
+)
+
+running = {"now": 0, "max": 0}
+
+
+@register_for_function_calling
+async def slow_echo(text: str, seconds: float = 0.1) -> str:
+    """
+    Echoes the text after some time.
+
+    Args:
+        text: the text to echo
+        seconds: how long to wait
+    """
+    running["now"] += 1
+    running["max"] = max(running["max"], running["now"])
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        running["now"] -= 1
+    return text
+
+
+@register_for_function_calling
+def failing_function(text: str) -> str:
+    """
+    Fails.
+
+    Args:
+        text: any text
+    """
+    raise ValueError(f"cannot handle {text}")
+
+
+def tool_calls(*calls: tuple[str, dict]) -> AIMessage:
+    return AIMessage(
+        content="",
+        additional_kwargs={
+            "tool_calls": [
+                {
+                    "id": f"call_{i}",
+                    "type": "function",
+                    "function": {"name": name, "arguments": json.dumps(arguments)},
+                }
+                for i, (name, arguments) in enumerate(calls)
+            ]
+        },
+    )
+
+
+def execute(message: AIMessage) -> list:
+    return asyncio.run(
+        FunctionCallSupport.OPENAI_TOOL.execute_function_call(
+            message, model_name="mock-model"
+        )
+    )
+
+
+def test_tool_calls_run_concurrently(mock_config):
+    mock_config(functions={"slow_echo": {}})
+    running["max"] = 0
+    start = time.monotonic()
+    results = execute(tool_calls(*(("slow_echo", {"text": f"{i}"}) for i in range(5))))
+    assert time.monotonic() - start < 0.4
+    assert running["max"] == 5
+    # The results are in the order of the calls
+    assert [(r.tool_call_id, r.content) for r in results] == [
+        (f"call_{i}", f"{i}") for i in range(5)
+    ]
+
+
+def test_max_concurrency(mock_config):
+    mock_config(functions={"slow_echo": {"max_concurrency": 2}})
+    running["max"] = 0
+    results = execute(tool_calls(*(("slow_echo", {"text": f"{i}"}) for i in range(5))))
+    assert running["max"] == 2
+    assert len(results) == 5
+
+
+def test_max_concurrency_on_several_event_loops(mock_config):
+    mock_config(functions={"slow_echo": {"max_concurrency": 1}})
+    message = tool_calls(
+        *(("slow_echo", {"text": f"{i}", "seconds": 0}) for i in range(3))
+    )
+    for _ in range(2):
+        results = execute(message)
+        assert [r.content for r in results] == ["0", "1", "2"]
+
+
+def test_timeout(mock_config):
+    mock_config(functions={"slow_echo": {"timeout": 0.05}})
+    results = execute(
+        tool_calls(
+            ("slow_echo", {"text": "fast", "seconds": 0}),
+            ("slow_echo", {"text": "slow", "seconds": 5}),
+        )
+    )
+    assert results[0].content == "fast"
+    assert "did not return within 0.05 seconds" in results[1].content
+
+
+def test_errors_become_results(mock_config):
+    mock_config(functions={"slow_echo": {}, "failing_function": {}})
+    results = execute(
+        tool_calls(
+            ("failing_function", {"text": "this"}),
+            ("slow_echo", {"text": "ok", "seconds": 0}),
+            ("unknown_function", {}),
+        )
+    )
+    assert len(results) == 2
+    assert "cannot handle this" in results[0].content
+    assert results[1].content == "ok"
@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from gptextual.config.app_config import ModelConfig
+from gptextual.runtime.conversation import Conversation
+from gptextual.runtime.hedging import StreamsFailedError, first_to_stream
+from gptextual.runtime.models import ModelRegistry
+
+
+class Stream:
+    """A stream of chunks after a delay, or an error, which records how it ended"""
+
+    def __init__(self, chunks, *, delay=0.0, error: Exception = None):
+        self.chunks = chunks
+        self.delay = delay
+        self.error = error
+        self.started = False
+        self.cancelled = False
+        self.closed = False
+
+    async def _iterate(self):
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error:
+                raise self.error
+            for chunk in self.chunks:
+                yield chunk
+                await asyncio.sleep(0)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        finally:
+            self.closed = True
+
+    def __call__(self):
+        self.started = True
+        return self._iterate()
+
+
+def collect(streams, hedge_after=None):
+    async def run():
+        return [
+            chunk
+            async for chunk in first_to_stream(streams, hedge_after=hedge_after)
+        ]
+
+    return asyncio.run(run())
+
+
+def test_first_stream_answers_without_hedging():
+    primary, hedge = Stream(["a", "b"]), Stream(["c"])
+    assert collect([primary, hedge], hedge_after=1.0) == [(0, "a"), (0, "b")]
+    assert primary.closed
+    assert not hedge.started
+
+
+def test_hedge_answers_and_slow_stream_is_cancelled():
+    primary, hedge = Stream(["a"], delay=5.0), Stream(["b", "c"])
+    assert collect([primary, hedge], hedge_after=0.01) == [(1, "b"), (1, "c")]
+    assert primary.cancelled
+    assert primary.closed
+    assert hedge.closed
+
+
+def test_next_stream_starts_after_error():
+    primary, fallback = Stream([], error=RuntimeError("down")), Stream(["a"])
+    assert collect([primary, fallback]) == [(1, "a")]
+
+
+def test_all_streams_fail():
+    primary = Stream([], delay=0.05, error=RuntimeError("primary"))
+    hedge = Stream([], error=RuntimeError("hedge"))
+    with pytest.raises(StreamsFailedError) as info:
+        collect([primary, hedge], hedge_after=0.01)
+    # The errors keep the stream that raised them, in the order of the streams
+    assert [(index, str(error)) for index, error in info.value.errors] == [
+        (0, "primary"),
+        (1, "hedge"),
+    ]
+    assert str(info.value) == "primary"
+
+
+def test_consumer_closes_winning_stream():
+    primary = Stream(["a", "b", "c"])
+
+    async def run():
+        stream = first_to_stream([primary])
+        async for chunk in stream:
+            break
+        await stream.aclose()
+        return chunk
+
+    assert asyncio.run(run()) == (0, "a")
+    assert primary.closed
+
+
+def hedged_conversation(mock_config, **primary) -> Conversation:
+    """A conversation with model primary, which falls back to model backup"""
+    mock_config(
+        response="Answer",
+        models={
+            "primary": ModelConfig(fallbacks=["backup"], hedge_after=0.1),
+            "backup": ModelConfig(),
+        },
+    )
+    model = ModelRegistry.model_from_name("primary", "mock")
+    for key, value in primary.items():
+        setattr(model.llm_model, key, value)
+    return Conversation.create_new(model=model, in_memory=True)
+
+
+def progress(conversation: Conversation) -> float:
+    async def run():
+        async for _ in conversation.progress(
+            HumanMessage(content="Hi"), autosave=False
+        ):
+            pass
+
+    start = time.monotonic()
+    asyncio.run(run())
+    return time.monotonic() - start
+
+
+def test_model_answers_without_fallback(mock_config):
+    conversation = hedged_conversation(mock_config)
+    progress(conversation)
+    response = conversation.messages[-1]
+    assert response.content == "Answer"
+    assert "answered_by" not in response.additional_kwargs
+    assert "hedged_to" not in response.additional_kwargs
+
+
+def test_fallback_answers_after_error(mock_config):
+    conversation = hedged_conversation(mock_config, error_rate=1.0)
+    progress(conversation)
+    response = conversation.messages[-1]
+    assert response.content == "Answer"
+    assert response.additional_kwargs["answered_by"] == "backup@mock"
+
+
+def test_fallback_answers_for_slow_model(mock_config):
+    conversation = hedged_conversation(mock_config, ttft=5)
+    assert progress(conversation) < 1
+    response = conversation.messages[-1]
+    assert response.content == "Answer"
+    assert response.additional_kwargs["answered_by"] == "backup@mock"
+    assert response.additional_kwargs["hedged_to"] == ["backup@mock"]
@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+
+from gptextual.config.app_config import AnthropicConfig, OpenAIConfig
+from gptextual.runtime import http_clients
+from gptextual.runtime.http_clients import (
+    aclose_http_clients,
+    pool_stats,
+    provider_http_client,
+)
+
+
+@pytest.fixture(autouse=True)
+def clients(monkeypatch):
+    monkeypatch.setattr(http_clients, "_CLIENTS", {})
+    monkeypatch.setattr(http_clients, "_REQUESTS", {})
+
+
+def test_one_client_per_provider():
+    client = provider_http_client("openai", max_connections=4)
+    assert provider_http_client("openai") is client
+    assert provider_http_client("anthropic") is not client
+    assert pool_stats()["provider:openai"]["requests"] == 0
+
+
+def test_closed_clients_are_created_again():
+    client = provider_http_client("openai")
+    asyncio.run(aclose_http_clients())
+    assert client.is_closed
+    assert pool_stats() == {}
+    assert provider_http_client("openai") is not client
+
+
+def test_openai_models_share_the_pool():
+    pytest.importorskip("langchain_openai")
+    config = OpenAIConfig(api_key="key")
+    first = config.create_model_instance("gpt-4")
+    second = config.create_model_instance("gpt-3.5-turbo")
+    shared = provider_http_client("openai")
+    assert first.async_client._client._client is shared
+    assert second.async_client._client._client is shared
+
+
+def test_anthropic_models_share_the_pool():
+    pytest.importorskip("langchain_anthropic")
+    llm = AnthropicConfig(api_key="key").create_model_instance("claude-2.1")
+    assert llm._async_client._client is provider_http_client("anthropic")
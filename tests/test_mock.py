@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import HumanMessage, ToolMessage
+
+from gptextual.runtime.conversation import Conversation, StreamingMessage
+from gptextual.runtime.langchain.mock import MockAPIError, MockChatModel
+from gptextual.runtime.models import ModelRegistry
+
+TOOLS = [{"type": "function", "function": {"name": "lookup", "parameters": {}}}]
+
+
+def stream(model: MockChatModel, messages=None, **kwargs) -> list:
+    async def run():
+        return [
+            chunk
+            async for chunk in model.astream(
+                messages or [HumanMessage(content="Hi")], **kwargs
+            )
+        ]
+
+    return asyncio.run(run())
+
+
+def mock_model(**kwargs) -> MockChatModel:
+    return MockChatModel(**{"ttft": 0, "tokens_per_second": 0, **kwargs})
+
+
+def test_streams_response_in_chunks():
+    chunks = stream(mock_model(response="one two three four five", chunk_size=2))
+    assert [c.content for c in chunks] == ["one two ", "three four ", "five"]
+
+
+def test_generated_response_is_reproducible():
+    first = stream(mock_model(response_tokens=20, seed=1))
+    second = stream(mock_model(response_tokens=20, seed=1))
+    assert "".join(c.content for c in first) == "".join(c.content for c in second)
+    assert len("".join(c.content for c in first).split()) == 20
+
+
+def test_max_tokens_limits_response():
+    chunks = stream(mock_model(response="one two three four", max_tokens=2))
+    assert "".join(c.content for c in chunks) == "one two "
+
+
+def test_tool_calls_of_offered_functions():
+    model = mock_model(
+        response="Done",
+        tool_calls=[
+            {"name": "lookup", "arguments": {"key": "a"}},
+            {"name": "not_offered"},
+        ],
+    )
+    chunks = stream(model, tools=TOOLS)
+    calls = [call for c in chunks for call in c.additional_kwargs["tool_calls"]]
+    assert [call["function"] for call in calls] == [
+        {"name": "lookup", "arguments": '{"key": "a"}'}
+    ]
+
+    # Without functions, and after the function results, the model answers
+    assert [c.content for c in stream(model)] == ["Done"]
+    answer = stream(
+        model,
+        [HumanMessage(content="Hi"), ToolMessage(content="a", tool_call_id="1")],
+        tools=TOOLS,
+    )
+    assert [c.content for c in answer] == ["Done"]
+
+
+def test_injected_errors():
+    with pytest.raises(MockAPIError) as info:
+        stream(mock_model(error_rate=1.0, error_status=429))
+    assert info.value.status_code == 429
+
+
+def test_conversation_streams_mock_response(mock_config):
+    mock_config(response="Hello from the mock", chunk_size=1)
+    model = ModelRegistry.model_from_name("mock-model", "mock")
+    conversation = Conversation.create_new(model=model, in_memory=True)
+
+    async def run():
+        return [
+            chunk
+            async for chunk in conversation.progress(
+                HumanMessage(content="Hi"), autosave=False
+            )
+            if isinstance(chunk, StreamingMessage)
+        ]
+
+    streamed = asyncio.run(run())
+    assert len(streamed) == 4
+    assert conversation.messages[-1].content == "Hello from the mock"
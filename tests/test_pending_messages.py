@@ -0,0 +1,106 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from gptextual.runtime.conversation import Conversation
+from gptextual.runtime.models import ModelRegistry
+
+
+def conversation(mock_config, **settings) -> Conversation:
+    mock_config(**{"response": "Answer", "ttft": 0.1, **settings})
+    model = ModelRegistry.model_from_name("mock-model", "mock")
+    return Conversation.create_new(model=model, in_memory=True)
+
+
+async def consume(conv: Conversation, content: str):
+    async for _ in conv.progress(HumanMessage(content=content), autosave=False):
+        pass
+
+
+def history(conv: Conversation) -> list[str]:
+    return [
+        f"{'user' if isinstance(m, HumanMessage) else 'ai'}: {m.content}"
+        for m in conv.messages
+        if isinstance(m, (HumanMessage, AIMessage))
+    ]
+
+
+def send_while_streaming(conv: Conversation, *contents: str):
+    """Sends the first message, and the others while its response streams"""
+
+    async def run():
+        first = asyncio.create_task(consume(conv, contents[0]))
+        await asyncio.sleep(0.05)
+        for content in contents[1:]:
+            await consume(conv, content)
+        assert [m.content for m in conv.pending] == list(contents[1:])
+        await first
+
+    asyncio.run(run())
+
+
+def test_messages_are_queued_and_sent_one_per_turn(mock_config):
+    conv = conversation(mock_config)
+    send_while_streaming(conv, "first", "second", "third")
+    assert history(conv) == [
+        "user: first",
+        "ai: Answer",
+        "user: second",
+        "ai: Answer",
+        "user: third",
+        "ai: Answer",
+    ]
+    assert conv.pending == []
+    assert not conv.is_progressing
+
+
+def test_queued_messages_are_batched(mock_config):
+    conv = conversation(mock_config, runtime={"batch_pending_messages": True})
+    send_while_streaming(conv, "first", "second", "third")
+    assert history(conv) == [
+        "user: first",
+        "ai: Answer",
+        "user: second",
+        "user: third",
+        "ai: Answer",
+    ]
+
+
+def test_cancel_discards_queued_messages(mock_config):
+    conv = conversation(mock_config, ttft=5)
+
+    async def run():
+        first = asyncio.create_task(consume(conv, "first"))
+        await asyncio.sleep(0.05)
+        await consume(conv, "second")
+        first.cancel()
+        try:
+            await first
+        except asyncio.CancelledError:
+            pass
+
+    asyncio.run(run())
+    assert conv.pending == []
+    assert history(conv) == ["user: first"]
+    assert not conv.is_progressing
+
+
+def test_reserved_conversation_queues_messages(mock_config):
+    conv = conversation(mock_config)
+
+    def submit(content: str) -> bool:
+        """Reserves the conversation like the chat, or queues the message"""
+        if conv.reserve_progress():
+            return True
+        conv.enqueue(HumanMessage(content=content))
+        return False
+
+    assert submit("first")
+    assert conv.is_progressing
+    # Sent before the progress call of the first message starts
+    assert not submit("second")
+
+    asyncio.run(consume(conv, "first"))
+    assert history(conv) == ["user: first", "ai: Answer", "user: second", "ai: Answer"]
+    assert not conv.is_progressing
+    assert submit("third")
@@ -0,0 +1,117 @@
+import json
+import os
+import sys
+from importlib.metadata import EntryPoint
+
+import pytest
+
+from gptextual.runtime.function_calling import function_call_support, plugins
+from gptextual.runtime.function_calling.function_call_support import (
+    get_function,
+    get_tool_manifest,
+    load_function_entry_points,
+)
+from gptextual.runtime.function_calling.plugins import LazyFunction
+
+from .test_function_calls import execute, tool_calls
+
+PLUGIN = '''
+from gptextual.runtime.function_calling import register_for_function_calling
+
+
+@register_for_function_calling
+def plugin_weather(city: str) -> str:
+    """
+    Tells the weather of a city.
+
+    Args:
+        city: the city
+    """
+    return f"Sunny in {city}"
+'''
+
+
+class Plugin:
+    def __init__(self, path, monkeypatch) -> None:
+        self.module = f"gptextual_test_plugin_{path.name}"
+        self.file = path / f"{self.module}.py"
+        self.file.write_text(PLUGIN)
+        self.monkeypatch = monkeypatch
+        monkeypatch.syspath_prepend(str(path))
+        self.restart()
+
+    @property
+    def imported(self) -> bool:
+        return self.module in sys.modules
+
+    def restart(self):
+        """Forgets the functions and the plugin module, like a restart of the app"""
+        self.monkeypatch.setattr(function_call_support, "_FUNCTIONS_BY_NAME", {})
+        self.monkeypatch.delitem(sys.modules, self.module, raising=False)
+
+    def discover(self) -> list[LazyFunction]:
+        return plugins.discover_functions(function_call_support._FUNCTIONS_BY_NAME)
+
+
+@pytest.fixture
+def plugin(monkeypatch, tmp_path) -> Plugin:
+    monkeypatch.setattr(plugins, "schema_cache_path", tmp_path / "schemas.json")
+    monkeypatch.setattr(function_call_support, "_WARM_UP_PROCESS_POOLS", False)
+    plugin = Plugin(tmp_path, monkeypatch)
+    monkeypatch.setattr(
+        plugins,
+        "entry_points",
+        lambda group: [EntryPoint(name="weather", value=plugin.module, group=group)],
+    )
+    return plugin
+
+
+def test_new_plugins_are_imported_and_cached(plugin):
+    assert plugin.discover() == []
+    assert plugin.imported
+    assert not isinstance(get_function("plugin_weather"), LazyFunction)
+
+    with open(plugins.schema_cache_path, encoding="utf-8") as f:
+        [cached] = json.load(f).values()
+    [description] = cached["functions"]
+    assert description["name"] == "plugin_weather"
+    assert description["module"] == plugin.module
+    assert description["schema"]["name"] == "plugin_weather"
+    assert not description["is_coroutine"]
+
+
+def test_cached_plugins_are_not_imported(plugin):
+    plugin.discover()
+    plugin.restart()
+    [stub] = plugin.discover()
+    assert not plugin.imported
+    assert stub.__name__ == "plugin_weather"
+    assert stub.module == plugin.module
+    assert stub.schema["parameters"]["properties"]["city"]["type"] == "string"
+
+
+def test_updated_plugins_are_imported_again(plugin):
+    plugin.discover()
+    plugin.restart()
+    stat = os.stat(plugin.file)
+    os.utime(plugin.file, (stat.st_atime, stat.st_mtime + 10))
+    assert plugin.discover() == []
+    assert plugin.imported
+
+
+def test_lazy_functions_are_offered_and_imported_on_first_call(plugin, mock_config):
+    plugin.discover()
+    plugin.restart()
+    mock_config(functions={"plugin_weather": {}})
+    load_function_entry_points()
+    assert isinstance(get_function("plugin_weather"), LazyFunction)
+
+    manifest = get_tool_manifest(model_name="mock-model", api_provider="mock")
+    [tool] = manifest.kwargs["tools"]
+    assert tool["function"]["name"] == "plugin_weather"
+    assert not plugin.imported
+
+    [result] = execute(tool_calls(("plugin_weather", {"city": "Berlin"})))
+    assert result.content == "Sunny in Berlin"
+    assert plugin.imported
+    assert not isinstance(get_function("plugin_weather"), LazyFunction)
@@ -0,0 +1,115 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from gptextual.runtime import recording
+from gptextual.runtime.conversation import Conversation
+from gptextual.runtime.models import ModelRegistry
+from gptextual.runtime.recording import StreamRecorder, read_recording
+
+
+@pytest.fixture(autouse=True)
+def recording_path(monkeypatch, tmp_path):
+    monkeypatch.setattr(recording, "recording_path", tmp_path)
+    return tmp_path
+
+
+def progress(conversation: Conversation, content: str) -> float:
+    """Progresses the conversation, returns the seconds the response took"""
+
+    async def run():
+        async for _ in conversation.progress(
+            HumanMessage(content=content), autosave=False
+        ):
+            pass
+
+    start = time.monotonic()
+    asyncio.run(run())
+    return time.monotonic() - start
+
+
+def wait_for_recordings():
+    recording._writer.submit(lambda: None).result()
+
+
+def record(mock_config, recording_path):
+    """Records a response and an error, returns the recording file"""
+    mock_config(
+        runtime={"record_streams": True},
+        response="one two three",
+        chunk_size=1,
+        ttft=0.05,
+        tokens_per_second=20,
+    )
+    model = ModelRegistry.model_from_name("mock-model", "mock")
+    conversation = Conversation.create_new(model=model, in_memory=True)
+    progress(conversation, "Hi")
+    model.llm_model.error_rate = 1.0
+    model.llm_model.error_status = 503
+    progress(conversation, "Again")
+    wait_for_recordings()
+    return recording_path / f"{conversation.id}.jsonl.gz"
+
+
+def test_recording(mock_config, recording_path):
+    path = record(mock_config, recording_path)
+    response, error = read_recording(path)
+
+    assert response.model == "mock-model@mock"
+    assert [chunk["content"] for chunk in response.chunks] == ["one ", "two ", "three"]
+    assert [chunk["t"] for chunk in response.chunks] == sorted(
+        chunk["t"] for chunk in response.chunks
+    )
+    assert response.chunks[-1]["t"] >= 0.1
+    assert response.end["completed"]
+
+    assert error.chunks == []
+    assert not error.end["completed"]
+    assert error.end["status"] == 503
+
+
+def test_replay_round_trip(mock_config, recording_path):
+    path = record(mock_config, recording_path)
+    recorded = read_recording(path)[0].chunks[-1]["t"]
+
+    mock_config(replay_file=str(path))
+    model = ModelRegistry.model_from_name("mock-model", "mock")
+    conversation = Conversation.create_new(model=model, in_memory=True)
+    # The chunks are replayed at the recorded speed
+    assert progress(conversation, "Hi") >= recorded
+    assert conversation.messages[-1].content == "one two three"
+    progress(conversation, "Again")
+    assert conversation.messages[-1].additional_kwargs["error"]
+    assert "503" in conversation.messages[-1].content
+    # Nothing is recorded while replaying
+    wait_for_recordings()
+    assert list(recording_path.iterdir()) == [path]
+
+
+def test_replay_speed(mock_config, recording_path):
+    path = record(mock_config, recording_path)
+    mock_config(replay_file=str(path), replay_speed=0)
+    model = ModelRegistry.model_from_name("mock-model", "mock")
+    conversation = Conversation.create_new(model=model, in_memory=True)
+    assert progress(conversation, "Hi") < 0.1
+    assert conversation.messages[-1].content == "one two three"
+
+
+def test_recordings_are_saved_off_the_event_loop(mock_config, monkeypatch):
+    threads = []
+    save = StreamRecorder.save
+
+    def record_thread(self, model):
+        threads.append(threading.get_ident())
+        save(self, model)
+
+    monkeypatch.setattr(StreamRecorder, "save", record_thread)
+    mock_config(runtime={"record_streams": True}, response="Hello")
+    model = ModelRegistry.model_from_name("mock-model", "mock")
+    progress(Conversation.create_new(model=model, in_memory=True), "Hi")
+    wait_for_recordings()
+    assert len(threads) == 1
+    assert threads[0] != threading.get_ident()
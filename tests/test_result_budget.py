@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from gptextual.runtime.function_calling import (
+    register_for_function_calling,
+    result_budget,
+)
+from gptextual.runtime.function_calling.result_budget import fit_result
+from gptextual.runtime.tokenizer import count_tokens
+
+from .test_function_calls import execute, tool_calls
+
+MODEL = "mock-model"
+
+
+@register_for_function_calling
+def search(query: str) -> list:
+    """
+    Searches the web.
+
+    Args:
+        query: what to search for
+    """
+    return [{"title": f"{query} hit {i}", "snippet": "text " * 20} for i in range(50)]
+
+
+@pytest.fixture(autouse=True)
+def tool_results_path(monkeypatch, tmp_path):
+    monkeypatch.setattr(result_budget, "tool_results_path", tmp_path)
+    return tmp_path
+
+
+def test_results_that_fit_are_kept():
+    assert fit_result("short result", max_tokens=100, model_name=MODEL) is None
+
+
+def test_lists_keep_their_first_items():
+    hits = [f"hit {i} " * 10 for i in range(100)]
+    shortened = fit_result(hits, max_tokens=100, model_name=MODEL)
+    assert count_tokens(shortened, MODEL) <= 100
+    items = json.loads(shortened)
+    assert items[0] == hits[0]
+    assert items[-1].startswith(f"[... {100 - len(items) + 1} more items omitted")
+
+
+def test_json_strings_are_parsed():
+    result = json.dumps({"query": "q", "hits": list(range(1000))})
+    shortened = json.loads(fit_result(result, max_tokens=50, model_name=MODEL))
+    assert shortened["query"] == "q"
+    assert shortened["hits"][:3] == [0, 1, 2]
+    assert "more items omitted" in shortened["hits"][-1]
+
+
+def test_text_keeps_head_and_tail():
+    text = "head " + "middle " * 1000 + "tail"
+    shortened = fit_result(text, max_tokens=50, model_name=MODEL)
+    assert shortened.startswith("head ")
+    assert shortened.endswith("tail")
+    assert "tokens omitted" in shortened
+
+
+def test_function_results_over_budget(mock_config, tool_results_path):
+    mock_config(functions={"search": {"max_result_tokens": 200}})
+    [message] = execute(tool_calls(("search", {"query": "gptextual"})))
+    assert message.additional_kwargs["truncated"]
+    assert count_tokens(message.content, MODEL) <= 200
+    assert "more items omitted" in message.content
+
+    # The full result is kept on disk
+    with open(message.additional_kwargs["full_result_path"], encoding="utf-8") as f:
+        assert f.read() == str(search("gptextual"))
+    assert len(list((tool_results_path / "search").iterdir())) == 1
+
+
+def test_function_results_without_budget(mock_config, tool_results_path):
+    mock_config(functions={"search": {}})
+    [message] = execute(tool_calls(("search", {"query": "gptextual"})))
+    assert message.content == str(search("gptextual"))
+    assert "truncated" not in message.additional_kwargs
+    assert not (tool_results_path / "search").exists()
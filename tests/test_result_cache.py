@@ -0,0 +1,137 @@
+import asyncio
+import threading
+
+import pytest
+
+from gptextual.runtime.function_calling import (
+    function_call_support,
+    register_for_function_calling,
+    result_cache,
+)
+from gptextual.runtime.function_calling.result_cache import FunctionResultCache
+
+from .test_function_calls import execute, tool_calls
+
+calls = []
+
+
+@register_for_function_calling
+def counted_lookup(key: str) -> str:
+    """
+    Looks up a key.
+
+    Args:
+        key: the key to look up
+    """
+    calls.append(key)
+    return f"value of {key}"
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(result_cache, "time", clock)
+    return clock
+
+
+@pytest.fixture(autouse=True)
+def cache_path(monkeypatch, tmp_path):
+    monkeypatch.setattr(result_cache, "cache_path", tmp_path)
+    monkeypatch.setattr(function_call_support, "_RESULT_CACHES", {})
+    calls.clear()
+    return tmp_path
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_repeated_calls_are_cached(mock_config):
+    mock_config(functions={"counted_lookup": {"cache_ttl": 60}})
+    message = tool_calls(("counted_lookup", {"key": "a"}))
+    assert [r.content for r in execute(message)] == ["value of a"]
+    assert [r.content for r in execute(message)] == ["value of a"]
+    assert calls == ["a"]
+
+
+def test_no_cache_without_ttl(mock_config):
+    mock_config(functions={"counted_lookup": {}})
+    message = tool_calls(("counted_lookup", {"key": "a"}))
+    execute(message)
+    execute(message)
+    assert calls == ["a", "a"]
+
+
+def test_results_expire(clock):
+    cache = FunctionResultCache("f", ttl=10)
+    run(cache.put({"key": "a"}, "A"))
+    clock.now += 5
+    assert run(cache.get({"key": "a"})) == (True, "A")
+    clock.now += 6
+    assert run(cache.get({"key": "a"})) == (False, None)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_arguments_are_canonicalized():
+    cache = FunctionResultCache("f", ttl=10)
+    run(cache.put({"a": 1, "b": 2}, "result"))
+    assert run(cache.get({"b": 2, "a": 1})) == (True, "result")
+
+
+def test_least_recently_used_results_are_dropped():
+    cache = FunctionResultCache("f", ttl=10, max_entries=2)
+
+    async def fill():
+        await cache.put({"key": "a"}, "A")
+        await cache.put({"key": "b"}, "B")
+        await cache.get({"key": "a"})
+        await cache.put({"key": "c"}, "C")
+        return [(await cache.get({"key": k}))[0] for k in "abc"]
+
+    assert run(fill()) == [True, False, True]
+
+
+def test_disk_tier_survives_restarts(clock, cache_path):
+    run(FunctionResultCache("f", ttl=10, on_disk=True).put({"key": "a"}, ["A"]))
+    assert len(list((cache_path / "f").iterdir())) == 1
+
+    cache = FunctionResultCache("f", ttl=10, on_disk=True)
+    assert run(cache.get({"key": "a"})) == (True, ["A"])
+    # Expired results are removed from disk
+    clock.now += 11
+    cache = FunctionResultCache("f", ttl=10, on_disk=True)
+    assert run(cache.get({"key": "a"})) == (False, None)
+    assert list((cache_path / "f").iterdir()) == []
+
+
+def test_disk_tier_skips_results_that_are_not_json(cache_path):
+    cache = FunctionResultCache("f", ttl=10, on_disk=True)
+    run(cache.put({"key": "a"}, {1, 2}))
+    assert not (cache_path / "f").exists()
+    assert run(cache.get({"key": "a"})) == (True, {1, 2})
+
+
+def test_disk_tier_is_accessed_off_the_event_loop(monkeypatch):
+    threads = []
+    for method in ("_read", "_write"):
+        original = getattr(FunctionResultCache, method)
+
+        def record(self, *args, original=original):
+            threads.append(threading.get_ident())
+            return original(self, *args)
+
+        monkeypatch.setattr(FunctionResultCache, method, record)
+
+    cache = FunctionResultCache("f", ttl=10, on_disk=True)
+    run(cache.put({"key": "a"}, "A"))
+    run(FunctionResultCache("f", ttl=10, on_disk=True).get({"key": "a"}))
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
@@ -0,0 +1,129 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+from gptextual.runtime.langchain.mock import MockAPIError
+from gptextual.runtime.scheduler import (
+    Priority,
+    ProviderScheduler,
+    is_rate_limit_error,
+)
+
+
+def test_status_code_is_trusted():
+    assert is_rate_limit_error(MockAPIError(429, "Too many requests"))
+    # The status code wins over the text of the error
+    assert not is_rate_limit_error(MockAPIError(500, "rate limit of the proxy"))
+    assert not is_rate_limit_error(MockAPIError(400, "Error code: 429"))
+
+
+def test_status_code_of_response():
+    error = Exception("Too many requests")
+    error.response = SimpleNamespace(status_code=429)
+    assert is_rate_limit_error(error)
+
+
+def test_text_without_status_code():
+    assert is_rate_limit_error(Exception("Error code: 429 - slow down"))
+    assert is_rate_limit_error(Exception("Rate limit reached for requests"))
+    assert is_rate_limit_error(Exception("rate_limit_error"))
+    # "429" as part of a number is not a rate limit
+    assert not is_rate_limit_error(Exception("Request id 14290 failed"))
+    assert not is_rate_limit_error(Exception("Internal server error"))
+
+
+def empty_scheduler(**limits) -> ProviderScheduler:
+    """A scheduler with the given limits, which used up its burst"""
+    scheduler = ProviderScheduler("mock", **limits)
+    for bucket in scheduler.buckets.values():
+        bucket.available = 0
+    return scheduler
+
+
+def test_requests_are_admitted_without_limits():
+    scheduler = ProviderScheduler("mock")
+
+    async def run():
+        await asyncio.gather(*(scheduler.acquire(1000) for _ in range(20)))
+
+    asyncio.run(run())
+    assert scheduler.admitted == 20
+    assert scheduler.max_queue_length == 0
+
+
+def test_requests_per_minute():
+    # One request per 0.1 seconds
+    scheduler = empty_scheduler(requests_per_minute=600)
+
+    async def run():
+        start = time.monotonic()
+        await asyncio.gather(*(scheduler.acquire(1) for _ in range(3)))
+        return time.monotonic() - start
+
+    assert 0.25 < asyncio.run(run()) < 1
+    assert scheduler.max_queue_length == 3
+
+
+def test_tokens_per_minute():
+    # 100 tokens per 0.1 seconds
+    scheduler = empty_scheduler(tokens_per_minute=60000)
+
+    async def run():
+        start = time.monotonic()
+        await scheduler.acquire(200)
+        return time.monotonic() - start
+
+    assert 0.15 < asyncio.run(run()) < 1
+
+
+def test_foreground_requests_go_first():
+    scheduler = empty_scheduler(requests_per_minute=600)
+    admitted = []
+
+    async def request(name: str, priority: Priority):
+        await scheduler.acquire(1, priority=priority)
+        admitted.append(name)
+
+    async def run():
+        background = [
+            asyncio.create_task(request(f"background {i}", Priority.BACKGROUND))
+            for i in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        await request("foreground", Priority.FOREGROUND)
+        await asyncio.gather(*background)
+
+    asyncio.run(run())
+    assert admitted == ["foreground", "background 0", "background 1", "background 2"]
+
+
+def test_cancelled_requests_leave_the_queue():
+    scheduler = empty_scheduler(requests_per_minute=600)
+
+    async def run():
+        waiting = asyncio.create_task(scheduler.acquire(1))
+        await asyncio.sleep(0.01)
+        waiting.cancel()
+        await scheduler.acquire(1)
+
+    asyncio.run(run())
+    assert scheduler.admitted == 1
+    assert scheduler.metrics()["queued"] == 0
+
+
+def test_rate_limit_errors_halve_the_limits():
+    scheduler = ProviderScheduler("mock", requests_per_minute=100)
+    scheduler.report_rate_limited()
+    assert scheduler.metrics()["requests_per_minute"] == 50
+
+
+def test_rate_limit_errors_without_limits_learn_a_limit():
+    scheduler = ProviderScheduler("mock")
+
+    async def run():
+        for _ in range(10):
+            await scheduler.acquire(1)
+
+    asyncio.run(run())
+    scheduler.report_rate_limited()
+    assert scheduler.metrics()["requests_per_minute"] == 5
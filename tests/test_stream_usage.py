@@ -0,0 +1,189 @@
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from gptextual.config.app_config import AnthropicConfig, OpenAIConfig, _import_optional
+from gptextual.runtime import http_clients
+from gptextual.runtime.langchain.schema import prompt_cache_usage
+
+
+def openai_events() -> list[dict]:
+    chunk = {"id": "c", "object": "chat.completion.chunk", "created": 0, "model": "m"}
+    return [
+        {**chunk, "choices": [{"index": 0, "delta": {"content": "Hi"}}]},
+        {**chunk, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]},
+        {
+            **chunk,
+            "choices": [],
+            "usage": {
+                "prompt_tokens": 2000,
+                "completion_tokens": 1,
+                "total_tokens": 2001,
+                "prompt_tokens_details": {"cached_tokens": 1536},
+            },
+        },
+    ]
+
+
+def anthropic_events() -> list[dict]:
+    usage = {"input_tokens": 100, "output_tokens": 1, "cache_read_input_tokens": 900}
+    message = {"id": "m", "type": "message", "role": "assistant", "content": []}
+    return [
+        {
+            "type": "message_start",
+            "message": {**message, "model": "m", "stop_reason": None, "usage": usage},
+        },
+        {
+            "type": "content_block_start",
+            "index": 0,
+            "content_block": {"type": "text", "text": ""},
+        },
+        {
+            "type": "content_block_delta",
+            "index": 0,
+            "delta": {"type": "text_delta", "text": "Hi"},
+        },
+        {"type": "content_block_stop", "index": 0},
+        {
+            "type": "message_delta",
+            "delta": {"stop_reason": "end_turn"},
+            "usage": {"output_tokens": 2},
+        },
+        {"type": "message_stop"},
+    ]
+
+
+class APIServer:
+    """Streams canned responses of the OpenAI and Anthropic APIs"""
+
+    def __init__(self, reject_stream_options=False) -> None:
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_POST(self):
+                length = int(self.headers["Content-Length"])
+                request = json.loads(self.rfile.read(length))
+                server.requests.append(request)
+                if reject_stream_options and "stream_options" in request:
+                    error = {"error": {"message": "Unknown field stream_options"}}
+                    self.respond(400, "application/json", json.dumps(error))
+                elif self.path.endswith("/chat/completions"):
+                    self.respond(200, "text/event-stream", server.sse(openai_events()))
+                else:
+                    events = anthropic_events()
+                    self.respond(200, "text/event-stream", server.sse(events, True))
+
+            def respond(self, status: int, content_type: str, body: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body.encode())))
+                self.end_headers()
+                self.wfile.write(body.encode())
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    @staticmethod
+    def sse(events: list[dict], named=False) -> str:
+        lines = []
+        for event in events:
+            if named:
+                lines.append(f"event: {event['type']}\n")
+            lines.append(f"data: {json.dumps(event)}\n\n")
+        if not named:
+            lines.append("data: [DONE]\n\n")
+        return "".join(lines)
+
+
+@pytest.fixture
+def api_server(monkeypatch):
+    monkeypatch.setattr(http_clients, "_CLIENTS", {})
+    servers = []
+
+    def start(**kwargs) -> APIServer:
+        servers.append(APIServer(**kwargs))
+        return servers[-1]
+
+    yield start
+    for server in servers:
+        server.server.shutdown()
+
+
+def stream(llm, requests=1) -> list:
+    """The responses of the requests, each merged from its chunks"""
+
+    async def request():
+        message = None
+        async for chunk in llm.astream([HumanMessage(content="Hi")]):
+            message = chunk if message is None else message + chunk
+        return message
+
+    async def run():
+        try:
+            return [await request() for _ in range(requests)]
+        finally:
+            await http_clients.aclose_http_clients()
+
+    return asyncio.run(run())
+
+
+def test_openai_stream_usage(api_server, mock_config):
+    pytest.importorskip("langchain_openai")
+    server = api_server()
+    config = OpenAIConfig(api_key="key", base_url=f"{server.url}/v1")
+    [message] = stream(config.create_model_instance("gpt-4"))
+    assert message.content == "Hi"
+    assert prompt_cache_usage(message) == (1536, 2000)
+    assert server.requests[0]["stream_options"] == {"include_usage": True}
+
+
+def test_openai_stream_usage_can_be_disabled(api_server, mock_config):
+    pytest.importorskip("langchain_openai")
+    server = api_server()
+    config = OpenAIConfig(
+        api_key="key", base_url=f"{server.url}/v1", stream_usage=False
+    )
+    [message] = stream(config.create_model_instance("gpt-4"))
+    assert message.content == "Hi"
+    assert "stream_options" not in server.requests[0]
+
+
+def test_openai_stream_usage_rejected(api_server, mock_config):
+    pytest.importorskip("langchain_openai")
+    server = api_server(reject_stream_options=True)
+    config = OpenAIConfig(api_key="key", base_url=f"{server.url}/v1")
+    llm = config.create_model_instance("gpt-4")
+    assert [message.content for message in stream(llm, requests=2)] == ["Hi", "Hi"]
+    # The request is sent again without the usage, and the next one without it
+    assert ["stream_options" in request for request in server.requests] == [
+        True,
+        False,
+        False,
+    ]
+
+
+def test_anthropic_stream_usage(api_server, mock_config):
+    pytest.importorskip("langchain_anthropic")
+    server = api_server()
+    config = AnthropicConfig(api_key="key", base_url=server.url)
+    [message] = stream(config.create_model_instance("claude-2.1"))
+    assert message.content == "Hi"
+    assert prompt_cache_usage(message) == (900, 1000)
+
+
+def test_import_optional():
+    assert _import_optional("sdk_that_is_not_installed", "Model") is None
+    # A broken wrapper of an installed SDK is not mistaken for a missing SDK
+    with pytest.raises(ModuleNotFoundError):
+        _import_optional("gptextual.runtime.langchain.no_such_wrapper", "Model")
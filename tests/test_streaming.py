@@ -0,0 +1,75 @@
+from langchain_core.messages import AIMessageChunk
+
+from gptextual.runtime.langchain.streaming import StreamAccumulator
+
+
+def test_accumulates_content():
+    accumulator = StreamAccumulator()
+    assert accumulator.message is None
+    for content in ("Hello", ", ", "world"):
+        accumulator.add(AIMessageChunk(content=content))
+    assert accumulator.chunks == 3
+    assert accumulator.message.content == "Hello, world"
+
+    # The message is built again after the next chunk
+    accumulator.add(AIMessageChunk(content="!"))
+    assert accumulator.message.content == "Hello, world!"
+
+
+def test_merges_tool_call_deltas():
+    accumulator = StreamAccumulator()
+    deltas = [
+        {"index": 0, "id": "call_0", "type": "function", "function": {"name": "get"}},
+        {"index": 1, "id": "call_1", "type": "function", "function": {"name": "put"}},
+        {"index": 0, "function": {"arguments": '{"key": '}},
+        {"index": 1, "function": {"arguments": "{}"}},
+        {"index": 0, "function": {"arguments": '"a"}'}},
+    ]
+    for delta in deltas:
+        accumulator.add(
+            AIMessageChunk(content="", additional_kwargs={"tool_calls": [delta]})
+        )
+    assert accumulator.message.additional_kwargs["tool_calls"] == [
+        {
+            "index": 0,
+            "id": "call_0",
+            "function": {"arguments": '{"key": "a"}', "name": "get"},
+            "type": "function",
+        },
+        {
+            "index": 1,
+            "id": "call_1",
+            "function": {"arguments": "{}", "name": "put"},
+            "type": "function",
+        },
+    ]
+
+
+def test_equals_langchain_chunk_addition():
+    chunks = [
+        AIMessageChunk(content="The ", additional_kwargs={"function_call": {}}),
+        AIMessageChunk(
+            content="answer",
+            additional_kwargs={"function_call": {"name": "f", "arguments": "{"}},
+        ),
+        AIMessageChunk(
+            content=" is 42",
+            additional_kwargs={"function_call": {"arguments": "}"}},
+        ),
+    ]
+    accumulator = StreamAccumulator()
+    merged = None
+    for chunk in chunks:
+        accumulator.add(chunk)
+        merged = chunk if merged is None else merged + chunk
+    assert accumulator.message.content == merged.content
+    assert accumulator.message.additional_kwargs == merged.additional_kwargs
+
+
+def test_keeps_response_metadata():
+    accumulator = StreamAccumulator()
+    accumulator.add(AIMessageChunk(content="Hi"))
+    accumulator.add(
+        AIMessageChunk(content="", response_metadata={"usage": {"input_tokens": 7}})
+    )
+    assert accumulator.message.response_metadata == {"usage": {"input_tokens": 7}}
@@ -0,0 +1,59 @@
+import asyncio
+
+from langchain_core.messages import HumanMessage
+from textual.app import App, ComposeResult
+
+from gptextual.runtime.conversation import Conversation
+from gptextual.runtime.models import ModelRegistry
+from gptextual.textual_ui.widgets.token_meter import TokenMeter
+
+
+class MeterApp(App):
+    def compose(self) -> ComposeResult:
+        yield TokenMeter()
+
+
+def conversation(messages: int) -> Conversation:
+    model = ModelRegistry.model_from_name("mock-model", "mock")
+    conv = Conversation.create_new(model=model, in_memory=True)
+    for i in range(messages):
+        conv.append(HumanMessage(content=f"message {i} " * 20))
+    return conv
+
+
+def test_meter_counts_the_latest_conversation(mock_config, monkeypatch):
+    monkeypatch.setattr(TokenMeter, "DEBOUNCE_SECONDS", 0.01)
+    small, large = conversation(1), conversation(10)
+
+    async def run():
+        app = MeterApp()
+        async with app.run_test() as pilot:
+            meter = app.query_one(TokenMeter)
+            model = small.model
+            meter.update_count(text="Hello", model=model, conversation=small)
+            meter.update_count(text="Hello", model=model, conversation=large)
+            await pilot.pause(0.2)
+            await app.workers.wait_for_complete()
+            await pilot.pause()
+            return meter
+
+    meter = asyncio.run(run())
+    assert meter._history_key == (large.id, len(large))
+    assert meter._history_tokens == large.context_token_count()
+    assert f"{large.context_token_count():,} history" in str(meter.renderable)
+
+
+def test_outdated_counts_are_discarded(mock_config):
+    conv = conversation(2)
+
+    async def run():
+        app = MeterApp()
+        async with app.run_test():
+            meter = app.query_one(TokenMeter)
+            meter._generation = 2
+            meter._show(1, "mock-model", None, (conv.id, len(conv)), 1, 2, 100)
+            return meter
+
+    meter = asyncio.run(run())
+    assert meter._history_key is None
+    assert str(meter.renderable) == ""
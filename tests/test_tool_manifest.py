@@ -0,0 +1,76 @@
+from gptextual.runtime.function_calling import register_for_function_calling
+from gptextual.runtime.function_calling.function_call_support import (
+    FunctionCallSupport,
+    get_tool_manifest,
+)
+
+
+@register_for_function_calling
+def manifest_lookup(key: str) -> str:
+    """
+    Looks up a key.
+
+    Args:
+        key: the key to look up
+    """
+    return key
+
+
+def manifest_registered_later(key: str) -> str:
+    """
+    Looks up a key later.
+
+    Args:
+        key: the key to look up
+    """
+    return key
+
+
+def manifest(model_name="mock-model", api_provider="mock"):
+    return get_tool_manifest(model_name=model_name, api_provider=api_provider)
+
+
+def tool_names(kwargs: dict) -> list[str]:
+    return [tool["function"]["name"] for tool in kwargs.get("tools", [])]
+
+
+def test_manifest_of_configured_functions(mock_config):
+    mock_config(functions={"manifest_lookup": {}})
+    compiled = manifest()
+    assert compiled.function_call_support == FunctionCallSupport.OPENAI_TOOL
+    assert tool_names(compiled.kwargs) == ["manifest_lookup"]
+    assert compiled.kwargs["tool_choice"] == "auto"
+    assert tool_names(compiled.final_kwargs) == ["manifest_lookup"]
+    assert compiled.final_kwargs["tool_choice"] == "none"
+
+
+def test_manifest_is_reused(mock_config):
+    mock_config(functions={"manifest_lookup": {}})
+    assert manifest() is manifest()
+    assert manifest() is not manifest(model_name="other-model")
+
+
+def test_models_without_function_calling(mock_config):
+    mock_config(function_call_support={"plain-model": "none"})
+    assert manifest(model_name="plain-model") is None
+    assert manifest(api_provider="google") is None
+
+
+def test_manifest_is_compiled_again_after_registration(mock_config):
+    mock_config(functions={"manifest_lookup": {}, "manifest_registered_later": {}})
+    assert tool_names(manifest().kwargs) == ["manifest_lookup"]
+    compiled = manifest()
+    register_for_function_calling(manifest_registered_later)
+    assert manifest() is not compiled
+    assert tool_names(manifest().kwargs) == [
+        "manifest_lookup",
+        "manifest_registered_later",
+    ]
+
+
+def test_manifest_is_compiled_again_after_config_change(mock_config):
+    mock_config(functions={"manifest_lookup": {}})
+    compiled = manifest()
+    mock_config(functions={})
+    assert manifest() is not compiled
+    assert manifest().kwargs == {}